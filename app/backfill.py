@@ -0,0 +1,169 @@
+"""
+Backfills a location's review history into pending_reviews.
+
+    python -m app.backfill accounts/111/locations/222 [--checkpoint PATH]
+
+Reviews are streamed page by page from Google, reviews that already have a
+reply are skipped, drafts are generated on a bounded thread pool and rows are
+bulk-inserted in chunks. No WhatsApp messages are sent. Progress is saved to a
+checkpoint file after every page, so an interrupted run resumes where it
+stopped.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.resilience import CircuitOpenError
+from app.db import repository
+from app.db.supabase import supabase
+from app.services.google_client import iter_review_pages
+from app.services.openai_service import draft_review_reply
+from app.services.pipeline import parse_notification
+from app.services.tenant_cache import get_client_by_location
+
+def load_checkpoint(path: str, location_id: str):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("location_id") == location_id:
+            return checkpoint
+        print(f"Warning: Checkpoint {path} is for {checkpoint.get('location_id')}; starting over.")
+    return {
+        "location_id": location_id,
+        "page_token": None,
+        "done": False,
+        "pages": 0,
+        "seen": 0,
+        "skipped_replied": 0,
+        "skipped_existing": 0,
+        "inserted": 0,
+        "draft_failed": 0
+    }
+
+def save_checkpoint(path: str, checkpoint: dict):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def existing_review_ids(review_ids: list):
+    """Reviews already stored, including those moved to the archive."""
+    return repository.existing_review_ids(review_ids)
+
+def insert_rows(rows: list, chunk_size: int):
+    """Bulk-inserts rows, ignoring reviews that were stored by an earlier run."""
+    for start in range(0, len(rows), chunk_size):
+        repository.insert_reviews(rows[start:start + chunk_size])
+
+def draft_row(client: dict, review: dict):
+    try:
+        ai_reply = draft_review_reply(
+            review["review_text"],
+            review["star_rating"],
+            client["language_preference"],
+            client.get("offer_policy", "STRICT - NO OFFERS"),
+            client["phone_number"],
+            client_templates=client.get("reply_templates")
+        )
+    except CircuitOpenError as e:
+        # Counted as draft_failed, like any other drafting error.
+        print(f"Error drafting review {review['review_id']}: {e}")
+        ai_reply = None
+    if not ai_reply:
+        return None
+    return {
+        "client_id": client["id"],
+        "google_review_id": review["review_id"],
+        "review_text": review["review_text"],
+        "star_rating": review["star_rating"],
+        "draft_reply": ai_reply.get("reply_text", ""),
+        "draft_alternates": ai_reply.get("alternates", []),
+        "status": "pending"
+    }
+
+def backfill_location(location_id: str, checkpoint_path: str = None, page_size: int = 50, chunk_size: int = 100, concurrency: int = None):
+    """
+    Runs (or resumes) a backfill for one location and returns the checkpoint.
+    Memory use is bounded by one page of reviews.
+    """
+    client = get_client_by_location(location_id)
+    if not client:
+        raise SystemExit(f"Client not found for location: {location_id}")
+
+    checkpoint = load_checkpoint(checkpoint_path, location_id)
+    if checkpoint["done"]:
+        print(f"INFO: Backfill for {location_id} already completed.")
+        return checkpoint
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency or settings.backfill_concurrency) as executor:
+        for page, next_page_token in iter_review_pages(location_id, page_size, checkpoint["page_token"]):
+            reviews = []
+            for raw in page:
+                checkpoint["seen"] += 1
+                if raw.get("reviewReply"):
+                    checkpoint["skipped_replied"] += 1
+                    continue
+                review = parse_notification(raw)
+                if review and review["review_id"]:
+                    # Historical reviews stay out of the received -> posted SLO.
+                    review["received_at"] = None
+                    reviews.append(review)
+
+            existing = existing_review_ids([review["review_id"] for review in reviews])
+            checkpoint["skipped_existing"] += len(existing)
+            reviews = [review for review in reviews if review["review_id"] not in existing]
+
+            rows = []
+            for row in executor.map(lambda review: draft_row(client, review), reviews):
+                if row is None:
+                    checkpoint["draft_failed"] += 1
+                else:
+                    rows.append(row)
+            insert_rows(rows, chunk_size)
+
+            checkpoint["inserted"] += len(rows)
+            checkpoint["pages"] += 1
+            checkpoint["page_token"] = next_page_token
+            checkpoint["done"] = next_page_token is None
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.monotonic() - started
+            print(
+                f"Page {checkpoint['pages']}: seen {checkpoint['seen']}, inserted {checkpoint['inserted']}, "
+                f"replied {checkpoint['skipped_replied']}, existing {checkpoint['skipped_existing']}, "
+                f"failed {checkpoint['draft_failed']} ({elapsed:.1f}s)"
+            )
+
+    if not checkpoint["done"]:
+        print("Warning: No review pages were fetched (are Google credentials configured?)")
+    return checkpoint
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Backfill historical Google reviews into pending_reviews.")
+    parser.add_argument("location_id", help="Full location name, e.g. accounts/111/locations/222")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: backfill-<location>.json)")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=100, help="Rows per bulk insert")
+    parser.add_argument("--concurrency", type=int, default=settings.backfill_concurrency, help="Parallel drafting calls")
+    args = parser.parse_args(argv)
+
+    if supabase is None and settings.repository_backend != "postgres":
+        print("Error: Supabase is not configured.")
+        return 1
+
+    checkpoint_path = args.checkpoint or f"backfill-{args.location_id.replace('/', '_')}.json"
+    checkpoint = backfill_location(args.location_id, checkpoint_path, args.page_size, args.chunk_size, args.concurrency)
+    repository.close()
+    if not checkpoint["done"]:
+        return 1
+    print(f"Backfill complete: {checkpoint['inserted']} reviews queued from {checkpoint['pages']} pages.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
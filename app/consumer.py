@@ -0,0 +1,171 @@
+"""
+Streaming-pull Pub/Sub consumer, an alternative to the push webhook.
+
+    python -m app.consumer [--subscription projects/<p>/subscriptions/<s>]
+
+Each message goes through the same parse -> draft -> store -> notify logic as
+/webhook/google-pubsub. A message is acked only after its pending_reviews row
+is stored; notification happens after the ack. Flow control bounds the
+number and size of outstanding messages, so a slow OpenAI backs up into
+Pub/Sub instead of into memory. Acks are batched by the client library.
+With PIPELINE_MODE=leased a message is acked as soon as its review_jobs row
+exists, and the web processes' stage workers claim and run the stages.
+
+Set PUBSUB_EMULATOR_HOST to run against the Pub/Sub emulator.
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+from app.core.config import settings
+from app.db import repository
+from app.services import client_registry, idempotency, notifier, outbound, pipeline, sessions, stats_service
+
+counters = {"received": 0, "acked": 0, "nacked": 0, "dropped": 0, "duplicates": 0}
+
+def handle_message(message):
+    """
+    Processes one Pub/Sub message. Returns "ack" or "nack" after acting on it.
+    """
+    counters["received"] += 1
+    try:
+        data_json = json.loads(message.data.decode("utf-8"), strict=False)
+    except Exception as e:
+        # Redelivering a malformed message will not fix it.
+        print(f"Error decoding Pub/Sub message {message.message_id}: {e}")
+        counters["dropped"] += 1
+        message.ack()
+        return "ack"
+
+    review = pipeline.parse_notification(data_json)
+    if not review:
+        print(f"Missing location_id in message {message.message_id}")
+        counters["dropped"] += 1
+        message.ack()
+        return "ack"
+
+    if not idempotency.claim(message.message_id, review["review_id"]):
+        counters["duplicates"] += 1
+        message.ack()
+        return "ack"
+
+    try:
+        try:
+            job = pipeline.persist_job(review, message.message_id)
+        except pipeline.DuplicateJob:
+            # Either a finished duplicate, or our own earlier delivery that
+            # was nacked before its row was stored.
+            job = pipeline.find_unfinished_job(review["review_id"])
+            if job is None:
+                idempotency.record_db_duplicate()
+                counters["duplicates"] += 1
+                message.ack()
+                return "ack"
+
+        if settings.pipeline_mode == "leased":
+            # The stored job is claimed by stage workers in any process.
+            counters["acked"] += 1
+            message.ack()
+            return "ack"
+        pipeline.process_job(job, until="store")
+    except pipeline.JobSkipped as e:
+        print(f"INFO: Review job skipped: {e}")
+        pipeline.fail_job(job, "skipped", e)
+        counters["dropped"] += 1
+        message.ack()
+        return "ack"
+    except Exception as e:
+        print(f"Error processing Pub/Sub message {message.message_id}: {e}")
+        idempotency.release(message.message_id, review["review_id"])
+        counters["nacked"] += 1
+        message.nack()
+        return "nack"
+
+    counters["acked"] += 1
+    message.ack()
+
+    try:
+        pipeline.process_job(job)
+    except Exception as e:
+        # The row is stored; a web process recovers this job once it is abandoned.
+        print(f"Error notifying for review job {job['id']}: {e}")
+    return "ack"
+
+def _reconcile_stats(stopped: threading.Event):
+    """
+    Reconciles the dashboard counters like the web process does: posts are
+    recorded there, so the counters in this process drift without it.
+    """
+    while not stopped.wait(settings.stats_reconcile_interval):
+        try:
+            drifted = stats_service.reconcile()
+            if drifted:
+                print(f"INFO: Corrected daily stats drift for {drifted} clients")
+        except Exception as e:
+            print(f"Error in daily stats reconciliation: {e}")
+
+def run(subscription: str):
+    client_registry.warm_up()
+    outbound.start()
+    stopped = threading.Event()
+    if settings.stats_reconcile_interval > 0:
+        threading.Thread(target=_reconcile_stats, args=(stopped,), name="stats-reconcile", daemon=True).start()
+
+    subscriber = pubsub_v1.SubscriberClient()
+    flow_control = pubsub_v1.types.FlowControl(
+        max_messages=settings.pubsub_max_messages,
+        max_bytes=settings.pubsub_max_bytes
+    )
+    scheduler = ThreadScheduler(
+        executor=ThreadPoolExecutor(max_workers=settings.pubsub_consumer_threads, thread_name_prefix="pubsub")
+    )
+    future = subscriber.subscribe(subscription, callback=handle_message, flow_control=flow_control, scheduler=scheduler)
+    print(
+        f"INFO: Listening on {subscription} "
+        f"(max {settings.pubsub_max_messages} messages / {settings.pubsub_max_bytes} bytes outstanding)"
+    )
+
+    def shutdown(signum, frame):
+        print("INFO: Shutting down consumer...")
+        future.cancel()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    with subscriber:
+        try:
+            future.result()
+        except Exception as e:
+            if not future.cancelled():
+                print(f"Error in streaming pull: {e}")
+                return 1
+    stopped.set()
+    notifier.flush_all()
+    outbound.stop()
+    # Writes buffered draft and status updates before closing the pool.
+    repository.close()
+    print(f"INFO: Consumer stopped: {counters}")
+    return 0
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Consume Google review notifications with streaming pull.")
+    parser.add_argument("--subscription", default=settings.pubsub_subscription,
+                        help="Full subscription path, e.g. projects/<p>/subscriptions/<s>")
+    args = parser.parse_args(argv)
+
+    if not args.subscription:
+        print("Error: No subscription configured (set PUBSUB_SUBSCRIPTION or pass --subscription).")
+        return 1
+    if settings.pipeline_mode != "leased" and isinstance(sessions.store, sessions.MemorySessionStore):
+        # Dashboards sent from here would be answered by a web process that
+        # cannot see which reviews they showed.
+        print("Error: The consumer sends dashboards and needs SESSION_BACKEND=supabase (or PIPELINE_MODE=leased).")
+        return 1
+    return run(args.subscription)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+import os
+import socket
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -7,11 +9,169 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     openai_org_id: str = ""
     openai_project_id: str = ""
+    openai_base_url: str = ""
     twilio_account_sid: str = ""
     twilio_auth_token: str = ""
     twilio_whatsapp_number: str = ""
+    twilio_api_base_url: str = ""
+    google_api_base_url: str = ""
     test_mode: bool = False
+
+    # Review pipeline (draft -> store -> notify)
+    pipeline_workers: int = 4
+    pipeline_max_attempts: int = 5
+    pipeline_retry_base_delay: float = 2.0
+    pipeline_drain_timeout: float = 30.0
+    # Local mode: queued jobs untouched for pipeline_recovery_age seconds were
+    # left by a process that stopped and are picked up by the next start or
+    # the periodic sweep. Must exceed the longest wait in a live queue.
+    pipeline_recovery_age: float = 900.0
+    pipeline_recovery_interval: float = 60.0
+
+    # Fair scheduling in the local pipeline: clients share the workers in
+    # proportion to clients.drafting_weight, at most pipeline_tenant_concurrency
+    # jobs each. Past the queue limits (0 = none) the Pub/Sub webhook answers
+    # 429 so the message is redelivered later.
+    pipeline_tenant_concurrency: int = 2
+    pipeline_max_queue: int = 2000
+    pipeline_tenant_max_queue: int = 200
+
+    # "leased" lets any number of processes share the work: each stage is
+    # claimed from review_jobs with FOR UPDATE SKIP LOCKED leases instead of
+    # an in-process queue. Stage worker counts of 0 use pipeline_workers.
+    pipeline_mode: str = "local"
+    pipeline_draft_workers: int = 0
+    pipeline_store_workers: int = 0
+    pipeline_notify_workers: int = 0
+    pipeline_lease_seconds: int = 120
+    pipeline_poll_interval: float = 1.0
+    posting_lease_seconds: int = 300
+
+    # Data access for clients and pending_reviews (see app/db/repository.py):
+    # "supabase", "postgres" (asyncpg pool on database_url) or "memory".
+    repository_backend: str = "supabase"
+    database_url: str = ""
+    database_pool_min: int = 1
+    database_pool_max: int = 10
+    # Draft rotations and status transitions after posting are written in
+    # batches every write_behind_interval seconds (0 = right away).
+    write_behind_interval: float = 0.005
+    write_behind_max_batch: int = 200
+
+    # Shared SDK clients
+    http_pool_size: int = 20
+    google_token_refresh_interval: float = 300.0
+    # When the SDKs are imported and their clients built: "blocking" before
+    # the app serves requests, "background" once it is serving, "lazy" on
+    # first use (no proactive Google token refresh).
+    client_warm_up: str = "background"
+
+    # Tenant (clients row) cache
+    tenant_cache_ttl: float = 300.0
+    tenant_cache_size: int = 5000
+    tenant_cache_negative_ttl: float = 60.0
+    # Required by /webhook/supabase/clients, which is refused without it. An
+    # invalidation reaches only the process that receives it; other workers
+    # keep serving the old row for up to tenant_cache_ttl seconds.
+    supabase_webhook_secret: str = ""
+
+    # Dashboard counters
+    stats_reconcile_interval: float = 600.0
+
+    # Hot/cold storage: posted and rejected reviews older than retention_days
+    # move to pending_reviews_archive, retention_batch_size rows per
+    # transaction, every retention_interval seconds (0 = off).
+    retention_days: int = 30
+    retention_interval: float = 3600.0
+    retention_batch_size: int = 500
+    retention_max_batches: int = 200
+    retention_batch_pause: float = 0.2
+
+    # "ALL" batch posting
+    batch_post_concurrency: int = 8
+    batch_post_rate_per_location: float = 5.0
+    batch_post_burst_per_location: float = 5.0
+    batch_post_progress_every: int = 25
+
+    # Pub/Sub deduplication
+    idempotency_cache_size: int = 100000
+
+    # Drafting fast paths
+    template_max_words: int = 4
+    reply_cache_size: int = 10000
+    draft_candidates: int = 3
+
+    # Drafting model routes (see model_router): simple positive reviews use
+    # the fast model, everything else the strong one. The fast route has its
+    # own latency budget and falls back to the strong model.
+    model_routing: bool = True
+    openai_strong_model: str = "gpt-4o"
+    openai_fast_model: str = "gpt-4o-mini"
+    openai_fast_timeout: float = 8.0
+    openai_fast_hedge_after: float = 3.0
+    route_fast_max_words: int = 40
+    # Compiled per-client prompt prefixes (see prompts.PromptCache)
+    prompt_cache_size: int = 5000
+
+    # Pre-drafting spam screen (see spam_filter). Suspected fakes are stored
+    # as 'needs_review' without a model call.
+    spam_filter: bool = True
+    # Jaccard similarity of word bigrams that counts as a near-duplicate;
+    # reviews shorter than spam_min_words are only checked for bursts.
+    spam_similarity: float = 0.8
+    spam_min_words: int = 6
+    spam_window_seconds: int = 7 * 86400
+    spam_max_reviews: int = 20000
+    # More than spam_burst_limit reviews for a location within the window
+    spam_burst_limit: int = 15
+    spam_burst_window: int = 600
+    spam_max_locations: int = 10000
+
+    # Historical review backfill
+    backfill_concurrency: int = 8
+
+    # Streaming-pull consumer (python -m app.consumer)
+    pubsub_subscription: str = ""
+    pubsub_max_messages: int = 100
+    pubsub_max_bytes: int = 10 * 1024 * 1024
+    pubsub_consumer_threads: int = 8
+
+    # WhatsApp digest coalescing (0 disables it)
+    digest_window_seconds: float = 30.0
+    digest_max_items: int = 10
+
+    # Per-phone session (which reviews the last message showed): "supabase"
+    # or "memory". Empty uses Supabase whenever it is configured, since the
+    # consumer sends dashboards that the web process answers.
+    session_backend: str = ""
+    session_ttl: float = 7 * 24 * 3600
+    session_cache_size: int = 10000
+
+    # Outbound WhatsApp dispatcher
+    outbound_workers: int = 4
+    outbound_rate_per_sender: float = 20.0
+    outbound_burst_per_sender: float = 20.0
+    outbound_max_attempts: int = 5
+    outbound_retry_base_delay: float = 1.0
+    outbound_retry_max_delay: float = 30.0
+
+    # Timeouts, retry budgets and circuit breakers for external calls
+    openai_timeout: float = 30.0
+    openai_max_retries: int = 1
+    openai_hedge_after: float = 10.0
+    google_timeout: float = 10.0
+    google_max_retries: int = 2
+    twilio_timeout: float = 10.0
+    retry_budget_ratio: float = 0.2
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 5.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
     
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
+
+def worker_id():
+    """Identifies this process (host:pid) in work leases."""
+    return f"{socket.gethostname()}:{os.getpid()}"
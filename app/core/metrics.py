@@ -0,0 +1,181 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Latency buckets in seconds, from cache hits up to slow OpenAI completions.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Review received -> reply posted; owners approve within minutes to days.
+REPLY_LATENCY_BUCKETS = (60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 24 * 3600, 3 * 86400, 7 * 86400)
+
+def _label_key(labels: dict):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key: tuple, extra: dict = None):
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    """Fixed-bucket histogram; observing is one bisect and three additions."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(labels))
+        return series[-1] if series else 0
+
+    def labels(self):
+        """The label sets observed so far, e.g. [{"stage": "decode"}, ...]."""
+        with self._lock:
+            return [dict(key) for key in self._series]
+
+    def quantile(self, q: float, **labels):
+        """
+        Estimates the q-quantile by interpolating inside the bucket that holds
+        it. Returns None before the first observation.
+        """
+        with self._lock:
+            series = list(self._series.get(_label_key(labels)) or [])
+        if not series or not series[-1]:
+            return None
+        rank = q * series[-1]
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, series):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return self.buckets[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {round(series[-2], 6)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+STAGE_LATENCY = Histogram(
+    "review_stage_latency_seconds",
+    "Latency of each review pipeline stage (decode, client_lookup, openai_draft, insert, stats, twilio_send, google_post)."
+)
+REVIEW_OUTCOMES = Counter(
+    "review_outcomes_total",
+    "Review pipeline outcomes (accepted, duplicate, client_not_found, ai_generation_failed, ...)."
+)
+REPLY_LATENCY = Histogram(
+    "review_reply_latency_seconds",
+    "End-to-end time from review received to reply posted on Google (SLO).",
+    REPLY_LATENCY_BUCKETS
+)
+QUEUE_WAIT = Histogram(
+    "review_queue_wait_seconds",
+    "Time review jobs wait in the fair pipeline queue before a worker starts them."
+)
+DRAFT_LATENCY = Histogram(
+    "review_draft_latency_seconds",
+    "Latency of each drafting model call, per route and model."
+)
+DRAFT_ROUTES = Counter(
+    "review_draft_calls_total",
+    "Drafting model calls per route, routing reason and outcome (ok, rejected, error)."
+)
+DRAFT_TOKENS = Counter(
+    "review_draft_tokens_total",
+    "Prompt, cached prompt and completion tokens used by drafting, per route."
+)
+DRAFT_COST = Counter(
+    "review_draft_cost_usd_total",
+    "Estimated drafting cost in USD, per route."
+)
+
+@contextmanager
+def timer(stage: str):
+    """Times the enclosed block into the per-stage latency histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage=stage)
+
+def record_outcome(outcome: str, count: int = 1):
+    REVIEW_OUTCOMES.inc(count, outcome=outcome)
+
+def observe_reply_latency(received_at: str, posted_at: datetime = None):
+    """Records the received -> posted SLO for a pending_reviews row."""
+    if not received_at:
+        return
+    try:
+        received = datetime.fromisoformat(received_at)
+    except (TypeError, ValueError):
+        return
+    posted_at = posted_at or datetime.now(timezone.utc)
+    REPLY_LATENCY.observe(max(0.0, (posted_at - received).total_seconds()))
+
+def _flatten(prefix: str, value, lines: list):
+    if isinstance(value, bool):
+        lines.append(f"{prefix} {int(value)}")
+    elif isinstance(value, (int, float)):
+        lines.append(f"{prefix} {value}")
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}_{key}", item, lines)
+
+def render_prometheus(gauges: dict = None):
+    """
+    Renders all metrics in the Prometheus text format. `gauges` holds the
+    numeric /internal/stats sections, exported as review_app_<section>_<key>.
+    """
+    lines = []
+    for metric in (STAGE_LATENCY, REVIEW_OUTCOMES, REPLY_LATENCY, QUEUE_WAIT, DRAFT_LATENCY, DRAFT_ROUTES, DRAFT_TOKENS, DRAFT_COST):
+        lines += metric.render()
+    for section, values in (gauges or {}).items():
+        _flatten(f"review_app_{section}", values, lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,189 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.core.config import settings
+
+class CircuitOpenError(Exception):
+    """The dependency's circuit breaker is open; the call was not attempted."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds. Then one trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "open" and self.retry_after() == 0:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "open" or (self.state == "half_open" and self._trial_in_flight):
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self.retry_after() or self.reset_timeout)
+            if self.state == "half_open":
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self.failures = 0
+            self.state = "closed"
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.counters["opened"] += 1
+                    print(f"Warning: Circuit '{self.name}' opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "state": self.state, "open": self.state != "closed", "consecutive_failures": self.failures, "retry_after": round(self.retry_after(), 2)}
+
+class RetryBudget:
+    """
+    Caps retries to `ratio` of the requests seen in the last `window`
+    seconds (plus a small floor), so an outage cannot multiply traffic.
+    """
+
+    def __init__(self, ratio: float, min_retries: int = 3, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def _trim(self, now: float):
+        for events in (self._requests, self._retries):
+            while events and events[0] < now - self.window:
+                events.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_retry(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) < self.min_retries + self.ratio * len(self._requests):
+                self._retries.append(now)
+                return True
+            self.exhausted += 1
+            return False
+
+class Dependency:
+    """Breaker, retry budget and retry policy for one external service."""
+
+    def __init__(self, name: str, timeout: float, max_retries: int):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker(name, settings.breaker_failure_threshold, settings.breaker_reset_timeout)
+        self.budget = RetryBudget(settings.retry_budget_ratio)
+
+    def stats(self):
+        return {**self.breaker.stats(), "timeout": self.timeout, "retry_budget_exhausted": self.budget.exhausted}
+
+DEPENDENCIES = {
+    "openai": Dependency("openai", settings.openai_timeout, settings.openai_max_retries),
+    "google": Dependency("google", settings.google_timeout, settings.google_max_retries),
+    "twilio": Dependency("twilio", settings.twilio_timeout, 0)
+}
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+def _backoff(attempt: int):
+    return random.uniform(0, min(settings.retry_max_delay, settings.retry_base_delay * (2 ** (attempt - 1))))
+
+def _hedged(fn, args, kwargs, hedge_after: float):
+    """
+    Starts `fn`; if it has not finished after `hedge_after` seconds, starts a
+    second copy and returns whichever succeeds first.
+    """
+    first = _hedge_executor.submit(fn, *args, **kwargs)
+    done, _ = wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+
+    pending = {first, _hedge_executor.submit(fn, *args, **kwargs)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+    raise error
+
+def call(name: str, fn, *args, retryable=lambda error: True, hedge_after: float = 0, max_retries: int = None, **kwargs):
+    """
+    Calls `fn` through the named dependency's circuit breaker, retrying
+    retryable errors with jittered backoff while the retry budget allows.
+    `max_retries` overrides the dependency's retry count for this call.
+    Raises CircuitOpenError without calling `fn` when the circuit is open.
+    Timeouts are configured on the SDK clients themselves (see settings).
+    """
+    dependency = DEPENDENCIES[name]
+    dependency.budget.record_request()
+    retries = dependency.max_retries if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        attempt += 1
+        dependency.breaker.before_call()
+        try:
+            if hedge_after and hedge_after > 0:
+                result = _hedged(fn, args, kwargs, hedge_after)
+            else:
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            if not retryable(e):
+                # The dependency answered; the request itself was bad.
+                dependency.breaker.record_success()
+                raise
+            dependency.breaker.record_failure()
+            if attempt > retries or not dependency.budget.try_retry():
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        dependency.breaker.record_success()
+        return result
+
+def breaker_stats():
+    return {name: dependency.stats() for name, dependency in DEPENDENCIES.items()}
@@ -0,0 +1,19 @@
+-- Migration: Create review_jobs table
+-- Description: Durable queue of Pub/Sub notifications for the background review pipeline.
+
+CREATE TABLE IF NOT EXISTS review_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    message_id TEXT,
+    payload JSONB NOT NULL,
+    stage TEXT NOT NULL DEFAULT 'draft',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    draft JSONB,
+    pending_review_id UUID REFERENCES pending_reviews(id) ON DELETE SET NULL,
+    last_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Index for re-queueing unfinished jobs on startup
+CREATE INDEX IF NOT EXISTS idx_review_jobs_status ON review_jobs(status, created_at);
@@ -0,0 +1,53 @@
+-- Migration: Idempotent review ingestion
+-- Description: Unique keys so Pub/Sub redeliveries cannot create duplicate jobs or drafts.
+
+ALTER TABLE review_jobs
+ADD COLUMN IF NOT EXISTS google_review_id TEXT;
+
+UPDATE review_jobs SET google_review_id = payload->>'review_id' WHERE google_review_id IS NULL;
+
+-- Keep the oldest job for reviews that were already ingested more than once
+DELETE FROM review_jobs a
+USING review_jobs b
+WHERE a.google_review_id = b.google_review_id
+  AND (a.created_at, a.id) > (b.created_at, b.id);
+
+DELETE FROM review_jobs a
+USING review_jobs b
+WHERE a.message_id = b.message_id
+  AND (a.created_at, a.id) > (b.created_at, b.id);
+
+-- For drafts, keep the row furthest along (a posted reply must never be dropped for an older
+-- pending copy, which would then be posted again), oldest first among equals. The removed rows
+-- are kept in pending_reviews_duplicates.
+CREATE TABLE IF NOT EXISTS pending_reviews_duplicates (
+    LIKE pending_reviews,
+    removed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+WITH ranked AS (
+    SELECT id, row_number() OVER (
+        PARTITION BY google_review_id
+        ORDER BY CASE status::TEXT
+                     WHEN 'posted' THEN 0
+                     WHEN 'posting' THEN 1
+                     WHEN 'approved' THEN 2
+                     WHEN 'pending' THEN 3
+                     ELSE 4
+                 END,
+                 created_at, id
+    ) AS position
+    FROM pending_reviews
+), removed AS (
+    DELETE FROM pending_reviews p
+    USING ranked r
+    WHERE p.id = r.id AND r.position > 1
+    RETURNING p.*
+)
+INSERT INTO pending_reviews_duplicates
+SELECT removed.*, NOW() FROM removed;
+
+-- NULL keys never conflict, so notifications without a messageId are still accepted
+CREATE UNIQUE INDEX IF NOT EXISTS uq_review_jobs_message_id ON review_jobs(message_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_review_jobs_google_review_id ON review_jobs(google_review_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_pending_reviews_google_review_id ON pending_reviews(google_review_id);
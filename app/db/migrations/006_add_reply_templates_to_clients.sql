@@ -0,0 +1,6 @@
+-- Migration: Add reply_templates to clients table
+-- Description: Optional per-client template replies for empty or generic-praise reviews.
+-- Shape: {"ar-om": {"5": ["..."], "4": ["..."]}, "en": {"5": ["..."]}}
+
+ALTER TABLE clients
+ADD COLUMN IF NOT EXISTS reply_templates JSONB;
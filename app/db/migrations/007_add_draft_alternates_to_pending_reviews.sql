@@ -0,0 +1,5 @@
+-- Migration: Add draft_alternates to pending_reviews table
+-- Description: Spare drafts generated up front so "2 / Regenerate" can answer instantly.
+
+ALTER TABLE pending_reviews
+ADD COLUMN IF NOT EXISTS draft_alternates JSONB NOT NULL DEFAULT '[]'::jsonb;
@@ -0,0 +1,14 @@
+-- Migration: Create outbound_dead_letters table
+-- Description: WhatsApp messages that still failed after all retries, kept for inspection and resend.
+
+CREATE TABLE IF NOT EXISTS outbound_dead_letters (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    to_number TEXT NOT NULL,
+    from_number TEXT NOT NULL,
+    body TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbound_dead_letters_created_at ON outbound_dead_letters(created_at);
@@ -0,0 +1,6 @@
+-- Migration: Add lifecycle timestamps to pending_reviews table
+-- Description: received_at / posted_at for the "review received -> reply posted" latency SLO.
+
+ALTER TABLE pending_reviews
+ADD COLUMN IF NOT EXISTS received_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS posted_at TIMESTAMPTZ;
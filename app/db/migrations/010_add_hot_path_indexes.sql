@@ -0,0 +1,19 @@
+-- Migration: Indexes for the hot lookups
+-- Description: Every Pub/Sub notification resolves its client by google_location_id, and every
+-- WhatsApp reply reads the client's latest pending review or today's posted count.
+
+-- Tenant lookup for incoming notifications (001 only indexed phone_number)
+CREATE INDEX IF NOT EXISTS idx_clients_google_location_id ON clients(google_location_id);
+
+-- "Latest pending review" and the pending count: only pending rows, already in created_at order
+CREATE INDEX IF NOT EXISTS idx_pending_reviews_client_pending_created
+ON pending_reviews(client_id, created_at DESC)
+WHERE status = 'pending';
+
+-- "Posted today" count
+CREATE INDEX IF NOT EXISTS idx_pending_reviews_client_posted_updated
+ON pending_reviews(client_id, updated_at)
+WHERE status = 'posted';
+
+-- idx_pending_reviews_client_status (002) stays: the ON DELETE CASCADE from clients, the
+-- needs_review lookup and posting claims have no other index leading with client_id.
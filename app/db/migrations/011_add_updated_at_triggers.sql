@@ -0,0 +1,28 @@
+-- Migration: Maintain updated_at on every update
+-- Description: The "posted today" count filters on updated_at, which nothing set on UPDATE.
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_clients_updated_at ON clients;
+CREATE TRIGGER trg_clients_updated_at
+BEFORE UPDATE ON clients
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trg_pending_reviews_updated_at ON pending_reviews;
+CREATE TRIGGER trg_pending_reviews_updated_at
+BEFORE UPDATE ON pending_reviews
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trg_review_jobs_updated_at ON review_jobs;
+CREATE TRIGGER trg_review_jobs_updated_at
+BEFORE UPDATE ON review_jobs
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
@@ -0,0 +1,41 @@
+-- Migration: Single round trip for WhatsApp actions
+-- Description: Resolves phone -> client -> latest pending review (and today's counts) for the
+-- "1" (approve) and "2" (regenerate) replies, instead of three or four separate queries.
+-- p_since is the start of "today" as the app sees it (its local midnight), so the posted count
+-- uses the same day boundary as the app's dashboard counters whatever the database's timezone.
+-- Called as supabase.rpc("get_pending_review_context", {...}).
+
+DROP FUNCTION IF EXISTS get_pending_review_context(TEXT, BOOLEAN);
+
+CREATE OR REPLACE FUNCTION get_pending_review_context(
+    p_phone_number TEXT,
+    p_since TIMESTAMPTZ,
+    p_with_stats BOOLEAN DEFAULT TRUE
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'client', to_jsonb(c),
+        'review', (
+            SELECT to_jsonb(r)
+            FROM pending_reviews r
+            WHERE r.client_id = c.id AND r.status = 'pending'
+            ORDER BY r.created_at DESC
+            LIMIT 1
+        ),
+        'stats', CASE WHEN p_with_stats THEN jsonb_build_object(
+            'pending', (
+                SELECT count(*) FROM pending_reviews r
+                WHERE r.client_id = c.id AND r.status = 'pending'
+            ),
+            'posted', (
+                SELECT count(*) FROM pending_reviews r
+                WHERE r.client_id = c.id AND r.status = 'posted' AND r.updated_at >= p_since
+            )
+        ) END
+    )
+    FROM clients c
+    WHERE c.phone_number = p_phone_number;
+$$;
@@ -0,0 +1,17 @@
+-- Migration: Create whatsapp_sessions table
+-- Description: Which pending_reviews the last dashboard/digest sent to each phone showed, so
+-- "1" / "2" / "1 3" replies resolve with one keyed read. Shared by the web and consumer processes
+-- (SESSION_BACKEND=supabase); one row per phone, overwritten on every message.
+
+CREATE TABLE IF NOT EXISTS whatsapp_sessions (
+    phone_number TEXT PRIMARY KEY,
+    client_id UUID REFERENCES clients(id) ON DELETE CASCADE,
+    review_ids JSONB NOT NULL DEFAULT '[]'::jsonb,
+    expires_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+DROP TRIGGER IF EXISTS trg_whatsapp_sessions_updated_at ON whatsapp_sessions;
+CREATE TRIGGER trg_whatsapp_sessions_updated_at
+BEFORE UPDATE ON whatsapp_sessions
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
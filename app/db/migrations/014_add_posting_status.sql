@@ -0,0 +1,6 @@
+-- Migration: Add 'posting' review status
+-- Description: A review is moved to 'posting' by the worker that claimed it before its reply is
+-- sent to Google, so two processes can never post the same review. Kept in its own migration
+-- because a new enum value cannot be used in the transaction that adds it.
+
+ALTER TYPE review_status ADD VALUE IF NOT EXISTS 'posting';
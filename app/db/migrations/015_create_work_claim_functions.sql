@@ -0,0 +1,82 @@
+-- Migration: Lease-based work claiming for multi-worker deployments
+-- Description: Workers in any number of processes claim review_jobs stages and reviews to post
+-- with FOR UPDATE SKIP LOCKED, so each item is handed to exactly one worker. A lease that is not
+-- released before it expires (crashed or stuck worker) is reclaimed by the next claim.
+
+ALTER TABLE review_jobs
+ADD COLUMN IF NOT EXISTS lease_owner TEXT,
+ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS available_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+ALTER TABLE pending_reviews
+ADD COLUMN IF NOT EXISTS lease_owner TEXT,
+ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+
+-- Claimable jobs per stage, oldest first
+CREATE INDEX IF NOT EXISTS idx_review_jobs_claimable
+ON review_jobs(stage, available_at, created_at)
+WHERE status = 'queued';
+
+-- Reviews stuck in 'posting' after their lease expired
+CREATE INDEX IF NOT EXISTS idx_pending_reviews_posting_lease
+ON pending_reviews(lease_expires_at)
+WHERE status = 'posting';
+
+CREATE OR REPLACE FUNCTION claim_review_jobs(
+    p_stage TEXT,
+    p_worker TEXT,
+    p_limit INTEGER DEFAULT 1,
+    p_lease_seconds INTEGER DEFAULT 120
+)
+RETURNS SETOF review_jobs
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE review_jobs j
+    SET lease_owner = p_worker,
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+    WHERE j.id IN (
+        SELECT id FROM review_jobs
+        WHERE status = 'queued'
+          AND stage = p_stage
+          AND available_at <= NOW()
+          AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+        ORDER BY created_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.*;
+END;
+$$;
+
+-- Claims a client's reviews for posting: the given ids, or every pending review when p_review_ids
+-- is NULL. Returns only the rows this caller won; rows claimed by another worker are skipped.
+-- A 'posting' row whose lease expired is claimed again: its earlier attempt may or may not have
+-- reached Google, and updateReply replaces the reply, so a retry never creates a second reply.
+CREATE OR REPLACE FUNCTION claim_reviews_for_posting(
+    p_client_id UUID,
+    p_review_ids UUID[],
+    p_worker TEXT,
+    p_lease_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF pending_reviews
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE pending_reviews r
+    SET status = 'posting',
+        lease_owner = p_worker,
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+    WHERE r.id IN (
+        SELECT id FROM pending_reviews
+        WHERE client_id = p_client_id
+          AND (p_review_ids IS NULL OR id = ANY(p_review_ids))
+          AND (status = 'pending' OR (status = 'posting' AND lease_expires_at < NOW()))
+        ORDER BY created_at
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING r.*;
+END;
+$$;
@@ -0,0 +1,6 @@
+-- Migration: Add drafting_weight to clients table
+-- Description: Share of pipeline workers a client gets under fair scheduling, relative to other
+-- clients with queued reviews (e.g. 2 for a plan with double priority).
+
+ALTER TABLE clients
+ADD COLUMN IF NOT EXISTS drafting_weight INTEGER NOT NULL DEFAULT 1 CHECK (drafting_weight > 0);
@@ -0,0 +1,7 @@
+-- Migration: Add 'needs_review' review status
+-- Description: Reviews the pre-drafting spam screen flags (near-duplicates of recent reviews or part
+-- of a burst for one location) are stored as 'needs_review' with an empty draft and are not sent
+-- to the client's WhatsApp dashboard. Kept in its own migration because a new enum value cannot be
+-- used in the transaction that adds it.
+
+ALTER TYPE review_status ADD VALUE IF NOT EXISTS 'needs_review';
@@ -0,0 +1,117 @@
+-- Migration: Hot/cold storage for pending_reviews
+-- Description: Posted and rejected reviews are moved out of pending_reviews into
+-- pending_reviews_archive once they are older than the retention period, so the hot table only
+-- holds open work and recent history. The archive is range-partitioned by month of created_at;
+-- monthly partitions are created on demand by the mover. Reporting reads pending_reviews_history,
+-- which spans both tables.
+-- Columns added to pending_reviews later must be added here and to archive_pending_reviews too.
+
+CREATE TABLE IF NOT EXISTS pending_reviews_archive (
+    id UUID NOT NULL,
+    client_id UUID,
+    google_review_id TEXT NOT NULL,
+    review_text TEXT,
+    star_rating INTEGER,
+    draft_reply TEXT,
+    draft_alternates JSONB,
+    status review_status NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ,
+    received_at TIMESTAMPTZ,
+    posted_at TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Catches rows outside every monthly partition (e.g. created_at far in the future)
+CREATE TABLE IF NOT EXISTS pending_reviews_archive_default PARTITION OF pending_reviews_archive DEFAULT;
+
+-- Per-client reporting and the backfill's "already stored" check
+CREATE INDEX IF NOT EXISTS idx_pending_reviews_archive_client_created
+ON pending_reviews_archive(client_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_pending_reviews_archive_google_review_id
+ON pending_reviews_archive(google_review_id);
+
+-- Terminal rows in the order the mover takes them
+CREATE INDEX IF NOT EXISTS idx_pending_reviews_terminal_updated
+ON pending_reviews(updated_at)
+WHERE status IN ('posted', 'rejected');
+
+CREATE OR REPLACE FUNCTION ensure_pending_reviews_archive_partition(p_month DATE)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start DATE := date_trunc('month', p_month)::DATE;
+    v_name TEXT := format('pending_reviews_archive_%s', to_char(v_start, 'YYYY_MM'));
+BEGIN
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+    -- Two movers may reach a new month at the same time.
+    PERFORM pg_advisory_xact_lock(hashtext('pending_reviews_archive'));
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF pending_reviews_archive FOR VALUES FROM (%L) TO (%L)',
+        v_name, v_start, (v_start + INTERVAL '1 month')::DATE
+    );
+END;
+$$;
+
+-- Moves up to p_limit posted or rejected reviews last updated more than p_older_than_days ago
+-- into the archive, oldest first, in one transaction. Rows locked by another mover are skipped.
+-- Returns the number of rows moved; callers repeat until it is below p_limit.
+CREATE OR REPLACE FUNCTION archive_pending_reviews(p_older_than_days INTEGER, p_limit INTEGER DEFAULT 500)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_ids UUID[];
+    v_month DATE;
+    v_moved INTEGER;
+BEGIN
+    SELECT array_agg(id) INTO v_ids
+    FROM (
+        SELECT id FROM pending_reviews
+        WHERE status IN ('posted', 'rejected')
+          AND updated_at < NOW() - make_interval(days => p_older_than_days)
+          AND created_at IS NOT NULL
+        ORDER BY updated_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ) batch;
+
+    IF v_ids IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    FOR v_month IN
+        SELECT DISTINCT date_trunc('month', created_at)::DATE FROM pending_reviews WHERE id = ANY(v_ids)
+    LOOP
+        PERFORM ensure_pending_reviews_archive_partition(v_month);
+    END LOOP;
+
+    WITH moved AS (
+        DELETE FROM pending_reviews WHERE id = ANY(v_ids)
+        RETURNING id, client_id, google_review_id, review_text, star_rating, draft_reply,
+                  draft_alternates, status, created_at, updated_at, received_at, posted_at
+    )
+    INSERT INTO pending_reviews_archive (
+        id, client_id, google_review_id, review_text, star_rating, draft_reply,
+        draft_alternates, status, created_at, updated_at, received_at, posted_at
+    )
+    SELECT * FROM moved;
+
+    GET DIAGNOSTICS v_moved = ROW_COUNT;
+    RETURN v_moved;
+END;
+$$;
+
+-- Every review ever drafted, hot or archived, for reporting
+CREATE OR REPLACE VIEW pending_reviews_history AS
+SELECT id, client_id, google_review_id, review_text, star_rating, draft_reply, status,
+       created_at, updated_at, received_at, posted_at, FALSE AS archived
+FROM pending_reviews
+UNION ALL
+SELECT id, client_id, google_review_id, review_text, star_rating, draft_reply, status,
+       created_at, updated_at, received_at, posted_at, TRUE AS archived
+FROM pending_reviews_archive;
@@ -0,0 +1,31 @@
+-- Migration: Batched pending_reviews updates
+-- Description: The repository's write-behind buffer sends draft rotations and status transitions
+-- for many reviews as one JSON array, applied by a single UPDATE instead of one request per row.
+-- Each element is {"id": uuid, "fields": {...}, "expect_status": text|null}; only the fields
+-- present are set, and a row is skipped unless it is still in expect_status (when given).
+-- Called as supabase.rpc("apply_pending_review_updates", {"p_updates": [...]}).
+
+CREATE OR REPLACE FUNCTION apply_pending_review_updates(p_updates JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE pending_reviews r
+    SET draft_reply = CASE WHEN u.fields ? 'draft_reply' THEN u.fields->>'draft_reply' ELSE r.draft_reply END,
+        draft_alternates = CASE WHEN u.fields ? 'draft_alternates'
+                                THEN COALESCE(u.fields->'draft_alternates', '[]'::jsonb) ELSE r.draft_alternates END,
+        status = CASE WHEN u.fields ? 'status' THEN (u.fields->>'status')::review_status ELSE r.status END,
+        posted_at = CASE WHEN u.fields ? 'posted_at' THEN (u.fields->>'posted_at')::timestamptz ELSE r.posted_at END,
+        lease_owner = CASE WHEN u.fields ? 'lease_owner' THEN u.fields->>'lease_owner' ELSE r.lease_owner END,
+        lease_expires_at = CASE WHEN u.fields ? 'lease_expires_at'
+                                THEN (u.fields->>'lease_expires_at')::timestamptz ELSE r.lease_expires_at END
+    FROM jsonb_to_recordset(p_updates) AS u(id UUID, fields JSONB, expect_status TEXT)
+    WHERE r.id = u.id
+      AND (u.expect_status IS NULL OR r.status::TEXT = u.expect_status);
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
@@ -0,0 +1,637 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from app.core.config import settings
+from app.db import supabase as db
+
+# Data access for `clients` and `pending_reviews`. The rest of the app calls
+# the functions at the bottom of this module; the backend behind them is
+# chosen by REPOSITORY_BACKEND:
+#   supabase  PostgREST over HTTP (the default)
+#   postgres  direct asyncpg connection pool on DATABASE_URL
+#   memory    process-local tables, for tests and offline benchmarks
+# Non-critical updates (draft rotations, status transitions after posting)
+# go through WriteBehind and reach the database in multi-row batches.
+
+UNIQUE_VIOLATION = "23505"
+CLIENT_LOOKUP_FIELDS = ("google_location_id", "phone_number")
+REVIEW_INSERT_COLUMNS = (
+    "client_id", "google_review_id", "review_text", "star_rating", "draft_reply",
+    "draft_alternates", "status", "received_at"
+)
+# Fields apply_pending_review_updates (migration 019) knows how to set.
+UPDATABLE_FIELDS = ("draft_reply", "draft_alternates", "status", "posted_at", "lease_owner", "lease_expires_at")
+ARCHIVE_COLUMNS = REVIEW_INSERT_COLUMNS + ("id", "created_at", "updated_at", "posted_at")
+
+class DuplicateKey(Exception):
+    """Unique index violation in the memory backend; carries the SQLSTATE like asyncpg's errors."""
+    sqlstate = UNIQUE_VIOLATION
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+def _start_of_today():
+    # The app's local midnight, in UTC like stored timestamps. "Today" is
+    # always the app's day (stats_service rolls its counters over on the
+    # same clock), never the database's.
+    midnight = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.astimezone(timezone.utc).isoformat()
+
+class SupabaseBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def client_by(self, field: str, key: str):
+        res = self.client.table("clients").select("*").eq(field, key).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    def review_context(self, phone_number: str, with_stats: bool, since: str):
+        res = self.client.rpc("get_pending_review_context", {
+            "p_phone_number": phone_number,
+            "p_since": since,
+            "p_with_stats": with_stats
+        }).execute()
+        return res.data or {}
+
+    def get_pending_review(self, review_id: str):
+        res = self.client.table("pending_reviews") \
+            .select("*") \
+            .eq("id", review_id) \
+            .eq("status", "pending") \
+            .limit(1) \
+            .execute()
+        return res.data[0] if res.data else None
+
+    def held_reviews(self, client_id: str, limit: int):
+        res = self.client.table("pending_reviews") \
+            .select("*") \
+            .eq("client_id", client_id) \
+            .eq("status", "needs_review") \
+            .order("created_at") \
+            .limit(limit) \
+            .execute()
+        return res.data
+
+    def find_review_id(self, google_review_id: str):
+        res = self.client.table("pending_reviews") \
+            .select("id") \
+            .eq("google_review_id", google_review_id) \
+            .execute()
+        return res.data[0]["id"] if res.data else None
+
+    def insert_review(self, row: dict):
+        return self.client.table("pending_reviews").insert(row).execute().data[0]
+
+    def insert_reviews(self, rows: list):
+        self.client.table("pending_reviews") \
+            .upsert(rows, on_conflict="google_review_id", ignore_duplicates=True) \
+            .execute()
+
+    def existing_review_ids(self, google_review_ids: list):
+        existing = set()
+        for table in ("pending_reviews", "pending_reviews_archive"):
+            res = self.client.table(table) \
+                .select("google_review_id") \
+                .in_("google_review_id", google_review_ids) \
+                .execute()
+            existing.update(row["google_review_id"] for row in res.data)
+        return existing
+
+    def count_daily_stats(self, client_id: str, since: str):
+        pending_res = self.client.table("pending_reviews") \
+            .select("id", count="exact") \
+            .eq("client_id", client_id) \
+            .eq("status", "pending") \
+            .execute()
+        posted_res = self.client.table("pending_reviews") \
+            .select("id", count="exact") \
+            .eq("client_id", client_id) \
+            .eq("status", "posted") \
+            .gte("updated_at", since) \
+            .execute()
+        return {"pending": pending_res.count or 0, "posted": posted_res.count or 0}
+
+    def claim_for_posting(self, client_id: str, review_ids: list, worker: str, lease_seconds: int):
+        res = self.client.rpc("claim_reviews_for_posting", {
+            "p_client_id": client_id,
+            "p_review_ids": review_ids,
+            "p_worker": worker,
+            "p_lease_seconds": lease_seconds
+        }).execute()
+        return res.data or []
+
+    def apply_updates(self, updates: list):
+        res = self.client.rpc("apply_pending_review_updates", {"p_updates": updates}).execute()
+        return res.data or 0
+
+    def archive_reviews(self, older_than_days: int, limit: int):
+        res = self.client.rpc("archive_pending_reviews", {
+            "p_older_than_days": older_than_days,
+            "p_limit": limit
+        }).execute()
+        return res.data or 0
+
+    def close(self):
+        pass
+
+def _plain(value):
+    # asyncpg returns UUID and datetime objects; the app works with the
+    # strings PostgREST sends.
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _row(record):
+    return {key: _plain(value) for key, value in record.items()} if record is not None else None
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+class PostgresBackend:
+    """
+    asyncpg pool owned by a private event loop thread. The methods are
+    blocking, like the Supabase client's, and are called from worker
+    threads; each one is a single statement on a pooled connection.
+    """
+
+    def __init__(self, dsn: str, min_size: int, max_size: int):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="repository-postgres", daemon=True)
+        self._thread.start()
+        self._pool = self._run(self._create_pool(dsn, min_size, max_size))
+
+    @staticmethod
+    async def _init_connection(connection):
+        for name in ("json", "jsonb"):
+            await connection.set_type_codec(name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+    async def _create_pool(self, dsn: str, min_size: int, max_size: int):
+        import asyncpg
+        return await asyncpg.create_pool(dsn, min_size=min_size, max_size=max_size, init=self._init_connection)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _fetch(self, query: str, *args):
+        return [_row(record) for record in self._run(self._pool.fetch(query, *args))]
+
+    def _fetchrow(self, query: str, *args):
+        return _row(self._run(self._pool.fetchrow(query, *args)))
+
+    def _fetchval(self, query: str, *args):
+        return self._run(self._pool.fetchval(query, *args))
+
+    def client_by(self, field: str, key: str):
+        if field not in CLIENT_LOOKUP_FIELDS:
+            raise ValueError(f"Unsupported client lookup: {field}")
+        return self._fetchrow(f"SELECT * FROM clients WHERE {field} = $1 LIMIT 1", key)
+
+    def review_context(self, phone_number: str, with_stats: bool, since: str):
+        return self._fetchval(
+            "SELECT get_pending_review_context($1, $2, $3)", phone_number, _timestamp(since), with_stats
+        ) or {}
+
+    def get_pending_review(self, review_id: str):
+        return self._fetchrow("SELECT * FROM pending_reviews WHERE id = $1 AND status = 'pending'", review_id)
+
+    def held_reviews(self, client_id: str, limit: int):
+        return self._fetch(
+            "SELECT * FROM pending_reviews WHERE client_id = $1 AND status = 'needs_review' "
+            "ORDER BY created_at LIMIT $2",
+            client_id, limit
+        )
+
+    def find_review_id(self, google_review_id: str):
+        return _plain(self._fetchval("SELECT id FROM pending_reviews WHERE google_review_id = $1", google_review_id))
+
+    def _insert_values(self, row: dict):
+        values = [row.get(column) for column in REVIEW_INSERT_COLUMNS]
+        values[REVIEW_INSERT_COLUMNS.index("draft_alternates")] = row.get("draft_alternates") or []
+        values[REVIEW_INSERT_COLUMNS.index("status")] = row.get("status") or "pending"
+        values[REVIEW_INSERT_COLUMNS.index("received_at")] = _timestamp(row.get("received_at"))
+        return values
+
+    _INSERT = (
+        f"INSERT INTO pending_reviews ({', '.join(REVIEW_INSERT_COLUMNS)}) "
+        "VALUES ($1, $2, $3, $4, $5, $6::jsonb, $7::review_status, $8)"
+    )
+
+    def insert_review(self, row: dict):
+        return self._fetchrow(self._INSERT + " RETURNING *", *self._insert_values(row))
+
+    def insert_reviews(self, rows: list):
+        query = self._INSERT + " ON CONFLICT (google_review_id) DO NOTHING"
+        self._run(self._pool.executemany(query, [self._insert_values(row) for row in rows]))
+
+    def existing_review_ids(self, google_review_ids: list):
+        rows = self._fetch(
+            "SELECT google_review_id FROM pending_reviews WHERE google_review_id = ANY($1::text[]) "
+            "UNION SELECT google_review_id FROM pending_reviews_archive WHERE google_review_id = ANY($1::text[])",
+            google_review_ids
+        )
+        return {row["google_review_id"] for row in rows}
+
+    def count_daily_stats(self, client_id: str, since: str):
+        # One round trip; the OR lets the planner combine the two partial indexes (migration 010).
+        row = self._fetchrow(
+            "SELECT count(*) FILTER (WHERE status = 'pending') AS pending, "
+            "count(*) FILTER (WHERE status = 'posted') AS posted "
+            "FROM pending_reviews WHERE client_id = $1 "
+            "AND (status = 'pending' OR (status = 'posted' AND updated_at >= $2))",
+            client_id, _timestamp(since)
+        )
+        return {"pending": row["pending"], "posted": row["posted"]}
+
+    def claim_for_posting(self, client_id: str, review_ids: list, worker: str, lease_seconds: int):
+        return self._fetch(
+            "SELECT * FROM claim_reviews_for_posting($1, $2::uuid[], $3, $4)",
+            client_id, review_ids, worker, lease_seconds
+        )
+
+    def apply_updates(self, updates: list):
+        return self._fetchval("SELECT apply_pending_review_updates($1::jsonb)", updates) or 0
+
+    def archive_reviews(self, older_than_days: int, limit: int):
+        return self._fetchval("SELECT archive_pending_reviews($1, $2)", older_than_days, limit) or 0
+
+    def close(self):
+        self._run(self._pool.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+class MemoryBackend:
+    """
+    Process-local tables with the same behaviour as the database functions
+    the other backends call. Not shared between processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.tables = {"clients": [], "pending_reviews": [], "pending_reviews_archive": []}
+
+    def seed(self, table: str, rows: list):
+        with self._lock:
+            for row in rows:
+                self.tables[table].append({"id": str(uuid.uuid4()), "created_at": _now(), "updated_at": _now(), **row})
+
+    def _review(self, review_id: str):
+        return next((row for row in self.tables["pending_reviews"] if row["id"] == review_id), None)
+
+    def client_by(self, field: str, key: str):
+        with self._lock:
+            row = next((row for row in self.tables["clients"] if row.get(field) == key), None)
+            return dict(row) if row else None
+
+    def review_context(self, phone_number: str, with_stats: bool, since: str):
+        with self._lock:
+            client = self.client_by("phone_number", phone_number)
+            if client is None:
+                return {}
+            pending = [row for row in self.tables["pending_reviews"]
+                       if row.get("client_id") == client["id"] and row.get("status") == "pending"]
+            latest = max(pending, key=lambda row: row["created_at"]) if pending else None
+            stats = self.count_daily_stats(client["id"], since) if with_stats else None
+            return {"client": client, "review": dict(latest) if latest else None, "stats": stats}
+
+    def get_pending_review(self, review_id: str):
+        with self._lock:
+            row = self._review(review_id)
+            return dict(row) if row and row.get("status") == "pending" else None
+
+    def held_reviews(self, client_id: str, limit: int):
+        with self._lock:
+            rows = [row for row in self.tables["pending_reviews"]
+                    if row.get("client_id") == client_id and row.get("status") == "needs_review"]
+            return [dict(row) for row in sorted(rows, key=lambda row: row["created_at"])[:limit]]
+
+    def find_review_id(self, google_review_id: str):
+        with self._lock:
+            row = next((row for row in self.tables["pending_reviews"] if row.get("google_review_id") == google_review_id), None)
+            return row["id"] if row else None
+
+    def insert_review(self, row: dict):
+        with self._lock:
+            if row.get("google_review_id") is not None and self.find_review_id(row["google_review_id"]) is not None:
+                raise DuplicateKey(f"Key (google_review_id)=({row.get('google_review_id')}) already exists.")
+            stored = {"id": str(uuid.uuid4()), "status": "pending", "draft_alternates": [],
+                      "created_at": _now(), "updated_at": _now(), **row}
+            self.tables["pending_reviews"].append(stored)
+            return dict(stored)
+
+    def insert_reviews(self, rows: list):
+        with self._lock:
+            for row in rows:
+                try:
+                    self.insert_review(row)
+                except DuplicateKey:
+                    pass
+
+    def existing_review_ids(self, google_review_ids: list):
+        wanted = set(google_review_ids)
+        with self._lock:
+            return {row["google_review_id"] for table in ("pending_reviews", "pending_reviews_archive")
+                    for row in self.tables[table] if row.get("google_review_id") in wanted}
+
+    def count_daily_stats(self, client_id: str, since: str):
+        with self._lock:
+            rows = [row for row in self.tables["pending_reviews"] if row.get("client_id") == client_id]
+            return {
+                "pending": sum(1 for row in rows if row.get("status") == "pending"),
+                "posted": sum(1 for row in rows if row.get("status") == "posted" and row.get("updated_at", "") >= since)
+            }
+
+    def claim_for_posting(self, client_id: str, review_ids: list, worker: str, lease_seconds: int):
+        now = _now()
+        expires_at = (datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)).isoformat()
+        with self._lock:
+            claimed = sorted(
+                (row for row in self.tables["pending_reviews"]
+                 if row.get("client_id") == client_id and (review_ids is None or row["id"] in review_ids)
+                 and (row.get("status") == "pending"
+                      or (row.get("status") == "posting" and (row.get("lease_expires_at") or "") < now))),
+                key=lambda row: row["created_at"]
+            )
+            for row in claimed:
+                row.update(status="posting", lease_owner=worker, lease_expires_at=expires_at, updated_at=now)
+            return [dict(row) for row in claimed]
+
+    def apply_updates(self, updates: list):
+        applied = 0
+        with self._lock:
+            for update in updates:
+                row = self._review(update["id"])
+                if row is None or (update.get("expect_status") and row.get("status") != update["expect_status"]):
+                    continue
+                row.update(update["fields"], updated_at=_now())
+                applied += 1
+        return applied
+
+    def archive_reviews(self, older_than_days: int, limit: int):
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).isoformat()
+        with self._lock:
+            rows = self.tables["pending_reviews"]
+            batch = sorted(
+                (row for row in rows
+                 if row.get("status") in ("posted", "rejected") and row.get("updated_at", "") < cutoff),
+                key=lambda row: row["updated_at"]
+            )[:limit]
+            moved = {id(row) for row in batch}
+            rows[:] = [row for row in rows if id(row) not in moved]
+            archived_at = _now()
+            self.tables["pending_reviews_archive"].extend(
+                {**{column: row.get(column) for column in ARCHIVE_COLUMNS}, "archived_at": archived_at} for row in batch
+            )
+            return len(batch)
+
+    def close(self):
+        pass
+
+class WriteBehind:
+    """
+    Buffers pending_reviews updates and writes them with one
+    apply_pending_review_updates call per flush, every `interval` seconds or
+    as soon as `max_batch` rows are waiting. Updates to the same row are
+    merged, unless they expect a different status: that update waits in a
+    later generation, written after the one before it. Reads through this
+    module flush first, so a process always sees its own writes; other
+    processes may see them up to `interval` late. A batch that fails is
+    retried with the next flush, up to MAX_ATTEMPTS.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, interval: float, max_batch: int):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        # Generations of review_id -> {"id", "fields", "expect_status", "attempts"},
+        # written oldest first; a row appears at most once per generation.
+        self._generations = [OrderedDict()]
+        self._thread = None
+        self._stopping = False
+        self.counters = {"queued": 0, "merged": 0, "flushes": 0, "rows": 0, "errors": 0, "dropped": 0}
+
+    def put(self, review_id: str, fields: dict, expect_status: str = None):
+        with self._cond:
+            self.counters["queued"] += 1
+            newest = next((generation for generation in reversed(self._generations) if review_id in generation), None)
+            if newest is not None and newest[review_id]["expect_status"] == expect_status:
+                newest[review_id]["fields"].update(fields)
+                self.counters["merged"] += 1
+            else:
+                # Merging would change which state the older update expects.
+                index = self._generations.index(newest) + 1 if newest is not None else 0
+                if index == len(self._generations):
+                    self._generations.append(OrderedDict())
+                self._generations[index][review_id] = {"id": review_id, "fields": dict(fields),
+                                                       "expect_status": expect_status, "attempts": 0}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def has_pending(self):
+        return any(self._generations)
+
+    def _waiting(self):
+        return sum(len(generation) for generation in self._generations)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.has_pending() and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                # Let more updates join the batch unless it is already full.
+                deadline = time.monotonic() + self.interval
+                while self._waiting() < self.max_batch and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
+
+    def flush(self):
+        """Writes every buffered update now; returns the number of rows sent."""
+        with self._flush_lock:
+            with self._cond:
+                generations = [generation for generation in self._generations if generation]
+                self._generations = [OrderedDict()]
+            sent = 0
+            for index, generation in enumerate(generations):
+                batch = list(generation.values())
+                for start in range(0, len(batch), self.max_batch):
+                    chunk = batch[start:start + self.max_batch]
+                    try:
+                        get_backend().apply_updates([
+                            {"id": entry["id"], "fields": entry["fields"], "expect_status": entry["expect_status"]}
+                            for entry in chunk
+                        ])
+                    except Exception as e:
+                        print(f"Error writing {len(chunk)} buffered review updates: {e}")
+                        self.counters["errors"] += 1
+                        # Later generations depend on this one; keep them all in order.
+                        self._requeue(batch[start:], generations[index + 1:])
+                        return sent
+                    self.counters["flushes"] += 1
+                    self.counters["rows"] += len(chunk)
+                    sent += len(chunk)
+            return sent
+
+    def _requeue(self, failed: list, later: list):
+        retry = OrderedDict()
+        for entry in failed:
+            entry["attempts"] += 1
+            if entry["attempts"] >= self.MAX_ATTEMPTS:
+                self.counters["dropped"] += 1
+                print(f"Error: Dropped update to review {entry['id']} after {entry['attempts']} attempts "
+                      f"(expect_status={entry['expect_status']}): {entry['fields']}")
+                continue
+            retry[entry["id"]] = entry
+        with self._cond:
+            # Updates queued during the flush were put after these.
+            self._generations[:0] = [retry, *later]
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        self._stopping = False
+
+    def stats(self):
+        with self._cond:
+            return {**self.counters, "buffered": self._waiting()}
+
+backend = None
+_backend_lock = threading.Lock()
+write_behind = WriteBehind(settings.write_behind_interval, settings.write_behind_max_batch)
+
+def _build_backend():
+    if settings.repository_backend == "postgres":
+        return PostgresBackend(settings.database_url, settings.database_pool_min, settings.database_pool_max)
+    if settings.repository_backend == "memory":
+        return MemoryBackend()
+    if db.supabase is None:
+        print("Warning: Supabase not configured. Clients and reviews are kept in memory only.")
+        return MemoryBackend()
+    return SupabaseBackend(db.supabase)
+
+def get_backend():
+    """The configured backend, built on first use (the asyncpg pool connects here)."""
+    global backend
+    if backend is None:
+        with _backend_lock:
+            if backend is None:
+                backend = _build_backend()
+    return backend
+
+def _read_barrier():
+    if write_behind.has_pending():
+        write_behind.flush()
+
+def client_by(field: str, key: str):
+    """The clients row whose `field` (google_location_id or phone_number) is `key`, or None."""
+    return get_backend().client_by(field, key)
+
+def review_context(phone_number: str, with_stats: bool = True):
+    """
+    {"client", "review", "stats"} for a WhatsApp number: its client, latest
+    pending review and (with `with_stats`) today's counts. Empty for an
+    unknown number.
+    """
+    _read_barrier()
+    return get_backend().review_context(phone_number, with_stats, _start_of_today())
+
+def get_pending_review(review_id: str):
+    _read_barrier()
+    return get_backend().get_pending_review(review_id)
+
+def held_reviews(client_id: str, limit: int):
+    """The client's oldest reviews the spam screen held for a human (status needs_review)."""
+    _read_barrier()
+    return get_backend().held_reviews(client_id, limit)
+
+def find_review_id(google_review_id: str):
+    return get_backend().find_review_id(google_review_id)
+
+def insert_review(row: dict):
+    """Inserts a pending_reviews row and returns it; raises a unique violation for a known review."""
+    return get_backend().insert_review(row)
+
+def insert_reviews(rows: list):
+    """Bulk-inserts rows, skipping reviews that are already stored."""
+    get_backend().insert_reviews(rows)
+
+def existing_review_ids(google_review_ids: list):
+    """The given Google review ids already stored, hot or archived."""
+    if not google_review_ids:
+        return set()
+    return get_backend().existing_review_ids(google_review_ids)
+
+def count_daily_stats(client_id: str):
+    _read_barrier()
+    return get_backend().count_daily_stats(client_id, _start_of_today())
+
+def claim_for_posting(client_id: str, review_ids: list, worker: str, lease_seconds: int):
+    _read_barrier()
+    return get_backend().claim_for_posting(client_id, review_ids, worker, lease_seconds)
+
+def _check_fields(fields: dict):
+    unknown = set(fields) - set(UPDATABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Fields cannot be updated through the repository: {sorted(unknown)}")
+
+def update_review(review_id: str, fields: dict, expect_status: str = None):
+    """
+    Queues an update of a pending_reviews row, applied only while the row
+    is in `expect_status` when given. Written by the next write-behind flush,
+    or right away when WRITE_BEHIND_INTERVAL is 0.
+    """
+    _check_fields(fields)
+    if settings.write_behind_interval <= 0:
+        get_backend().apply_updates([{"id": review_id, "fields": fields, "expect_status": expect_status}])
+        return
+    write_behind.put(review_id, fields, expect_status)
+
+def transition_review(review_id: str, fields: dict, expect_status: str):
+    """
+    Updates a pending_reviews row right away, bypassing the write-behind
+    buffer, if it is still in `expect_status`. Returns whether it was, for
+    callers that must act on a transition exactly once.
+    """
+    _check_fields(fields)
+    _read_barrier()
+    return get_backend().apply_updates([{"id": review_id, "fields": fields, "expect_status": expect_status}]) > 0
+
+def archive_reviews(older_than_days: int, limit: int):
+    """Moves up to `limit` posted or rejected reviews older than the cutoff to the archive."""
+    _read_barrier()
+    return get_backend().archive_reviews(older_than_days, limit)
+
+def flush():
+    return write_behind.flush()
+
+def close():
+    """Writes buffered updates and closes the backend's connections."""
+    global backend
+    write_behind.stop()
+    with _backend_lock:
+        if backend is not None:
+            backend.close()
+            backend = None
+
+def stats():
+    return {"backend": type(backend).__name__ if backend is not None else None, "write_behind": write_behind.stats()}
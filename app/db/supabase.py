@@ -1,5 +1,5 @@
 import os
-from supabase import create_client, Client
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,9 +7,42 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+class LazyClient:
+    """
+    Stands in for the Supabase client and builds it on first use. Importing
+    the supabase SDK takes a noticeable part of a cold start, and most of
+    startup does not need it.
+    """
+
+    def __init__(self, url: str, key: str):
+        self._url = url
+        self._key = key
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._client is not None
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+                    self._client = create_client(self._url, self._key)
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
 if not SUPABASE_URL or not SUPABASE_KEY:
     # We allow this for now so the app can start even without env vars, 
     # but actual DB calls will fail.
-    supabase: Client = None 
+    supabase = None
 else:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = LazyClient(SUPABASE_URL, SUPABASE_KEY)
+
+def warm_up():
+    """Builds the client ahead of the first query."""
+    if supabase is not None:
+        supabase.get()
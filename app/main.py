@@ -1,177 +1,249 @@
-from fastapi import FastAPI, Request, Form, Response
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Form, Response, Header
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import base64
+import hmac
 import json
+from datetime import datetime, timezone
+from app.db import repository, supabase as db
 from app.db.supabase import supabase
-from app.services.openai_service import generate_review_reply
-from app.services.whatsapp_service import send_whatsapp_message
+from app.services import batch_poster, client_registry, idempotency, notifier, outbound, pipeline, retention, sessions, spam_filter, stats_service
+from app.services.openai_service import generate_review_reply, draft_stats, get_client as get_openai_client
+from app.services.whatsapp_service import send_whatsapp_message, build_dashboard_message
 from app.services.google_client import post_reply_to_google
+from app.services.stats_service import get_daily_stats, record_status_change
+from app.services.tenant_cache import tenant_cache, get_client_by_phone, handle_client_change
+from app.core import metrics, resilience
+from app.core.config import settings
+
+async def warm_up_clients():
+    """
+    Imports the SDKs and builds the shared clients ahead of the first
+    request, then starts the Google token refresher.
+    """
+    started = asyncio.get_running_loop().time()
+    await client_registry.start()
+    if settings.openai_api_key:
+        await asyncio.to_thread(get_openai_client)
+    await asyncio.to_thread(db.warm_up)
+    await asyncio.to_thread(repository.get_backend)
+    print(f"INFO: Clients warmed up in {asyncio.get_running_loop().time() - started:.2f}s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _warm_up_task
+    if settings.client_warm_up == "blocking":
+        await warm_up_clients()
+    elif settings.client_warm_up == "background":
+        # /health answers while the SDKs load; early requests build what they need.
+        _warm_up_task = asyncio.create_task(warm_up_clients())
+    outbound.start()
+    await pipeline.start()
+    await stats_service.start()
+    await retention.start()
+    yield
+    if _warm_up_task is not None:
+        await asyncio.gather(_warm_up_task, return_exceptions=True)
+        _warm_up_task = None
+    # Let WhatsApp commands that were already acknowledged finish.
+    await asyncio.gather(*_command_tasks, return_exceptions=True)
+    await retention.stop()
+    await stats_service.stop()
+    await pipeline.stop()
+    await asyncio.to_thread(notifier.flush_all)
+    # Writes buffered draft and status updates before closing the pool.
+    await asyncio.to_thread(repository.close)
+    await asyncio.to_thread(outbound.stop)
+    await client_registry.stop()
+
+# WhatsApp commands acknowledged but still running, and per-phone ordering.
+_command_tasks = set()
+_phone_locks = {}  # phone_number -> {"lock": asyncio.Lock, "users": int}, while in use
+_warm_up_task = None
 
 app = FastAPI(
     title="Review Management AI Backend",
     description="FastAPI backend for managing shop reviews and interactions.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
-STAR_RATING_MAP = {
-    "ONE": 1,
-    "TWO": 2,
-    "THREE": 3,
-    "FOUR": 4,
-    "FIVE": 5
-}
+def load_review_context(phone_number: str):
+    """
+    Resolves phone -> client -> latest pending review in one database
+    function call (migration 012). Today's counts are fetched alongside when
+    the dashboard counters do not track the client yet.
+    Returns (client, pending_review); either may be None.
+    """
+    cached = tenant_cache.get("phone_number", phone_number)[1]
+    with_stats = cached is None or not stats_service.is_tracked(cached["id"])
+    context = repository.review_context(phone_number, with_stats)
+    client = context.get("client")
+    if not client:
+        return None, None
+    tenant_cache.put(client)
+    if context.get("stats"):
+        stats_service.seed(client["id"], context["stats"])
+    return client, context.get("review")
 
-def get_daily_stats(client_id: str):
+def resolve_review(phone_number: str):
     """
-    Counts pending and posted reviews for today.
+    Finds the review a "1" / "2" reply refers to. When the last message to
+    the phone was a single-review dashboard, that review is read by id (one
+    keyed read); without a session the latest pending review is used.
+    Returns (client, pending_review); pending_review is None when there is
+    nothing to act on.
     """
-    from datetime import datetime, date
-    today = date.today().isoformat()
-    
-    # pending: Reviews with status 'pending' (formerly 'queued' or 'sent_for_approval' in prompt context)
-    pending_res = supabase.table("pending_reviews") \
-        .select("id", count="exact") \
-        .eq("client_id", client_id) \
-        .eq("status", "pending") \
-        .execute()
-    
-    # posted: Reviews with status 'posted' updated today
-    posted_res = supabase.table("pending_reviews") \
-        .select("id", count="exact") \
-        .eq("client_id", client_id) \
-        .eq("status", "posted") \
-        .gte("updated_at", today) \
-        .execute()
-    
-    return {
-        "pending": pending_res.count or 0,
-        "posted": posted_res.count or 0
-    }
+    session = sessions.get(phone_number)
+    if not session or len(session["review_ids"]) != 1:
+        return load_review_context(phone_number)
+
+    client = get_client_by_phone(phone_number)
+    if not client:
+        return None, None
+    pending_review = repository.get_pending_review(session["review_ids"][0])
+    if not pending_review:
+        send_whatsapp_message(phone_number, "This review was already handled.")
+        return client, None
+    return client, pending_review
 
 async def approve_review(phone_number: str):
-    """Posts the latest pending review to Google."""
-    # Identify Client
-    client_res = supabase.table("clients").select("id").eq("phone_number", phone_number).execute()
-    if not client_res.data:
+    """Posts the review shown in the last dashboard to Google."""
+    client, pending_review = await asyncio.to_thread(resolve_review, phone_number)
+    if not client or not pending_review:
         return False
-    
-    client_id = client_res.data[0]["id"]
-
-    # Get latest pending review
-    pending_res = supabase.table("pending_reviews") \
-        .select("*") \
-        .eq("client_id", client_id) \
-        .eq("status", "pending") \
-        .order("created_at", desc=True) \
-        .limit(1) \
-        .execute()
-
-    if not pending_res.data:
+
+    client_id = client["id"]
+    # Only the worker that wins the claim posts, even if the command is
+    # handled twice (e.g. by two processes).
+    claimed = await asyncio.to_thread(batch_poster.claim_for_posting, client_id, [pending_review["id"]])
+    if not claimed:
+        send_whatsapp_message(phone_number, "This review is already being posted.")
         return False
 
-    pending_review = pending_res.data[0]
-    success = post_reply_to_google(pending_review["google_review_id"], pending_review["draft_reply"])
+    pending_review = claimed[0]
+    success = await asyncio.to_thread(
+        post_reply_to_google, pending_review["google_review_id"], pending_review["draft_reply"]
+    )
     
     if success:
-        supabase.table("pending_reviews").update({"status": "posted"}).eq("id", pending_review["id"]).execute()
+        posted_at = datetime.now(timezone.utc)
+        await asyncio.to_thread(batch_poster.mark_posted, [pending_review["id"]], posted_at)
+        record_status_change(client_id, "pending", "posted")
+        metrics.record_outcome("posted")
+        metrics.observe_reply_latency(pending_review.get("received_at"), posted_at)
         send_whatsapp_message(phone_number, "Review reply posted successfully!")
     else:
+        await asyncio.to_thread(batch_poster.release_claims, [pending_review["id"]])
         send_whatsapp_message(phone_number, "Error posting reply to Google.")
     return success
 
 async def regenerate_draft(phone_number: str):
-    """Generates a new AI draft for the latest pending review."""
-    client_res = supabase.table("clients").select("*").eq("phone_number", phone_number).execute()
-    if not client_res.data:
+    """Generates a new AI draft for the review shown in the last dashboard."""
+    client, pending_review = await asyncio.to_thread(resolve_review, phone_number)
+    if not client or not pending_review:
         return False
-    
-    client = client_res.data[0]
-    client_id = client["id"]
 
-    pending_res = supabase.table("pending_reviews") \
-        .select("*") \
-        .eq("client_id", client_id) \
-        .eq("status", "pending") \
-        .order("created_at", desc=True) \
-        .limit(1) \
-        .execute()
-
-    if not pending_res.data:
-        return False
+    client_id = client["id"]
 
-    pending_review = pending_res.data[0]
-    ai_reply = generate_review_reply(
-        pending_review["review_text"], 
-        pending_review["star_rating"], 
-        client["language_preference"], 
-        client.get("offer_policy", ""), 
-        client["phone_number"],
-        is_retry=True
-    )
+    # Rotate to the next spare draft generated up front; only call the model
+    # again once the spares have run out.
+    alternates = list(pending_review.get("draft_alternates") or [])
+    if alternates:
+        ai_reply = {"reply_text": alternates.pop(0), "alternates": alternates}
+    else:
+        try:
+            ai_reply = await asyncio.to_thread(
+                generate_review_reply,
+                pending_review["review_text"], 
+                pending_review["star_rating"], 
+                client["language_preference"], 
+                client.get("offer_policy", ""), 
+                client["phone_number"],
+                is_retry=True,
+                n=settings.draft_candidates
+            )
+        except resilience.CircuitOpenError as e:
+            print(f"Error regenerating draft: {e}")
+            ai_reply = None
 
     if ai_reply:
         new_draft = ai_reply.get("reply_text", "")
-        supabase.table("pending_reviews").update({"draft_reply": new_draft}).eq("id", pending_review["id"]).execute()
-        
-        from datetime import datetime
-        stats = get_daily_stats(client_id)
-        current_date = datetime.now().strftime("%d %b")
+        await asyncio.to_thread(repository.update_review, pending_review["id"], {
+            "draft_reply": new_draft,
+            "draft_alternates": ai_reply.get("alternates", [])
+        })
         
-        reviewer_name = pending_review.get("reviewer_name", "Customer")
-        star_rating = pending_review["star_rating"]
-        review_text = pending_review["review_text"]
-
-        if client["language_preference"] == "ar-om":
-            whatsapp_body = (
-                f"📊 *لوحة التحكم • {current_date}*\n"
-                f"🔴 قيد الانتظار: {stats['pending']} | ✅ تم النشر: {stats['posted']}\n"
-                f"    ⭐ *تقييم جديد ({star_rating} نجوم)*\n"
-                f"    👤 *{reviewer_name}*\n"
-                f"    \"{review_text}\"\n"
-                f"    🤖 *الرد المقترح:*\n"
-                f"    \"{new_draft}\"\n"
-                f"    👇 *الإجراء:*\n"
-                f"    1 : ✅ اعتماد ونشر\n"
-                f"    2 : 🎲 صياغة جديدة"
-            )
-        else:
-            whatsapp_body = (
-                f"📊 Dashboard • {current_date}\n"
-                f"🔴 Pending: {stats['pending']} | ✅ Posted: {stats['posted']}\n\n"
-                f"⭐ New {star_rating} Review\n"
-                f"👤 {reviewer_name}\n"
-                f"\"{review_text}\"\n\n"
-                f"🤖 Proposed Reply: \"{new_draft}\"\n\n"
-                f"👇 Action: 1 : Approve 2 : 🎲 Regenerate"
-            )
+        stats = await asyncio.to_thread(get_daily_stats, client_id)
+        whatsapp_body = build_dashboard_message(
+            client["language_preference"],
+            stats,
+            pending_review["star_rating"],
+            pending_review.get("reviewer_name", "Customer"),
+            pending_review["review_text"],
+            new_draft
+        )
+        await asyncio.to_thread(sessions.save, phone_number, [pending_review["id"]], client_id)
         send_whatsapp_message(phone_number, whatsapp_body)
         return True
     return False
 
 async def post_batched_reviews(phone_number: str):
     """Posts ALL reviews with 'pending' status for the client."""
-    client_res = supabase.table("clients").select("id").eq("phone_number", phone_number).execute()
-    if not client_res.data:
+    client = await asyncio.to_thread(get_client_by_phone, phone_number)
+    if not client:
         return False
     
-    client_id = client_res.data[0]["id"]
-    pending_res = supabase.table("pending_reviews") \
-        .select("*") \
-        .eq("client_id", client_id) \
-        .eq("status", "pending") \
-        .execute()
-
-    if not pending_res.data:
+    client_id = client["id"]
+    claimed = await asyncio.to_thread(batch_poster.claim_for_posting, client_id)
+    if not claimed:
         send_whatsapp_message(phone_number, "No pending reviews to post.")
         return False
 
-    count = 0
-    for review in pending_res.data:
-        success = post_reply_to_google(review["google_review_id"], review["draft_reply"])
-        if success:
-            supabase.table("pending_reviews").update({"status": "posted"}).eq("id", review["id"]).execute()
-            count += 1
+    result = await batch_poster.post_reviews(phone_number, client_id, claimed)
+    send_whatsapp_message(phone_number, batch_poster.format_batch_summary(result))
+    return True
+
+async def release_held_reviews(phone_number: str):
+    """Drafts replies for reviews the spam screen held back (RELEASE)."""
+    client = await asyncio.to_thread(get_client_by_phone, phone_number)
+    if not client:
+        return False
+
+    held = await asyncio.to_thread(repository.held_reviews, client["id"], settings.digest_max_items)
+    if not held:
+        send_whatsapp_message(phone_number, "No reviews are held.")
+        return False
 
-    send_whatsapp_message(phone_number, f"Batch complete: {count} reviews posted!")
+    released = 0
+    for review in held:
+        if await asyncio.to_thread(pipeline.release_held_review, client, review):
+            released += 1
+    # The drafted reviews arrive in the next dashboard.
+    if released < len(held):
+        send_whatsapp_message(phone_number, f"Could not release {len(held) - released} held reviews. Reply RELEASE to try again.")
+    return released > 0
+
+async def approve_selected_reviews(phone_number: str, numbers: list):
+    """Posts the reviews picked by number from the last digest."""
+    client = await asyncio.to_thread(get_client_by_phone, phone_number)
+    if not client:
+        return False
+
+    digest_items = await asyncio.to_thread(sessions.get_review_ids, phone_number) or []
+    review_ids = [digest_items[number - 1] for number in numbers if 0 < number <= len(digest_items)]
+    if not review_ids:
+        send_whatsapp_message(phone_number, f"Please reply with numbers between 1 and {len(digest_items)}.")
+        return False
+
+    claimed = await asyncio.to_thread(batch_poster.claim_for_posting, client["id"], review_ids)
+    if not claimed:
+        send_whatsapp_message(phone_number, "These reviews were already handled.")
+        return False
+
+    result = await batch_poster.post_reviews(phone_number, client["id"], claimed)
+    send_whatsapp_message(phone_number, batch_poster.format_batch_summary(result))
     return True
 
 @app.get("/")
@@ -185,10 +257,61 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+def collect_stats():
+    return {
+        "pipeline": pipeline.stats(),
+        "pools": client_registry.pool_stats(),
+        "tenant_cache": tenant_cache.stats(),
+        "daily_stats": stats_service.stats(),
+        "repository": repository.stats(),
+        "retention": retention.stats(),
+        "idempotency": idempotency.stats(),
+        "drafting": draft_stats(),
+        "spam_filter": spam_filter.stats(),
+        "notifier": notifier.stats(),
+        "sessions": sessions.stats(),
+        "commands_in_flight": len(_command_tasks),
+        "outbound": outbound.stats(),
+        "breakers": resilience.breaker_stats()
+    }
+
+@app.get("/internal/stats")
+async def internal_stats():
+    return collect_stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    body = metrics.render_prometheus(collect_stats())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.post("/webhook/supabase/clients")
+async def supabase_clients_webhook(request: Request, x_webhook_secret: str = Header(default="")):
+    """
+    Receives Supabase database webhooks for the clients table
+    (INSERT/UPDATE/DELETE) and drops the affected rows from the tenant cache.
+    Only the cache of the process that receives the webhook is invalidated;
+    other processes serve the old row until TENANT_CACHE_TTL expires.
+    Refused unless SUPABASE_WEBHOOK_SECRET is set and sent as X-Webhook-Secret.
+    """
+    if not settings.supabase_webhook_secret:
+        return JSONResponse(status_code=503, content={"status": "not configured"})
+    if not hmac.compare_digest(x_webhook_secret, settings.supabase_webhook_secret):
+        return JSONResponse(status_code=401, content={"status": "unauthorized"})
+
+    change = await request.json()
+    if change.get("table") != "clients":
+        return {"status": "ignored"}
+
+    handle_client_change(change)
+    return {"status": "invalidated"}
+
 @app.post("/webhook/google-pubsub")
 async def google_pubsub_webhook(request: Request):
     """
     Receives notifications from Google Cloud Pub/Sub.
+    The notification is persisted and acknowledged right away; drafting,
+    storing and notifying happen in the background review pipeline.
     """
     payload = await request.json()
     message = payload.get("message", {})
@@ -198,116 +321,99 @@ async def google_pubsub_webhook(request: Request):
         return {"status": "no data"}
 
     try:
-        data_str = base64.b64decode(data_b64).decode("utf-8")
-        # Use strict=False to handle control characters that might be present in the data
-        data_json = json.loads(data_str, strict=False)
-        
-        # In a real scenario, we extract location_id and review_id from the notification
-        # We try both standard notification keys and raw review object keys (often used in tests)
-        location_id = data_json.get("locationName")
-        review_id = data_json.get("reviewName") or data_json.get("name")
-        review_text = data_json.get("reviewText") or data_json.get("comment", "No text provided")
-        reviewer_name = data_json.get("reviewer", {}).get("displayName") or "Customer"
-        
-        # Google API can send ratings as strings (e.g., "ONE", "FIVE") or integers.
-        raw_rating = data_json.get("starRating", 5)
-        if isinstance(raw_rating, str):
-            star_rating = STAR_RATING_MAP.get(raw_rating.upper(), 5)
-        else:
-            star_rating = int(raw_rating)
-
-        # If locationName is missing but reviewName/name is present, extract location from it
-        if not location_id and review_id and "/reviews/" in review_id:
-            location_id = review_id.split("/reviews/")[0]
-
-        if not location_id:
-            print(f"DEBUG: Missing location_id. Extracted location_id: {location_id}, review_id: {review_id}")
-            return {"status": "missing location_id"}
-
-        # 1. Fetch Client from Supabase
-        print(f"DEBUG: Querying clients table for google_location_id='{location_id}'")
-        client_res = supabase.table("clients").select("*").eq("google_location_id", location_id).execute()
-        
-        print(f"DEBUG: Supabase query result: {client_res.data}")
-        
-        if not client_res.data:
-            print(f"Client not found for location: {location_id}")
-            return {"status": "client not found"}
-        
-        client = client_res.data[0]
-        client_id = client["id"]
-        client_phone = client["phone_number"]
-        client_lang = client["language_preference"]
-        offer_policy = client.get("offer_policy", "STRICT - NO OFFERS")
-
-        # 2. Generate AI Draft
-        ai_reply = generate_review_reply(review_text, star_rating, client_lang, offer_policy, client_phone)
-        if not ai_reply:
-            return {"status": "AI generation failed"}
-
-        draft_text = ai_reply.get("reply_text", "")
-        
-        # 3. Store in pending_reviews
-        pending_data = {
-            "client_id": client_id,
-            "google_review_id": review_id,
-            "review_text": review_text,
-            "star_rating": star_rating,
-            "draft_reply": draft_text,
-            "status": "pending"
-        }
-        supabase.table("pending_reviews").insert(pending_data).execute()
-
-        # 4. Send WhatsApp Notification
-        from datetime import datetime
-        stats = get_daily_stats(client_id)
-        current_date = datetime.now().strftime("%d %b")
-        
-        if client_lang == "ar-om":
-            whatsapp_body = (
-                f"📊 *لوحة التحكم • {current_date}*\n"
-                f"🔴 قيد الانتظار: {stats['pending']} | ✅ تم النشر: {stats['posted']}\n"
-                f"    ⭐ *تقييم جديد ({star_rating} نجوم)*\n"
-                f"    👤 *{reviewer_name}*\n"
-                f"    \"{review_text}\"\n"
-                f"    🤖 *الرد المقترح:*\n"
-                f"    \"{draft_text}\"\n"
-                f"    👇 *الإجراء:*\n"
-                f"    1 : ✅ اعتماد ونشر\n"
-                f"    2 : 🎲 صياغة جديدة"
-            )
-        else:
-            whatsapp_body = (
-                f"📊 Dashboard • {current_date}\n"
-                f"🔴 Pending: {stats['pending']} | ✅ Posted: {stats['posted']}\n\n"
-                f"⭐ New {star_rating} Review\n"
-                f"👤 {reviewer_name}\n"
-                f"\"{review_text}\"\n\n"
-                f"🤖 Proposed Reply: \"{draft_text}\"\n\n"
-                f"👇 Action: 1 : Approve 2 : 🎲 Regenerate"
-            )
-        send_whatsapp_message(client_phone, whatsapp_body)
+        with metrics.timer("decode"):
+            data_str = base64.b64decode(data_b64).decode("utf-8")
+            # Use strict=False to handle control characters that might be present in the data
+            data_json = json.loads(data_str, strict=False)
+            review = pipeline.parse_notification(data_json)
+    except Exception as e:
+        # Redelivering a malformed message will not fix it, so acknowledge it.
+        metrics.record_outcome("invalid_data")
+        print(f"Error decoding Pub/Sub message: {e}")
+        return {"status": "invalid data"}
+
+    if not review:
+        metrics.record_outcome("missing_location_id")
+        return {"status": "missing location_id"}
 
+    # Pub/Sub delivers at least once: drop redeliveries before any expensive work.
+    message_id = message.get("messageId")
+    if not idempotency.claim(message_id, review["review_id"]):
+        metrics.record_outcome("duplicate")
+        return {"status": "duplicate"}
+
+    try:
+        job = await pipeline.submit(review, message_id)
+    except pipeline.Overloaded as e:
+        # 429 nacks the push; Pub/Sub redelivers it with backoff once the
+        # queue has drained, instead of us accepting work we cannot finish.
+        idempotency.release(message_id, review["review_id"])
+        metrics.record_outcome("throttled")
+        print(f"INFO: {e}")
+        return JSONResponse(status_code=429, content={"status": "retry"})
+    except pipeline.DuplicateJob:
+        idempotency.record_db_duplicate()
+        metrics.record_outcome("duplicate")
+        return {"status": "duplicate"}
     except Exception as e:
-        print(f"Error in Google webhook workflow: {e}")
-    
-    return {"status": "accepted"}
+        # A non-2xx response makes Pub/Sub redeliver the message later.
+        idempotency.release(message_id, review["review_id"])
+        metrics.record_outcome("queue_failed")
+        print(f"Error queueing review job: {e}")
+        return JSONResponse(status_code=503, content={"status": "retry"})
+
+    metrics.record_outcome("accepted")
+
+    return {"status": "accepted", "job_id": job["id"]}
+
+async def handle_command(phone_number: str, body: str):
+    """Runs one WhatsApp command; commands from the same phone run in order."""
+    entry = _phone_locks.get(phone_number)
+    if entry is None:
+        entry = _phone_locks[phone_number] = {"lock": asyncio.Lock(), "users": 0}
+    entry["users"] += 1
+    try:
+        async with entry["lock"]:
+            await _run_command(phone_number, body)
+    finally:
+        # Dropped once no command for this phone runs or waits, so the map
+        # only holds phones with commands in flight.
+        entry["users"] -= 1
+        if entry["users"] == 0:
+            del _phone_locks[phone_number]
+
+async def _run_command(phone_number: str, body: str):
+    try:
+        # After a digest, numbers pick reviews from it ("1 3"); after a single
+        # dashboard they keep their 1 = approve / 2 = regenerate meaning.
+        numbers = notifier.parse_item_numbers(body)
+        digest_items = await asyncio.to_thread(sessions.get_review_ids, phone_number) if numbers else None
+
+        if numbers and digest_items and len(digest_items) > 1:
+            await approve_selected_reviews(phone_number, numbers)
+        elif body == "1":
+            await approve_review(phone_number)
+        elif body == "2":
+            await regenerate_draft(phone_number)
+        elif body.upper() == "ALL":
+            await post_batched_reviews(phone_number)
+        elif body.upper() == "RELEASE":
+            await release_held_reviews(phone_number)
+    except Exception as e:
+        print(f"Error handling WhatsApp command from {phone_number}: {e}")
 
 @app.post("/webhook/twilio")
 async def twilio_webhook(From: str = Form(...), Body: str = Form(...)):
     """
     Receives user replies from Twilio (WhatsApp).
+    The reply is acknowledged right away and handled in the background, so
+    slow Google or OpenAI calls never run into Twilio's webhook timeout.
     """
     from_number = From.replace("whatsapp:", "")
-    body = Body.strip()
-
-    if body == "1":
-        await approve_review(from_number)
-    elif body == "2":
-        await regenerate_draft(from_number)
-    elif body.upper() == "ALL":
-        await post_batched_reviews(from_number)
-    
+    task = asyncio.create_task(handle_command(from_number, Body.strip()))
+    _command_tasks.add(task)
+    task.add_done_callback(_command_tasks.discard)
+
     # Return standard TwiML response
     return Response(content="<Response></Response>", media_type="text/xml")
 
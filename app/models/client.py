@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 class ClientBase(BaseModel):
     phone_number: str = Field(..., description="The client's WhatsApp number.")
@@ -12,6 +12,10 @@ class ClientBase(BaseModel):
         default="NEVER offer free items, refunds, or discounts. Just apologize and ask to DM.",
         description="Business-specific policy for AI offers."
     )
+    reply_templates: Optional[Dict[str, Dict[str, List[str]]]] = Field(
+        default=None,
+        description="Per-language, per-star template replies for empty or generic-praise reviews."
+    )
 
 class ClientCreate(ClientBase):
     pass
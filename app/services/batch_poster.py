@@ -0,0 +1,128 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from app.core import metrics
+from app.core.config import settings, worker_id
+from app.core.ratelimit import TokenBucket
+from app.db import repository
+from app.services.google_client import post_reply_to_google
+from app.services.whatsapp_service import send_whatsapp_message
+from app.services.stats_service import record_status_change
+
+_executor = None
+_location_buckets = {}
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.batch_post_concurrency,
+            thread_name_prefix="batch-post"
+        )
+    return _executor
+
+def location_of(google_review_id: str):
+    """accounts/x/locations/y/reviews/z -> accounts/x/locations/y"""
+    return google_review_id.split("/reviews/")[0] if "/reviews/" in google_review_id else google_review_id
+
+def _bucket_for(location_id: str):
+    # Buckets are shared across batches, so two "ALL" commands for the same
+    # location still respect one rate limit together.
+    bucket = _location_buckets.get(location_id)
+    if bucket is None:
+        bucket = _location_buckets.setdefault(
+            location_id,
+            TokenBucket(settings.batch_post_rate_per_location, settings.batch_post_burst_per_location)
+        )
+    return bucket
+
+def claim_for_posting(client_id: str, review_ids: list = None):
+    """
+    Claims a client's reviews for posting ('pending' -> 'posting'): the given
+    ids, or every pending review when `review_ids` is None. Returns only the
+    rows this process won, so two workers handling the same "ALL" or "1"
+    never post the same review.
+    """
+    return repository.claim_for_posting(client_id, review_ids, worker_id(), settings.posting_lease_seconds)
+
+def _set_status(review_ids: list, fields: dict):
+    # Written behind: a row left in 'posting' by a lost update is reclaimed
+    # once its lease expires.
+    for review_id in review_ids:
+        repository.update_review(review_id, {**fields, "lease_owner": None, "lease_expires_at": None},
+                                 expect_status="posting")
+
+def mark_posted(review_ids: list, posted_at: datetime = None):
+    """Moves claimed reviews to 'posted' in the next write-behind batch."""
+    posted_at = posted_at or datetime.now(timezone.utc)
+    _set_status(review_ids, {"status": "posted", "posted_at": posted_at.isoformat()})
+
+def release_claims(review_ids: list):
+    """Returns claimed reviews whose post failed to 'pending' for a later retry."""
+    _set_status(review_ids, {"status": "pending"})
+
+async def post_reviews(phone_number: str, client_id: str, reviews: list):
+    """
+    Posts the drafts of `reviews` (rows claimed with claim_for_posting) to
+    Google with bounded concurrency and a per-location rate limit, then marks
+    the successful ones as posted in bulk and releases the failed ones.
+    Sends progress messages over WhatsApp for large batches.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    semaphore = asyncio.Semaphore(settings.batch_post_concurrency)
+    total = len(reviews)
+    progress_every = settings.batch_post_progress_every
+    done = 0
+    posted_ids = []
+    failed_ids = []
+
+    async def post_one(review):
+        nonlocal done
+        async with semaphore:
+            await _bucket_for(location_of(review["google_review_id"])).acquire_async()
+            try:
+                success = await loop.run_in_executor(
+                    executor, post_reply_to_google, review["google_review_id"], review["draft_reply"]
+                )
+            except Exception as e:
+                print(f"Error posting review {review['id']}: {e}")
+                success = False
+
+        (posted_ids if success else failed_ids).append(review["id"])
+        done += 1
+        if progress_every and done % progress_every == 0 and done < total:
+            await loop.run_in_executor(
+                executor, send_whatsapp_message, phone_number, f"Posting replies: {done}/{total}..."
+            )
+
+    await asyncio.gather(*(post_one(review) for review in reviews))
+
+    if posted_ids:
+        try:
+            await asyncio.to_thread(mark_posted, posted_ids)
+            record_status_change(client_id, "pending", "posted", len(posted_ids))
+            metrics.record_outcome("posted", len(posted_ids))
+            posted = set(posted_ids)
+            for review in reviews:
+                if review["id"] in posted:
+                    metrics.observe_reply_latency(review.get("received_at"))
+        except Exception as e:
+            # The replies are live on Google. The rows stay 'posting' until their
+            # lease expires; a later claim re-sends the same reply, which
+            # replaces it rather than adding a second one.
+            print(f"Error marking {len(posted_ids)} reviews as posted: {e}")
+
+    if failed_ids:
+        try:
+            await asyncio.to_thread(release_claims, failed_ids)
+        except Exception as e:
+            print(f"Error releasing {len(failed_ids)} failed reviews: {e}")
+
+    return {"total": total, "posted": posted_ids, "failed": failed_ids}
+
+def format_batch_summary(result: dict):
+    summary = f"Batch complete: {len(result['posted'])} reviews posted!"
+    if result["failed"]:
+        summary += f"\n{len(result['failed'])} of {result['total']} failed and are still pending. Reply ALL to retry."
+    return summary
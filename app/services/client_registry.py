@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from app.core.config import settings
+from app.db.supabase import supabase
+
+GOOGLE_SCOPES = ['https://www.googleapis.com/auth/business.manage']
+
+# Process-wide SDK clients. They are built once (at startup or on first use)
+# and shared by every request so HTTP connections and tokens are reused.
+# The Google and Twilio SDKs are imported by the functions that build them,
+# so importing the app does not pay for them.
+_lock = threading.Lock()
+_twilio_client = None
+_twilio_http = None
+_google_credentials = None
+_google_session = None
+_refresh_task = None
+
+def _pooled_adapter():
+    return HTTPAdapter(pool_connections=settings.http_pool_size, pool_maxsize=settings.http_pool_size)
+
+def _load_google_credentials():
+    from google.oauth2 import service_account
+
+    # 1. Local mode: Check if service_account.json exists
+    creds_path = "service_account.json"
+    if os.path.exists(creds_path):
+        print(f"INFO: Loading Google credentials from {creds_path}")
+        return service_account.Credentials.from_service_account_file(
+            creds_path, scopes=GOOGLE_SCOPES
+        )
+
+    # 2. Cloud mode: Check for GOOGLE_CREDENTIALS_JSON environment variable
+    creds_json = os.environ.get("GOOGLE_CREDENTIALS_JSON")
+    if creds_json:
+        print("INFO: Loading Google credentials from GOOGLE_CREDENTIALS_JSON environment variable")
+        try:
+            info_dict = json.loads(creds_json)
+            return service_account.Credentials.from_service_account_info(
+                info_dict, scopes=GOOGLE_SCOPES
+            )
+        except json.JSONDecodeError as e:
+            print(f"Error: Failed to parse GOOGLE_CREDENTIALS_JSON: {e}")
+            return None
+
+    print("Warning: Google credentials not found (neither service_account.json nor GOOGLE_CREDENTIALS_JSON source)")
+    return None
+
+def get_twilio_client():
+    """
+    Returns the shared Twilio client, backed by a pooled requests session.
+    """
+    global _twilio_client, _twilio_http
+    if _twilio_client is not None:
+        return _twilio_client
+    if not all([settings.twilio_account_sid, settings.twilio_auth_token]):
+        return None
+
+    with _lock:
+        if _twilio_client is None:
+            from twilio.http.http_client import TwilioHttpClient
+            from twilio.rest import Client as TwilioClient
+            _twilio_http = TwilioHttpClient(pool_connections=True, timeout=settings.twilio_timeout)
+            _twilio_http.session.mount("https://", _pooled_adapter())
+            _twilio_client = TwilioClient(
+                settings.twilio_account_sid,
+                settings.twilio_auth_token,
+                http_client=_twilio_http
+            )
+            if settings.twilio_api_base_url:
+                # Points the SDK at a local fake Twilio server in tests and benchmarks.
+                _twilio_client.api.base_url = settings.twilio_api_base_url
+    return _twilio_client
+
+def get_google_credentials():
+    """
+    Returns the shared service-account credentials (loaded once).
+    """
+    global _google_credentials
+    if _google_credentials is None:
+        with _lock:
+            if _google_credentials is None:
+                _google_credentials = _load_google_credentials()
+    return _google_credentials
+
+def get_google_session():
+    """
+    Returns a pooled AuthorizedSession for direct Google REST calls.
+    The session shares the credentials refreshed by the background task.
+    """
+    global _google_session
+    if _google_session is not None:
+        return _google_session
+
+    credentials = get_google_credentials()
+    if credentials is None:
+        return None
+
+    with _lock:
+        if _google_session is None:
+            from google.auth.transport.requests import AuthorizedSession
+            session = AuthorizedSession(credentials)
+            session.mount("https://", _pooled_adapter())
+            _google_session = session
+    return _google_session
+
+def _refresh_google_token(force: bool = False):
+    credentials = get_google_credentials()
+    if credentials is None:
+        return False
+
+    # Refresh ahead of expiry so request paths never pay for a token round trip.
+    expiry = credentials.expiry
+    margin = timedelta(seconds=settings.google_token_refresh_interval * 2)
+    if force or not credentials.valid or expiry is None or expiry - margin <= datetime.utcnow():
+        import google.auth.transport.requests
+        session = get_google_session()
+        credentials.refresh(google.auth.transport.requests.Request(session=session))
+        return True
+    return False
+
+async def _refresh_loop():
+    while True:
+        await asyncio.sleep(settings.google_token_refresh_interval)
+        try:
+            await asyncio.to_thread(_refresh_google_token)
+        except Exception as e:
+            print(f"Error refreshing Google token: {e}")
+
+def warm_up():
+    """
+    Builds every client up front so the first webhook does not pay for it.
+    """
+    if get_twilio_client() is None:
+        print("Warning: Twilio credentials not fully configured.")
+
+    if settings.test_mode:
+        print("INFO: Test mode enabled. Skipping Google client initialization.")
+        return
+
+    if get_google_session() is not None:
+        try:
+            _refresh_google_token(force=True)
+        except Exception as e:
+            print(f"Error fetching initial Google token: {e}")
+
+async def start():
+    """
+    Warms the clients and starts the background Google token refresher.
+    """
+    global _refresh_task
+    await asyncio.to_thread(warm_up)
+    if not settings.test_mode and get_google_credentials() is not None:
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+async def stop():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        await asyncio.gather(_refresh_task, return_exceptions=True)
+        _refresh_task = None
+
+def _requests_pool_stats(session):
+    pools = []
+    for adapter in session.adapters.values():
+        manager = adapter.poolmanager
+        for key in manager.pools.keys():
+            pool = manager.pools[key]
+            if pool is None:
+                continue
+            pools.append({
+                "host": pool.host,
+                "max_size": manager.connection_pool_kw.get("maxsize"),
+                "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests
+            })
+    return pools
+
+def pool_stats():
+    """
+    Connection pool statistics for sizing `http_pool_size`. Only clients
+    that have been built are inspected, so a scrape never builds one.
+    """
+    stats = {
+        "twilio": _requests_pool_stats(_twilio_http.session) if _twilio_http is not None else [],
+        "google": _requests_pool_stats(_google_session) if _google_session is not None else [],
+        "google_token_expiry": None,
+        # httpx keeps its pool private; report whether the client exists.
+        "supabase": {"built": supabase is not None and supabase.built}
+    }
+    if _google_credentials is not None and _google_credentials.expiry is not None:
+        stats["google_token_expiry"] = _google_credentials.expiry.isoformat()
+    return stats
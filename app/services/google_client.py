@@ -1,63 +1,60 @@
-import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import requests
+from app.core import metrics, resilience
 from app.core.config import settings
+from app.services import client_registry
 
-def get_google_client():
+GOOGLE_REVIEWS_API = "https://mybusiness.googleapis.com/v4"
+
+def _api_base():
+    # Overridable so benchmarks can point at a local fake Google server.
+    return settings.google_api_base_url or GOOGLE_REVIEWS_API
+
+def is_retryable_google_error(error: Exception):
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+def _request(session, method: str, url: str, **kwargs):
+    response = session.request(method, url, timeout=settings.google_timeout, **kwargs)
+    response.raise_for_status()
+    return response
+
+def iter_review_pages(location_id: str, page_size: int = 50, page_token: str = None):
     """
-    Initializes the Google Account Management API client using a service account.
+    Streams a location's reviews from the Google Business Profile API one page
+    at a time. Yields (reviews, next_page_token); next_page_token is None on
+    the last page.
     """
-    if settings.test_mode:
-        print("INFO: Test mode enabled. Skipping Google client initialization.")
-        return "mock_client"
+    session = client_registry.get_google_session()
+    if session is None:
+        return
 
-    scopes = ['https://www.googleapis.com/auth/business.manage']
-    credentials = None
-
-    # 1. Local mode: Check if service_account.json exists
-    creds_path = "service_account.json"
-    if os.path.exists(creds_path):
-        print(f"INFO: Loading Google credentials from {creds_path}")
-        credentials = service_account.Credentials.from_service_account_file(
-            creds_path, scopes=scopes
+    while True:
+        params = {"pageSize": page_size}
+        if page_token:
+            params["pageToken"] = page_token
+        response = resilience.call(
+            "google", _request, session, "GET", f"{_api_base()}/{location_id}/reviews",
+            retryable=is_retryable_google_error, params=params
         )
-    else:
-        # 2. Cloud mode: Check for GOOGLE_CREDENTIALS_JSON environment variable
-        creds_json = os.environ.get("GOOGLE_CREDENTIALS_JSON")
-        if creds_json:
-            print("INFO: Loading Google credentials from GOOGLE_CREDENTIALS_JSON environment variable")
-            try:
-                info_dict = json.loads(creds_json)
-                credentials = service_account.Credentials.from_service_account_info(
-                    info_dict, scopes=scopes
-                )
-            except json.JSONDecodeError as e:
-                print(f"Error: Failed to parse GOOGLE_CREDENTIALS_JSON: {e}")
-                return None
-        else:
-            print("Warning: Google credentials not found (neither service_account.json nor GOOGLE_CREDENTIALS_JSON source)")
-            return None
-
-    return build('mybusinessbusinessinformation', 'v1', credentials=credentials)
+        body = response.json()
+        page_token = body.get("nextPageToken")
+        yield body.get("reviews", []), page_token
+        if not page_token:
+            return
 
 def get_latest_reviews(location_id: str):
     """
-    Fetches reviews from the Google Business Profile (My Business) API.
-    Note: The actual implementation might require 'mybusinessreviews' API.
+    Fetches the most recent page of reviews from the Google Business Profile (My Business) API.
     """
-    client = get_google_client()
-    if not client:
+    if settings.test_mode:
+        print(f"INFO: Test mode enabled. Skipping review fetch for {location_id}")
         return []
 
     try:
-        # Note: In a real implementation, the discovery service might vary.
-        # This is a representative call based on the Business Profile API structure.
-        # reviews = client.accounts().locations().reviews().list(parent=location_id).execute()
-        # return reviews.get('reviews', [])
-        
-        # For the purpose of this task, we assume the client is correctly built.
-        print(f"Fetching reviews for location: {location_id}")
-        return [] 
+        for reviews, _ in iter_review_pages(location_id):
+            return reviews
+        return []
     except Exception as e:
         print(f"Error fetching reviews: {e}")
         return []
@@ -70,17 +67,19 @@ def post_reply_to_google(review_id: str, reply_text: str):
         print(f"INFO: Test mode enabled. Mocking post to Google for {review_id}")
         return True
 
-    client = get_google_client()
-    if not client or client == "mock_client":
+    session = client_registry.get_google_session()
+    if session is None:
         return False
 
     try:
         # Note: 'review_id' is the full resource name of the review.
-        # client.accounts().locations().reviews().updateReply(
-        #     name=review_id,
-        #     body={'comment': reply_text}
-        # ).execute()
-        print(f"Successfully posted reply to Google for review {review_id}: {reply_text}")
+        # updateReply is idempotent, so retrying a timed-out PUT is safe.
+        with metrics.timer("google_post"):
+            resilience.call(
+                "google", _request, session, "PUT", f"{_api_base()}/{review_id}/reply",
+                retryable=is_retryable_google_error, json={"comment": reply_text}
+            )
+        print(f"Successfully posted reply to Google for review {review_id}")
         return True
     except Exception as e:
         print(f"Error posting reply to Google: {e}")
@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+from app.core.config import settings
+
+# Postgres error code for unique_violation
+UNIQUE_VIOLATION = "23505"
+
+class SeenSet:
+    """
+    Bounded, thread-safe set of recently accepted keys (oldest evicted first).
+    It catches most redeliveries in-process; the unique indexes from
+    migration 005 catch the rest (other workers, restarts).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_all(self, keys: list):
+        """
+        Adds every key and returns True, unless one of them is already present,
+        in which case nothing is added and False is returned.
+        """
+        with self._lock:
+            if any(key in self._keys for key in keys):
+                for key in keys:
+                    if key in self._keys:
+                        self._keys.move_to_end(key)
+                return False
+            for key in keys:
+                self._keys[key] = True
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+            return True
+
+    def discard_all(self, keys: list):
+        with self._lock:
+            for key in keys:
+                self._keys.pop(key, None)
+
+    def __len__(self):
+        return len(self._keys)
+
+_seen = SeenSet(settings.idempotency_cache_size)
+counters = {"accepted": 0, "duplicates_memory": 0, "duplicates_db": 0}
+
+def idempotency_keys(message_id: str, review_id: str):
+    keys = []
+    if message_id:
+        keys.append(f"msg:{message_id}")
+    if review_id:
+        keys.append(f"review:{review_id}")
+    return keys
+
+def claim(message_id: str, review_id: str):
+    """
+    Returns False when the notification was already accepted by this process.
+    """
+    keys = idempotency_keys(message_id, review_id)
+    if not keys:
+        return True
+    if _seen.add_all(keys):
+        counters["accepted"] += 1
+        return True
+    counters["duplicates_memory"] += 1
+    return False
+
+def release(message_id: str, review_id: str):
+    """
+    Forgets a claim whose job could not be persisted, so the redelivery is accepted.
+    """
+    counters["accepted"] -= 1
+    _seen.discard_all(idempotency_keys(message_id, review_id))
+
+def is_unique_violation(error: Exception):
+    # asyncpg errors (and the in-memory repository's) carry the SQLSTATE.
+    if getattr(error, "sqlstate", None) == UNIQUE_VIOLATION:
+        return True
+    # Imported here: postgrest is only loaded once the Supabase client is built.
+    from postgrest.exceptions import APIError
+    return isinstance(error, APIError) and error.code == UNIQUE_VIOLATION
+
+def record_db_duplicate():
+    counters["duplicates_db"] += 1
+
+def stats():
+    return {**counters, "seen_keys": len(_seen)}
@@ -0,0 +1,130 @@
+import re
+import threading
+from app.core import metrics
+from app.core.config import settings
+
+# Picks the model for a drafting call from cheap local features of the
+# review. Short, positive, non-complaint reviews go to the fast model;
+# anything that needs the full safety rules (1-3 stars, complaint words,
+# long or mixed-language text) stays on the strong model.
+
+ARABIC_SCRIPT = re.compile(r"[\u0600-\u06FF]")
+LATIN_SCRIPT = re.compile(r"[a-z]")
+
+# Matched against normalize_review_text() output (lowercase, no punctuation
+# or diacritics, أ/إ/آ -> ا, ة -> ه, ى -> ي).
+COMPLAINT_WORDS = {
+    "bad", "worst", "terrible", "awful", "horrible", "disgusting", "rude", "dirty", "cold", "slow",
+    "late", "wait", "waited", "waiting", "never", "disappointed", "disappointing", "refund", "sick",
+    "hair", "overpriced", "expensive", "unprofessional", "complaint", "raw", "burnt", "stale", "wrong",
+    "سيء", "سيئ", "سيئه", "زفت", "بارد", "بارده", "تاخير", "متاخر", "انتظار", "انتظرنا", "وسخ",
+    "وسخه", "غالي", "غاليه", "خايس", "خايسه", "معفن", "شكوي", "للاسف", "ردي", "رديء", "مقرف"
+}
+COMPLAINT_PHRASES = ("not good", "not fresh", "never again", "ما عجبني", "مو زين", "ماشي زين", "مب زين")
+
+# USD per million (prompt, cached prompt, completion) tokens, for cost estimates.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+_lock = threading.Lock()
+counters = {"fast": 0, "strong": 0, "fallbacks": 0}
+
+def classify(normalized_text: str, star_rating: int):
+    """Local features of a review; `normalized_text` comes from normalize_review_text."""
+    words = normalized_text.split()
+    arabic = bool(ARABIC_SCRIPT.search(normalized_text))
+    latin = bool(LATIN_SCRIPT.search(normalized_text))
+    return {
+        "stars": star_rating,
+        "words": len(words),
+        "script": "mixed" if arabic and latin else "arabic" if arabic else "latin" if latin else "none",
+        "complaint": any(word in COMPLAINT_WORDS for word in words)
+                     or any(phrase in normalized_text for phrase in COMPLAINT_PHRASES)
+    }
+
+def choose_route(normalized_text: str, star_rating: int):
+    """Returns (route, reason) for a review."""
+    if not settings.model_routing:
+        return "strong", "routing_disabled"
+    features = classify(normalized_text, star_rating)
+    if features["stars"] <= 3:
+        return "strong", "low_rating"
+    if features["complaint"]:
+        return "strong", "complaint"
+    if features["words"] > settings.route_fast_max_words:
+        return "strong", "long_review"
+    if features["script"] == "mixed":
+        return "strong", "mixed_script"
+    return "fast", "simple_positive"
+
+def route_config(route: str):
+    """Model, latency budget and fallback of a route."""
+    if route == "fast":
+        return {
+            "model": settings.openai_fast_model,
+            "timeout": settings.openai_fast_timeout,
+            "hedge_after": settings.openai_fast_hedge_after,
+            "temperature": 0.7,
+            # A slow or failed fast call goes straight to the strong model.
+            "max_retries": 0,
+            "fallback": "strong"
+        }
+    return {
+        "model": settings.openai_strong_model,
+        "timeout": settings.openai_timeout,
+        "hedge_after": settings.openai_hedge_after,
+        "temperature": 0.9,
+        "max_retries": None,
+        "fallback": None
+    }
+
+def accepts(route: str, result: dict):
+    """
+    Whether a route's draft can be used as is. Fast drafts flagged high risk
+    or fake, or without a reply, are redone on the strong model.
+    """
+    if route != "fast":
+        return True
+    return (bool(result.get("reply_text"))
+            and result.get("risk_level") != "high"
+            and result.get("is_fake_suspicion") is not True)
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+    """`prompt_tokens` includes the `cached_tokens` served from the provider's prompt cache."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    uncached = prompt_tokens - cached_tokens
+    return (uncached * prices[0] + cached_tokens * prices[1] + completion_tokens * prices[2]) / 1_000_000
+
+def record_call(route: str, reason: str, model: str, seconds: float, usage, outcome: str):
+    """Records latency, tokens and estimated cost of one model call."""
+    with _lock:
+        counters[route] = counters.get(route, 0) + 1
+    metrics.DRAFT_ROUTES.inc(route=route, reason=reason, outcome=outcome)
+    metrics.DRAFT_LATENCY.observe(seconds, route=route, model=model)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+    metrics.DRAFT_TOKENS.inc(prompt_tokens, route=route, kind="prompt")
+    metrics.DRAFT_TOKENS.inc(cached_tokens, route=route, kind="cached_prompt")
+    metrics.DRAFT_TOKENS.inc(completion_tokens, route=route, kind="completion")
+    cost = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+    if cost is not None:
+        metrics.DRAFT_COST.inc(cost, route=route)
+
+def record_fallback():
+    with _lock:
+        counters["fallbacks"] += 1
+
+def stats():
+    with _lock:
+        result = dict(counters)
+    result["cost_usd"] = {
+        route: round(metrics.DRAFT_COST.value(route=route), 6) for route in ("fast", "strong")
+    }
+    return result
@@ -0,0 +1,180 @@
+import re
+import threading
+from datetime import datetime
+from app.core.config import settings
+from app.services import sessions
+from app.services.stats_service import get_daily_stats
+from app.services.whatsapp_service import send_whatsapp_message, build_dashboard_message
+
+# WhatsApp bodies are capped at 1600 characters; long texts are shortened in digests.
+DIGEST_TEXT_LIMIT = 160
+ITEM_NUMBERS = re.compile(r"^\d+(?:[\s,]+\d+)*$")
+
+# Per-client notification coalescer. Reviews arriving within the window are
+# merged into a single digest; a full buffer is flushed right away. Each item
+# may carry an on_sent callback, run once Twilio accepted its message: the
+# pipeline completes review jobs there, so a crash before delivery or a
+# dead-lettered message leaves them to be notified again instead of lost.
+_lock = threading.Lock()
+_buffers = {}   # client_id -> {"client": dict, "items": list, "held": int, "callbacks": list, "timer": Timer}
+counters = {"items": 0, "held": 0, "messages": 0, "digests": 0}
+
+HELD_LINES = {
+    "ar-om": "⚠️ {count} تقييم جديد محجوز للاشتباه بأنه مزيف. أرسل RELEASE لكتابة ردود عليها.",
+    "en": "⚠️ {count} new review(s) held as suspected spam. Reply RELEASE to draft replies for them."
+}
+
+def _shorten(text: str, limit: int = DIGEST_TEXT_LIMIT):
+    text = text or ""
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def build_digest_message(client_lang: str, stats: dict, items: list):
+    """
+    Renders a stats header followed by numbered reviews and their drafts.
+    """
+    current_date = datetime.now().strftime("%d %b")
+
+    if client_lang == "ar-om":
+        lines = [
+            f"📊 *لوحة التحكم • {current_date}*",
+            f"🔴 قيد الانتظار: {stats['pending']} | ✅ تم النشر: {stats['posted']}",
+            ""
+        ]
+        for number, item in enumerate(items, start=1):
+            lines += [
+                f"*{number})* ⭐ {item['star_rating']} نجوم • 👤 *{item['reviewer_name']}*",
+                f"\"{_shorten(item['review_text'])}\"",
+                f"🤖 \"{_shorten(item['draft_text'])}\"",
+                ""
+            ]
+        lines.append("👇 *الإجراء:* أرسل أرقام التقييمات للاعتماد والنشر (مثال: 1 3) أو ALL لاعتماد الكل")
+    else:
+        lines = [
+            f"📊 Dashboard • {current_date}",
+            f"🔴 Pending: {stats['pending']} | ✅ Posted: {stats['posted']}",
+            ""
+        ]
+        for number, item in enumerate(items, start=1):
+            lines += [
+                f"{number}) ⭐ {item['star_rating']} • 👤 {item['reviewer_name']}",
+                f"\"{_shorten(item['review_text'])}\"",
+                f"🤖 \"{_shorten(item['draft_text'])}\"",
+                ""
+            ]
+        lines.append("👇 Action: reply with numbers to approve (e.g. 1 3) or ALL to approve everything")
+    return "\n".join(lines)
+
+def build_held_line(client_lang: str, count: int):
+    return HELD_LINES.get(client_lang, HELD_LINES["en"]).format(count=count)
+
+def _send(client: dict, items: list, callbacks: list = (), held: int = 0):
+    if not items:
+        body = build_held_line(client["language_preference"], held)
+    elif len(items) == 1:
+        item = items[0]
+        body = build_dashboard_message(
+            client["language_preference"],
+            get_daily_stats(client["id"]),
+            item["star_rating"],
+            item["reviewer_name"],
+            item["review_text"],
+            item["draft_text"]
+        )
+    else:
+        body = build_digest_message(client["language_preference"], get_daily_stats(client["id"]), items)
+        counters["digests"] += 1
+    if items and held:
+        body += "\n\n" + build_held_line(client["language_preference"], held)
+
+    if items:
+        sessions.save(client["phone_number"], [item["pending_review_id"] for item in items], client["id"])
+    counters["messages"] += 1
+
+    def delivered():
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error completing notification for client {client['id']}: {e}")
+
+    send_whatsapp_message(client["phone_number"], body, on_sent=delivered if callbacks else None)
+
+def _buffer_for(client: dict):
+    # Called with _lock held.
+    buffer = _buffers.get(client["id"])
+    if buffer is None:
+        timer = threading.Timer(settings.digest_window_seconds, flush, args=(client["id"],))
+        timer.daemon = True
+        buffer = _buffers[client["id"]] = {"client": client, "items": [], "held": 0, "callbacks": [], "timer": timer}
+        timer.start()
+    return buffer
+
+def notify_review(client: dict, item: dict, on_sent=None):
+    """
+    Queues a drafted review for the client's next dashboard message.
+    `item` holds pending_review_id, star_rating, reviewer_name, review_text
+    and draft_text. `on_sent` is called once the message has been sent.
+    """
+    counters["items"] += 1
+    callbacks = [on_sent] if on_sent else []
+    if settings.digest_window_seconds <= 0:
+        _send(client, [item], callbacks)
+        return
+
+    flush_now = None
+    with _lock:
+        buffer = _buffer_for(client)
+        buffer["items"].append(item)
+        buffer["callbacks"].extend(callbacks)
+        if len(buffer["items"]) >= settings.digest_max_items:
+            buffer["timer"].cancel()
+            flush_now = _buffers.pop(client["id"])
+
+    if flush_now is not None:
+        _send(flush_now["client"], flush_now["items"], flush_now["callbacks"], flush_now["held"])
+
+def notify_held(client: dict, on_sent=None):
+    """
+    Mentions a review the spam screen held back in the client's next
+    message, so the owner can release it with the RELEASE command.
+    """
+    counters["held"] += 1
+    callbacks = [on_sent] if on_sent else []
+    if settings.digest_window_seconds <= 0:
+        _send(client, [], callbacks, held=1)
+        return
+    with _lock:
+        buffer = _buffer_for(client)
+        buffer["held"] += 1
+        buffer["callbacks"].extend(callbacks)
+
+def flush(client_id: str):
+    """Sends the client's buffered reviews now."""
+    with _lock:
+        buffer = _buffers.pop(client_id, None)
+    if buffer is None:
+        return
+    buffer["timer"].cancel()
+    try:
+        _send(buffer["client"], buffer["items"], buffer["callbacks"], buffer["held"])
+    except Exception as e:
+        print(f"Error sending digest for client {client_id}: {e}")
+
+def flush_all():
+    """Sends every buffered digest (used on shutdown)."""
+    with _lock:
+        client_ids = list(_buffers.keys())
+    for client_id in client_ids:
+        flush(client_id)
+
+def parse_item_numbers(body: str):
+    """'1 3' / '1,3' -> [1, 3]; anything else -> None."""
+    body = body.strip()
+    if not ITEM_NUMBERS.match(body):
+        return None
+    return [int(number) for number in re.split(r"[\s,]+", body)]
+
+def stats():
+    with _lock:
+        buffered = sum(len(buffer["items"]) + buffer["held"] for buffer in _buffers.values())
+    return {**counters, "buffered_items": buffered, "buffered_clients": len(_buffers)}
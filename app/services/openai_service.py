@@ -1,85 +1,272 @@
-from openai import OpenAI
+from app.core import metrics, resilience
 from app.core.config import settings
+from app.services import model_router, prompts
+from collections import OrderedDict
 import json
+import random
+import re
+import threading
+import time
 
-client = OpenAI(
-    api_key=settings.openai_api_key,
-    organization=settings.openai_org_id if settings.openai_org_id else None,
-    project=settings.openai_project_id if settings.openai_project_id else None
-)
+# Built on first use (or by the startup warm-up): importing the openai SDK
+# is the largest single cost of a cold start.
+client = None
+_client_lock = threading.Lock()
 
-SYSTEM_PROMPT = """
-You are "Salim", a smart, humble, and professional Omani restaurant manager.
+def get_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+                client = OpenAI(
+                    api_key=settings.openai_api_key,
+                    organization=settings.openai_org_id if settings.openai_org_id else None,
+                    project=settings.openai_project_id if settings.openai_project_id else None,
+                    base_url=settings.openai_base_url if settings.openai_base_url else None,
+                    timeout=settings.openai_timeout,
+                    # Retries are handled by the resilience layer, within the shared retry budget.
+                    max_retries=0
+                )
+    return client
 
-**Context:**
-- Client Phone (for contact): {client_phone}
-- **OFFER POLICY (CRITICAL):** {offer_policy}
+def is_retryable_openai_error(error: Exception):
+    import openai
+    return isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
 
-**Input:**
-- Review Text: {{review_text}}
+def _parse_choices(response):
+    result = json.loads(response.choices[0].message.content)
 
-**Language & Tone Detection:**
-- Detect the language of the Review Text.
-- If Arabic or Mixed (Arabic/English) -> Reply in Omani Arabic (White Dialect).
-- If English -> Reply in English.
+    # Apply Rules:
+    # If is_fake_suspicion is True, the reply_text should be empty.
+    if result.get("is_fake_suspicion") is True:
+        result["reply_text"] = ""
+        result["alternates"] = []
+        return result
 
-**Rules for Replies (NEVER BREAK THESE):**
-1. **RELEVANCE RULE:** Do not be generic. You MUST mention specific items or topics mentioned by the user (e.g., 'Tea', 'Staff', 'Cleanliness', 'Atmosphere'). Mirror their topic.
-2. **STRICT SAFETY POLICY (NO OFFERS):** You are FORBIDDEN from offering 'compensation' (تعويض), 'refunds' (استرجاع), 'free items', or saying 'we will make it up to you'.
-3. **COMPLAINTS HANDLING:** For complaints or negative reviews (1-3 stars), only promise to listen and investigate.
-4. **MANDATORY PHRASES:**
-   - Arabic (for complaints): 'يرجى التواصل معنا لمتابعة الموضوع ومراجعة التفاصيل' (followed by client phone: {client_phone})
-   - English (for complaints): 'Please contact us directly at {client_phone} so we can look into this matter.'
+    alternates = []
+    for choice in response.choices[1:]:
+        try:
+            reply = json.loads(choice.message.content).get("reply_text", "")
+        except json.JSONDecodeError:
+            continue
+        if reply and reply != result.get("reply_text") and reply not in alternates:
+            alternates.append(reply)
+    result["alternates"] = alternates
+    return result
 
-**Logic by Star Rating:**
-- 5 Stars: Thank them warmly and mention what they liked.
-- 1-3 Stars: Apologize, mention their specific concern, and use the mandatory contact phrase.
+def _call_route(route: str, reason: str, messages: list, n: int):
+    """
+    One drafting call on a route; returns the parsed result or None.
+    CircuitOpenError is raised through: every route shares the OpenAI
+    breaker, so the caller should defer the review rather than fail it.
+    """
+    config = model_router.route_config(route)
+    started = time.perf_counter()
+    response = None
+    try:
+        with metrics.timer("openai_draft"):
+            response = resilience.call(
+                "openai",
+                get_client().chat.completions.create,
+                retryable=is_retryable_openai_error,
+                hedge_after=config["hedge_after"],
+                max_retries=config["max_retries"],
+                model=config["model"],
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=config["temperature"],
+                n=n,
+                timeout=config["timeout"],
+                prompt_cache_key=prompts.PROMPT_CACHE_KEY
+            )
+        result = _parse_choices(response)
+    except resilience.CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"Error generating review reply on the {route} route: {e}")
+        result = None
 
-**Output Format:**
-Return valid JSON: {{"reply_text": "string", "risk_level": "low|high", "is_fake_suspicion": boolean}}
-"""
+    outcome = "error" if result is None else "ok" if model_router.accepts(route, result) else "rejected"
+    model_router.record_call(
+        route, reason, config["model"], time.perf_counter() - started, getattr(response, "usage", None), outcome
+    )
+    return result if outcome == "ok" else None
 
-def generate_review_reply(review_text: str, star_rating: int, client_language: str, offer_policy: str, client_phone: str, is_retry: bool = False):
+def generate_review_reply(review_text: str, star_rating: int, client_language: str, offer_policy: str, client_phone: str, is_retry: bool = False, n: int = 1):
     """
-    Generates a review reply using OpenAI GPT-4o with strict safety rules.
+    Generates a review reply with strict safety rules, on the model that
+    model_router picks for the review (falling back to the strong model).
+    With n > 1 the extra completions are returned as "alternates" (reply
+    texts), so the owner can regenerate without waiting for another call.
+    Raises CircuitOpenError while the OpenAI breaker is open.
     """
     if not settings.openai_api_key:
         print("Error: OpenAI API key not found.")
         return None
 
-    user_prompt = f"""
-    Review: {review_text}
-    Star Rating: {star_rating}
+    messages = prompts.build_messages(client_phone, offer_policy, review_text, star_rating, is_retry)
+    route, reason = model_router.choose_route(normalize_review_text(review_text), star_rating)
+    while route:
+        result = _call_route(route, reason, messages, n)
+        if result is not None:
+            return {**result, "route": route}
+        route = model_router.route_config(route)["fallback"]
+        if route:
+            model_router.record_fallback()
+            reason = "fallback"
+    return None
+
+# --- Tiered drafting: templates -> reply cache -> model ---
+
+ARABIC_SCRIPT = re.compile(r"[\u0600-\u06FF]")
+ARABIC_DIACRITICS = re.compile(r"[\u064B-\u0652\u0640]")
+NON_WORD = re.compile(r"[^\w\s]", re.UNICODE)
+# Any digit, including Arabic-Indic ones: however the model formats a phone
+# number, it cannot write one without digits.
+DIGIT = re.compile(r"\d")
+EMPTY_REVIEW_TEXTS = {"", "no text provided"}
+
+# Reviews made only of these words (after normalization) are generic praise
+# with no specific topic to mirror, so a template reply is as good as the model.
+PRAISE_WORDS = {
+    "great", "good", "excellent", "amazing", "awesome", "nice", "perfect", "best",
+    "lovely", "wonderful", "fantastic", "super", "love", "it", "very", "so", "really",
+    "the", "place", "thanks", "thank", "you", "recommended", "highly", "top",
+    "ممتاز", "ممتازه", "رائع", "رائعه", "حلو", "جميل", "زين", "وايد", "جدا", "مره",
+    "روعه", "شكرا", "فنان", "خيال", "بطل", "تمام", "مكان", "يجنن", "الافضل", "افضل"
+}
+
+DEFAULT_TEMPLATES = {
+    "en": {
+        5: [
+            "Thank you so much for the 5-star review! We're delighted you enjoyed your visit and look forward to welcoming you again soon.",
+            "Thanks a lot for your kind rating! It means a lot to our team. See you again soon!",
+            "We really appreciate the 5 stars! Thank you for visiting us, and we hope to see you again."
+        ],
+        4: [
+            "Thank you for the great rating! We're glad you had a good time and we'll keep working to make your next visit even better.",
+            "Thanks for your 4-star review! We appreciate your visit and hope to see you again soon."
+        ]
+    },
+    "ar-om": {
+        5: [
+            "شكراً جزيلاً على تقييمك الجميل! يسعدنا إنك استمتعت بزيارتك، ونتشرف بشوفتك مرة ثانية قريب.",
+            "تسلم على التقييم الحلو! كلامك يفرحنا ويفرح الفريق كامل، حياك الله في أي وقت.",
+            "مشكور على الخمس نجوم! نقدر زيارتك وننتظرك مرة ثانية."
+        ],
+        4: [
+            "شكراً على تقييمك! يسعدنا إن تجربتك كانت حلوة، وبنحرص تكون زيارتك الجاية أحسن.",
+            "نقدر تقييمك وزيارتك! حياك الله مرة ثانية، وبنسعى دايماً نقدم لك الأفضل."
+        ]
+    }
+}
+
+_reply_cache = OrderedDict()
+_reply_cache_lock = threading.Lock()
+draft_counters = {"template": 0, "cache": 0, "model": 0}
+
+def normalize_review_text(review_text: str):
+    """
+    Lowercases and strips punctuation, emoji, Arabic diacritics and extra
+    whitespace so trivially different texts share a cache key.
     """
+    text = ARABIC_DIACRITICS.sub("", (review_text or "").lower())
+    text = text.replace("أ", "ا").replace("إ", "ا").replace("آ", "ا").replace("ة", "ه").replace("ى", "ي")
+    text = NON_WORD.sub(" ", text)
+    return " ".join(text.split())
 
-    try:
-        formatted_system_prompt = SYSTEM_PROMPT.format(
-            client_phone=client_phone,
-            offer_policy=offer_policy,
-            review_text=review_text
-        )
-
-        if is_retry:
-            formatted_system_prompt += "\n\n**RETRY INSTRUCTION:** The previous draft was rejected. Write a COMPLETELY DIFFERENT option. Change the tone slightly or make it shorter while respecting all rules."
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": formatted_system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.9
-        )
-
-        result = json.loads(response.choices[0].message.content)
-        
-        # Apply Rules:
-        # If is_fake_suspicion is True, the reply_text should be empty.
-        if result.get("is_fake_suspicion") is True:
-            result["reply_text"] = ""
-            
+def detect_reply_language(review_text: str, client_language: str):
+    """Mirrors the prompt's rule: Arabic or mixed -> ar-om, English -> en."""
+    normalized = normalize_review_text(review_text)
+    if normalized in EMPTY_REVIEW_TEXTS:
+        return client_language
+    return "ar-om" if ARABIC_SCRIPT.search(normalized) else "en"
+
+def template_reply(review_text: str, star_rating: int, language: str, client_templates: dict = None):
+    """
+    Returns a templated reply for empty or generic-praise positive reviews,
+    or None when the review needs a tailored reply.
+    """
+    if star_rating < 4:
+        return None
+
+    normalized = normalize_review_text(review_text)
+    words = normalized.split()
+    if normalized not in EMPTY_REVIEW_TEXTS:
+        if len(words) > settings.template_max_words or not all(word in PRAISE_WORDS for word in words):
+            return None
+
+    # Client templates are {"ar-om": {"5": [...], "4": [...]}, "en": {...}}
+    library = (client_templates or {}).get(language) or DEFAULT_TEMPLATES.get(language) or DEFAULT_TEMPLATES["en"]
+    options = library.get(star_rating) or library.get(str(star_rating))
+    if not options:
+        return None
+    return random.choice(options)
+
+def _reply_cache_key(review_text: str, star_rating: int, language: str, offer_policy: str):
+    return (normalize_review_text(review_text), star_rating, language, offer_policy or "")
+
+def _get_cached_reply(key):
+    with _reply_cache_lock:
+        result = _reply_cache.get(key)
+        if result is not None:
+            _reply_cache.move_to_end(key)
         return result
-    except Exception as e:
-        print(f"Error generating review reply: {e}")
+
+def _is_shareable(result: dict):
+    """
+    Cached replies are served to every client, so only those that cannot
+    carry a client's contact details (in the reply or any alternate) qualify.
+    """
+    if result.get("is_fake_suspicion") or not result.get("reply_text"):
+        return False
+    candidates = [result["reply_text"], *(result.get("alternates") or [])]
+    return not any(DIGIT.search(text) for text in candidates)
+
+def _put_cached_reply(key, result: dict):
+    with _reply_cache_lock:
+        _reply_cache[key] = result
+        _reply_cache.move_to_end(key)
+        while len(_reply_cache) > settings.reply_cache_size:
+            _reply_cache.popitem(last=False)
+
+def draft_review_reply(review_text: str, star_rating: int, client_language: str, offer_policy: str, client_phone: str, client_templates: dict = None):
+    """
+    Drafts a reply using the cheapest tier that fits the review:
+    1. a template for empty or generic-praise 4-5 star reviews,
+    2. a cached reply for an identical (normalized) review,
+    3. generate_review_reply, asking for `draft_candidates` completions.
+    The result carries a "source" key naming the tier that produced it and
+    "alternates", spare reply texts used by "2 / Regenerate".
+    """
+    language = detect_reply_language(review_text, client_language)
+
+    reply_text = template_reply(review_text, star_rating, language, client_templates)
+    if reply_text:
+        draft_counters["template"] += 1
+        library = (client_templates or {}).get(language) or DEFAULT_TEMPLATES.get(language) or DEFAULT_TEMPLATES["en"]
+        options = library.get(star_rating) or library.get(str(star_rating)) or []
+        alternates = [option for option in options if option != reply_text]
+        random.shuffle(alternates)
+        return {"reply_text": reply_text, "risk_level": "low", "is_fake_suspicion": False, "alternates": alternates, "source": "template"}
+
+    key = _reply_cache_key(review_text, star_rating, language, offer_policy)
+    cached = _get_cached_reply(key)
+    if cached is not None:
+        draft_counters["cache"] += 1
+        return {**cached, "source": "cache"}
+
+    result = generate_review_reply(review_text, star_rating, client_language, offer_policy, client_phone, n=settings.draft_candidates)
+    if not result:
         return None
+    draft_counters["model"] += 1
+
+    if _is_shareable(result):
+        _put_cached_reply(key, result)
+    return {**result, "source": "model"}
+
+def draft_stats():
+    with _reply_cache_lock:
+        stats = {**draft_counters, "reply_cache_size": len(_reply_cache)}
+    return {**stats, "routes": model_router.stats(), "prompt_cache": prompts.prompt_cache.stats()}
@@ -0,0 +1,214 @@
+import queue
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+import requests
+from twilio.base.exceptions import TwilioRestException
+from app.core import metrics, resilience
+from app.core.config import settings
+from app.core.ratelimit import TokenBucket
+from app.db.supabase import supabase
+from app.services import client_registry
+
+# Twilio statuses worth retrying; other 4xx errors (bad number, opted out)
+# will fail the same way every time and go straight to the dead-letter store.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Outbound WhatsApp dispatcher. Messages are sharded by recipient onto
+# single-threaded lanes so each owner receives messages in the order they
+# were queued, while a token bucket per sender number keeps us under
+# Twilio's throughput limit.
+_lanes = []
+_threads = []
+_buckets = {}
+_buckets_lock = threading.Lock()
+_running = False
+_dead_letters = deque(maxlen=1000)
+_latencies = deque(maxlen=1000)
+counters = {"queued": 0, "sent": 0, "retries": 0, "dead_lettered": 0}
+
+class PermanentSendError(Exception):
+    """Twilio rejected the message in a way that retrying will not fix."""
+
+def _bucket_for(sender: str):
+    with _buckets_lock:
+        bucket = _buckets.get(sender)
+        if bucket is None:
+            bucket = _buckets[sender] = TokenBucket(settings.outbound_rate_per_sender, settings.outbound_burst_per_sender)
+        return bucket
+
+def is_retryable_twilio_error(error: Exception):
+    if isinstance(error, TwilioRestException):
+        return error.status in RETRYABLE_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+def deliver(message: dict):
+    """
+    Sends one message through Twilio and returns its SID.
+    Raises PermanentSendError for non-retryable failures.
+    """
+    client = client_registry.get_twilio_client()
+    if client is None:
+        raise PermanentSendError("Twilio credentials not fully configured.")
+
+    try:
+        with metrics.timer("twilio_send"):
+            result = resilience.call(
+                "twilio",
+                client.messages.create,
+                retryable=is_retryable_twilio_error,
+                body=message["body"],
+                from_=message["from"],
+                to=message["to"]
+            )
+    except TwilioRestException as e:
+        if is_retryable_twilio_error(e):
+            raise
+        raise PermanentSendError(f"Twilio error {e.status}: {e.msg}") from e
+    return result.sid
+
+def _backoff(attempt: int):
+    # Exponential backoff with full jitter, so throttled lanes do not retry in lockstep.
+    ceiling = min(settings.outbound_retry_max_delay, settings.outbound_retry_base_delay * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+def _dead_letter(message: dict, error: Exception):
+    counters["dead_lettered"] += 1
+    entry = {**{key: value for key, value in message.items() if key != "on_sent"}, "error": str(error)}
+    _dead_letters.append(entry)
+    print(f"Error sending WhatsApp message to {message['to']} after {message['attempts']} attempts: {error}")
+    if supabase is None:
+        return
+    try:
+        supabase.table("outbound_dead_letters").insert({
+            "to_number": message["to"],
+            "from_number": message["from"],
+            "body": message["body"],
+            "attempts": message["attempts"],
+            "last_error": str(error)
+        }).execute()
+    except Exception as e:
+        print(f"Error storing dead-lettered message: {e}")
+
+def send_with_retries(message: dict):
+    """
+    Delivers a message, retrying throttling and server errors with jittered
+    backoff. Returns the SID, or None once the message is dead-lettered.
+    The message's on_sent callback runs only after Twilio accepted it.
+    """
+    while True:
+        message["attempts"] += 1
+        _bucket_for(message["from"]).acquire()
+        started = time.monotonic()
+        try:
+            sid = deliver(message)
+        except PermanentSendError as e:
+            _dead_letter(message, e)
+            return None
+        except resilience.CircuitOpenError as e:
+            # Twilio is down: keep the message queued until the breaker's
+            # trial call, without spending one of its attempts.
+            message["attempts"] -= 1
+            time.sleep(e.retry_after)
+            continue
+        except Exception as e:
+            if message["attempts"] >= settings.outbound_max_attempts:
+                _dead_letter(message, e)
+                return None
+            counters["retries"] += 1
+            time.sleep(_backoff(message["attempts"]))
+            continue
+
+        _latencies.append(time.monotonic() - started)
+        counters["sent"] += 1
+        print(f"WhatsApp message sent: {sid}")
+        if message.get("on_sent"):
+            try:
+                message["on_sent"]()
+            except Exception as e:
+                print(f"Error in on_sent callback for message {message['id']}: {e}")
+        return sid
+
+def _lane_worker(lane: queue.Queue):
+    while True:
+        message = lane.get()
+        try:
+            if message is None:
+                return
+            send_with_retries(message)
+        except Exception as e:
+            print(f"Error in outbound dispatcher: {e}")
+        finally:
+            lane.task_done()
+
+def enqueue(to_whatsapp: str, from_whatsapp: str, body: str, on_sent=None):
+    """
+    Queues a message for delivery and returns its local id. Sends inline
+    when the dispatcher is not running (scripts, tests). `on_sent` is
+    called once Twilio accepted the message, never for a dead letter.
+    """
+    message = {
+        "id": str(uuid.uuid4()),
+        "to": to_whatsapp,
+        "from": from_whatsapp,
+        "body": body,
+        "attempts": 0,
+        "queued_at": time.time(),
+        "on_sent": on_sent
+    }
+    if not _running:
+        return send_with_retries(message)
+
+    counters["queued"] += 1
+    _lanes[zlib.crc32(to_whatsapp.encode()) % len(_lanes)].put(message)
+    return message["id"]
+
+def start(workers: int = None):
+    global _running
+    if _running:
+        return
+    for index in range(workers or settings.outbound_workers):
+        lane = queue.Queue()
+        thread = threading.Thread(target=_lane_worker, args=(lane,), name=f"outbound-{index}", daemon=True)
+        _lanes.append(lane)
+        _threads.append(thread)
+        thread.start()
+    _running = True
+
+def stop(timeout: float = None):
+    """
+    Stops accepting new messages and waits for queued ones to be sent.
+    """
+    global _running
+    if not _running:
+        return
+    _running = False
+    for lane in _lanes:
+        lane.put(None)
+    deadline = time.monotonic() + (timeout or settings.pipeline_drain_timeout)
+    for thread in _threads:
+        thread.join(max(0, deadline - time.monotonic()))
+    left = sum(lane.qsize() for lane in _lanes)
+    if left:
+        print(f"Warning: Outbound dispatcher stopped with {left} messages unsent")
+    _lanes.clear()
+    _threads.clear()
+
+def dead_letters():
+    return list(_dead_letters)
+
+def stats():
+    latencies = sorted(_latencies)
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4) if latencies else None
+    return {
+        **counters,
+        "running": _running,
+        "queue_depth": sum(lane.qsize() for lane in _lanes),
+        "send_latency_p50": percentile(0.5),
+        "send_latency_p95": percentile(0.95),
+        "dead_letter_size": len(_dead_letters)
+    }
@@ -0,0 +1,680 @@
+import asyncio
+import functools
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from app.core import metrics
+from app.core.resilience import CircuitOpenError
+from app.core.config import settings, worker_id
+from app.db import repository
+from app.db.supabase import supabase
+from app.services.openai_service import draft_review_reply
+from app.services.stats_service import record_review_created
+from app.services.notifier import notify_held, notify_review
+from app.services.tenant_cache import get_client_by_location
+from app.services.idempotency import is_unique_violation
+from app.services.scheduler import FairQueue
+from app.services import spam_filter
+
+STAR_RATING_MAP = {
+    "ONE": 1,
+    "TWO": 2,
+    "THREE": 3,
+    "FOUR": 4,
+    "FIVE": 5
+}
+
+# Each job walks through these stages in order. The job row records the next
+# stage to run, so a restarted worker resumes where the previous one stopped.
+STAGES = ("draft", "store", "notify")
+
+class StageError(Exception):
+    """A stage failed in a way that is worth retrying (e.g. OpenAI timeout)."""
+
+class JobSkipped(Exception):
+    """The job can never succeed (e.g. unknown location) and is dropped."""
+
+class DuplicateJob(Exception):
+    """A job for the same Pub/Sub message or review already exists."""
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker claimed it."""
+
+class Overloaded(Exception):
+    """The queue is past its limits; the notification should be redelivered later."""
+
+_queue: FairQueue = None
+# Jobs run on their own threads, one per worker, so a slow OpenAI call never
+# holds a thread of the default executor the webhook's ack path waits on.
+_executor: ThreadPoolExecutor = None
+_workers: list = []
+_retry_tasks: set = set()
+_accepting = False
+_leased = False
+_wakeups: dict = {}  # stage -> asyncio.Event, set when local work becomes claimable
+_running: set = set()  # leased mode: jobs being processed by this process
+_local_ids: set = set()  # local mode: jobs queued, running or retrying in this process
+_recovery_task = None
+
+def parse_notification(data_json: dict):
+    """
+    Extracts the review fields from a decoded Pub/Sub notification.
+    Returns None when the location cannot be determined.
+    """
+    # In a real scenario, we extract location_id and review_id from the notification
+    # We try both standard notification keys and raw review object keys (often used in tests)
+    location_id = data_json.get("locationName")
+    review_id = data_json.get("reviewName") or data_json.get("name")
+    review_text = data_json.get("reviewText") or data_json.get("comment", "No text provided")
+    reviewer_name = (data_json.get("reviewer") or {}).get("displayName") or "Customer"
+
+    # Google API can send ratings as strings (e.g., "ONE", "FIVE") or integers.
+    raw_rating = data_json.get("starRating", 5)
+    if isinstance(raw_rating, str):
+        star_rating = STAR_RATING_MAP.get(raw_rating.upper(), 5)
+    else:
+        star_rating = int(raw_rating)
+
+    # If locationName is missing but reviewName/name is present, extract location from it
+    if not location_id and review_id and "/reviews/" in review_id:
+        location_id = review_id.split("/reviews/")[0]
+
+    if not location_id:
+        return None
+
+    return {
+        "location_id": location_id,
+        "review_id": review_id,
+        "review_text": review_text,
+        "reviewer_name": reviewer_name,
+        "star_rating": star_rating,
+        "received_at": datetime.now(timezone.utc).isoformat()
+    }
+
+def persist_job(review: dict, message_id: str = None):
+    """
+    Stores the notification in review_jobs so it survives a crash or restart.
+    """
+    job = {
+        "id": None,
+        "message_id": message_id,
+        "payload": review,
+        "stage": STAGES[0],
+        "attempts": 0,
+        "draft": None,
+        "pending_review_id": None
+    }
+    if supabase is None:
+        print("Warning: Supabase not configured. Review job is kept in memory only.")
+        job["id"] = str(uuid.uuid4())
+        return job
+
+    try:
+        res = supabase.table("review_jobs").insert({
+            "message_id": message_id,
+            "google_review_id": review.get("review_id"),
+            "payload": review,
+            "stage": job["stage"],
+            "status": "queued"
+        }).execute()
+    except Exception as e:
+        if is_unique_violation(e):
+            raise DuplicateJob(f"Review job already exists for {review.get('review_id')}") from e
+        raise
+    job["id"] = res.data[0]["id"]
+    return job
+
+def _save_job(job: dict, **fields):
+    if supabase is None:
+        return
+    query = supabase.table("review_jobs").update(fields).eq("id", job["id"])
+    lease_owner = job.get("lease_owner")
+    if lease_owner:
+        # A worker whose lease expired must not overwrite the new owner's progress.
+        query = query.eq("lease_owner", lease_owner)
+    res = query.execute()
+    if lease_owner and not res.data:
+        raise LeaseLost(f"Lease on review job {job['id']} was reclaimed by another worker")
+
+def _get_client(job: dict):
+    if job.get("client"):
+        return job["client"]
+
+    location_id = job["payload"]["location_id"]
+    client = get_client_by_location(location_id)
+    if not client:
+        metrics.record_outcome("client_not_found")
+        raise JobSkipped(f"Client not found for location: {location_id}")
+
+    job["client"] = client
+    return client
+
+def _needs_review(job: dict):
+    return (job.get("draft") or {}).get("source") == "spam_filter"
+
+def run_draft(job: dict):
+    """
+    Stage 1: generates the AI draft for the review. Reviews the spam screen
+    flags get an empty draft instead and are held for a human.
+    """
+    review = job["payload"]
+    client = _get_client(job)
+    if not review.get("screened"):
+        # Only on the first attempt, so a retry is not counted twice. The
+        # flag lives in the payload, which is saved with the next checkpoint
+        # or failure, so recovered and reclaimed jobs are not screened again.
+        review["screened"] = True
+        reason = spam_filter.screen(review["location_id"], review.get("review_id"), review["review_text"])
+        if reason:
+            job["draft"] = {
+                "reply_text": "",
+                "risk_level": "high",
+                "is_fake_suspicion": True,
+                "alternates": [],
+                "source": "spam_filter",
+                "spam_reason": reason
+            }
+            return {"draft": job["draft"], "payload": review}
+
+    ai_reply = draft_review_reply(
+        review["review_text"],
+        review["star_rating"],
+        client["language_preference"],
+        client.get("offer_policy", "STRICT - NO OFFERS"),
+        client["phone_number"],
+        client_templates=client.get("reply_templates")
+    )
+    if not ai_reply:
+        metrics.record_outcome("ai_generation_failed")
+        raise StageError("AI generation failed")
+
+    job["draft"] = ai_reply
+    return {"draft": ai_reply, "payload": review}
+
+def run_store(job: dict):
+    """Stage 2: stores the draft in pending_reviews."""
+    review = job["payload"]
+    client = _get_client(job)
+    pending_data = {
+        "client_id": client["id"],
+        "google_review_id": review["review_id"],
+        "review_text": review["review_text"],
+        "star_rating": review["star_rating"],
+        "draft_reply": job["draft"].get("reply_text", ""),
+        "draft_alternates": job["draft"].get("alternates", []),
+        "status": "needs_review" if _needs_review(job) else "pending",
+        "received_at": review.get("received_at")
+    }
+    try:
+        with metrics.timer("insert"):
+            row = repository.insert_review(pending_data)
+    except Exception as e:
+        if not is_unique_violation(e):
+            raise
+        # A previous attempt stored the row but crashed before checkpointing.
+        job["pending_review_id"] = repository.find_review_id(review["review_id"])
+        return {"pending_review_id": job["pending_review_id"]}
+
+    job["pending_review_id"] = row["id"]
+    if _needs_review(job):
+        metrics.record_outcome("spam_suspected")
+        return {"pending_review_id": job["pending_review_id"]}
+    record_review_created(client["id"])
+    metrics.record_outcome("stored")
+    return {"pending_review_id": job["pending_review_id"]}
+
+def complete_job(job: dict):
+    """Marks a job done once its dashboard has been sent."""
+    fields = {"stage": "done", "status": "done"}
+    if job.get("lease_owner"):
+        fields.update(lease_owner=None, lease_expires_at=None)
+    _save_job(job, **fields)
+    job["stage"] = "done"
+    job["lease_owner"] = None
+
+def run_notify(job: dict):
+    """
+    Stage 3: queues the review for the client's next WhatsApp dashboard.
+    Returns None: the job stays at this stage (and keeps its lease) until
+    Twilio accepted the digest, then complete_job marks it done. A job whose
+    digest was never delivered is notified again by recovery or a lease reclaim.
+    Reviews held by the spam screen are only counted in that message.
+    """
+    client = _get_client(job)
+    if _needs_review(job):
+        notify_held(client, on_sent=lambda: complete_job(job))
+        return None
+    review = job["payload"]
+    notify_review(client, {
+        "pending_review_id": job["pending_review_id"],
+        "star_rating": review["star_rating"],
+        "reviewer_name": review["reviewer_name"],
+        "review_text": review["review_text"],
+        "draft_text": job["draft"].get("reply_text", "")
+    }, on_sent=lambda: complete_job(job))
+    return None
+
+def release_held_review(client: dict, review: dict):
+    """
+    Drafts a reply for a pending_reviews row the spam screen held, without
+    screening it again, and queues it for the client's next dashboard.
+    Returns False, without counting or notifying it, when drafting fails
+    or the review is no longer held.
+    """
+    try:
+        ai_reply = draft_review_reply(
+            review["review_text"],
+            review["star_rating"],
+            client["language_preference"],
+            client.get("offer_policy", "STRICT - NO OFFERS"),
+            client["phone_number"],
+            client_templates=client.get("reply_templates")
+        )
+    except CircuitOpenError as e:
+        print(f"Error drafting held review {review['id']}: {e}")
+        return False
+    if not ai_reply or not ai_reply.get("reply_text"):
+        return False
+
+    released = repository.transition_review(review["id"], {
+        "draft_reply": ai_reply["reply_text"],
+        "draft_alternates": ai_reply.get("alternates", []),
+        "status": "pending"
+    }, expect_status="needs_review")
+    if not released:
+        # Released or rejected meanwhile, e.g. by a RELEASE handled elsewhere.
+        return False
+    record_review_created(client["id"])
+    metrics.record_outcome("spam_released")
+    notify_review(client, {
+        "pending_review_id": review["id"],
+        "star_rating": review["star_rating"],
+        "reviewer_name": review.get("reviewer_name") or "Customer",
+        "review_text": review["review_text"],
+        "draft_text": ai_reply["reply_text"]
+    })
+    return True
+
+STAGE_RUNNERS = {
+    "draft": run_draft,
+    "store": run_store,
+    "notify": run_notify
+}
+
+def process_job(job: dict, until: str = None):
+    """
+    Runs the remaining stages of a job, checkpointing after each one.
+    Stops after the `until` stage when given, or at a stage that completes
+    the job later (returns None).
+    """
+    while job["stage"] in STAGE_RUNNERS:
+        stage = job["stage"]
+        fields = STAGE_RUNNERS[stage](job)
+        if fields is None:
+            break
+        index = STAGES.index(stage)
+        job["stage"] = STAGES[index + 1] if index + 1 < len(STAGES) else "done"
+        fields["stage"] = job["stage"]
+        if job["stage"] == "done":
+            fields["status"] = "done"
+        release = job.get("lease_owner") and (stage == until or job["stage"] == "done")
+        if release:
+            # Hand the next stage to whichever worker claims it first.
+            fields.update(lease_owner=None, lease_expires_at=None)
+        _save_job(job, **fields)
+        if release:
+            job["lease_owner"] = None
+        if stage == until:
+            break
+    return job
+
+def fail_job(job: dict, status: str, error: Exception, retry_in: float = None):
+    """
+    Records a failed attempt. With `retry_in` (leased mode) the job becomes
+    claimable again after that many seconds.
+    """
+    fields = {"status": status, "attempts": job["attempts"], "last_error": str(error)}
+    if job["stage"] == "draft" and job["payload"].get("screened"):
+        fields["payload"] = job["payload"]
+    if job.get("lease_owner"):
+        fields.update(lease_owner=None, lease_expires_at=None)
+    if retry_in is not None:
+        fields["available_at"] = (datetime.now(timezone.utc) + timedelta(seconds=retry_in)).isoformat()
+    try:
+        _save_job(job, **fields)
+    except Exception as e:
+        print(f"Error saving review job {job['id']}: {e}")
+
+def _tenant_key(job: dict):
+    # Jobs recovered after a restart have no client yet; their location
+    # stands in for the tenant.
+    return job.get("tenant") or (job.get("client") or {}).get("id") or job["payload"].get("location_id")
+
+def _enqueue(job: dict):
+    _local_ids.add(job["id"])
+    client = job.get("client") or {}
+    _queue.put(_tenant_key(job), job, client.get("drafting_weight") or 1)
+
+async def _run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(fn, *args))
+
+async def _requeue_later(job: dict, delay: float):
+    try:
+        await asyncio.sleep(delay)
+        if _accepting:
+            _enqueue(job)
+    finally:
+        _retry_tasks.discard(asyncio.current_task())
+
+async def _execute(job: dict, until: str = None):
+    """
+    Runs a job (or, with `until`, one stage of it) and records failures.
+    Returns the delay before the job should be retried, or None.
+    """
+    leased = bool(job.get("lease_owner"))
+    try:
+        await _run_blocking(process_job, job, until)
+    except LeaseLost as e:
+        print(f"Warning: {e}")
+    except JobSkipped as e:
+        print(f"INFO: Review job {job['id']} skipped: {e}")
+        await _run_blocking(fail_job, job, "skipped", e)
+    except CircuitOpenError as e:
+        # A dependency is down: wait for the breaker's trial call without
+        # spending one of the job's attempts.
+        metrics.record_outcome("deferred")
+        print(f"INFO: Review job {job['id']} deferred at stage '{job['stage']}': {e}")
+        delay = max(e.retry_after, settings.pipeline_retry_base_delay)
+        await _run_blocking(fail_job, job, "queued", e, delay if leased else None)
+        return delay
+    except Exception as e:
+        job["attempts"] += 1
+        print(f"Error in review job {job['id']} at stage '{job['stage']}' (attempt {job['attempts']}): {e}")
+        if job["attempts"] >= settings.pipeline_max_attempts:
+            metrics.record_outcome("job_failed")
+            await _run_blocking(fail_job, job, "failed", e)
+        else:
+            delay = settings.pipeline_retry_base_delay * (2 ** (job["attempts"] - 1))
+            await _run_blocking(fail_job, job, "queued", e, delay if leased else None)
+            return delay
+    return None
+
+async def _worker(index: int):
+    while True:
+        tenant, job = await _queue.get()
+        try:
+            delay = await _execute(job)
+            if delay is not None:
+                task = asyncio.create_task(_requeue_later(job, delay))
+                _retry_tasks.add(task)
+            else:
+                _local_ids.discard(job["id"])
+        finally:
+            _queue.task_done(tenant)
+
+def claim_jobs(stage: str, limit: int = 1):
+    """
+    Leases up to `limit` queued jobs waiting at `stage`. Jobs leased by a
+    live worker in any process are skipped; expired leases are reclaimed.
+    """
+    # One lease owner per claim, so a reclaimed job is detected even when the
+    # new owner is another worker of this same process.
+    lease_owner = f"{worker_id()}:{uuid.uuid4().hex[:8]}"
+    res = supabase.rpc("claim_review_jobs", {
+        "p_stage": stage,
+        "p_worker": lease_owner,
+        "p_limit": limit,
+        "p_lease_seconds": settings.pipeline_lease_seconds
+    }).execute()
+    jobs = []
+    for row in res.data or []:
+        job = _job_from_row(row)
+        job["lease_owner"] = row["lease_owner"]
+        jobs.append(job)
+    return jobs
+
+async def _stage_worker(stage: str):
+    """Leased mode: claims and runs one stage of one job at a time."""
+    wakeup = _wakeups[stage]
+    while _accepting:
+        wakeup.clear()
+        try:
+            jobs = await _run_blocking(claim_jobs, stage)
+        except Exception as e:
+            print(f"Error claiming review jobs at stage '{stage}': {e}")
+            jobs = []
+
+        if not jobs:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=settings.pipeline_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        for job in jobs:
+            _running.add(job["id"])
+            try:
+                await _execute(job, until=stage)
+            finally:
+                _running.discard(job["id"])
+            if job["stage"] in _wakeups:
+                _wakeups[job["stage"]].set()
+
+def stage_workers(stage: str):
+    return getattr(settings, f"pipeline_{stage}_workers", 0) or settings.pipeline_workers
+
+def _lookup_client(location_id: str):
+    try:
+        return get_client_by_location(location_id)
+    except Exception as e:
+        # The draft stage looks the client up again (and skips unknown ones).
+        print(f"Error looking up client for {location_id}: {e}")
+        return None
+
+def _queued_jobs(location_id: str):
+    """Leased mode: queued review_jobs for a location, in every process."""
+    res = supabase.table("review_jobs") \
+        .select("id", count="exact") \
+        .eq("status", "queued") \
+        .like("google_review_id", f"{location_id}/reviews/%") \
+        .limit(1) \
+        .execute()
+    return res.count or 0
+
+async def submit(review: dict, message_id: str = None):
+    """
+    Persists a parsed notification and hands it to the worker pool.
+    Raises Overloaded, before persisting anything, when the client's or the
+    whole queue is past its limit.
+    """
+    if not _accepting:
+        raise RuntimeError("Review pipeline is not running")
+    if _leased:
+        # The shared queue is review_jobs itself; a location stands in for
+        # its client, like recovered jobs do in the local queue.
+        if settings.pipeline_tenant_max_queue and review.get("location_id"):
+            queued = await asyncio.to_thread(_queued_jobs, review["location_id"])
+            if queued >= settings.pipeline_tenant_max_queue:
+                _queue.counters["rejected"] += 1
+                raise Overloaded(f"Review queue is full for location {review['location_id']}")
+        job = await asyncio.to_thread(persist_job, review, message_id)
+        _wakeups[STAGES[0]].set()
+        return job
+
+    client = await asyncio.to_thread(_lookup_client, review["location_id"])
+    tenant = client["id"] if client else review["location_id"]
+    if not _queue.admits(tenant):
+        raise Overloaded(f"Review queue is full for tenant {tenant}")
+    job = await asyncio.to_thread(persist_job, review, message_id)
+    job["tenant"] = tenant
+    if client:
+        job["client"] = client
+    _enqueue(job)
+    return job
+
+def _job_from_row(row: dict):
+    return {
+        "id": row["id"],
+        "message_id": row.get("message_id"),
+        "payload": row["payload"],
+        "stage": row["stage"],
+        "attempts": row.get("attempts") or 0,
+        "draft": row.get("draft"),
+        "pending_review_id": row.get("pending_review_id")
+    }
+
+def find_unfinished_job(review_id: str):
+    """
+    Returns the still-queued job for a review, e.g. when a redelivered
+    message finds the job that an earlier delivery persisted but never finished.
+    """
+    if supabase is None or not review_id:
+        return None
+    res = supabase.table("review_jobs") \
+        .select("*") \
+        .eq("google_review_id", review_id) \
+        .eq("status", "queued") \
+        .limit(1) \
+        .execute()
+    return _job_from_row(res.data[0]) if res.data else None
+
+def _load_unfinished_jobs(exclude: set = frozenset()):
+    """
+    Claims queued jobs nobody has touched for pipeline_recovery_age seconds,
+    i.e. left behind by a stopped process rather than waiting in a live one
+    (another web worker or the consumer).
+    """
+    if supabase is None:
+        return []
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=settings.pipeline_recovery_age)).isoformat()
+    res = supabase.table("review_jobs") \
+        .select("*") \
+        .eq("status", "queued") \
+        .lt("updated_at", cutoff) \
+        .order("created_at") \
+        .execute()
+    jobs = []
+    for row in res.data:
+        if row["id"] in exclude:
+            continue
+        # Touching the row (the trigger bumps updated_at) claims it: a process
+        # recovering at the same time no longer matches it.
+        claimed = supabase.table("review_jobs") \
+            .update({"status": "queued"}) \
+            .eq("id", row["id"]) \
+            .eq("updated_at", row["updated_at"]) \
+            .execute()
+        if claimed.data:
+            jobs.append(_job_from_row(row))
+    return jobs
+
+async def _recover_jobs():
+    try:
+        jobs = await asyncio.to_thread(_load_unfinished_jobs, set(_local_ids))
+    except Exception as e:
+        print(f"Error loading unfinished review jobs: {e}")
+        return 0
+    for job in jobs:
+        _enqueue(job)
+    return len(jobs)
+
+async def _recovery_loop():
+    while _accepting:
+        await asyncio.sleep(settings.pipeline_recovery_interval)
+        recovered = await _recover_jobs()
+        if recovered:
+            print(f"INFO: Recovered {recovered} abandoned review jobs")
+
+async def start(workers: int = None):
+    """
+    Starts the worker pool and re-queues jobs left over from a previous run.
+    In leased mode starts per-stage workers that claim jobs from review_jobs.
+    """
+    global _queue, _accepting, _leased, _executor, _recovery_task
+    _queue = FairQueue(
+        settings.pipeline_tenant_concurrency,
+        max_depth=settings.pipeline_max_queue,
+        tenant_max_depth=settings.pipeline_tenant_max_queue
+    )
+    _accepting = True
+    _leased = settings.pipeline_mode == "leased"
+    if _leased and supabase is None:
+        print("Warning: Leased pipeline mode needs Supabase. Using the in-process queue.")
+        _leased = False
+
+    if _leased:
+        # No start-up recovery needed: unfinished jobs are simply claimable.
+        _executor = ThreadPoolExecutor(
+            max_workers=sum(workers or stage_workers(stage) for stage in STAGES),
+            thread_name_prefix="pipeline"
+        )
+        for stage in STAGES:
+            _wakeups[stage] = asyncio.Event()
+            for _ in range(workers or stage_workers(stage)):
+                _workers.append(asyncio.create_task(_stage_worker(stage)))
+        counts = ", ".join(f"{stage}={workers or stage_workers(stage)}" for stage in STAGES)
+        print(f"INFO: Review pipeline started in leased mode ({counts} workers)")
+        return
+
+    recovered = await _recover_jobs()
+    if supabase is not None and settings.pipeline_recovery_interval > 0:
+        _recovery_task = asyncio.create_task(_recovery_loop())
+
+    _executor = ThreadPoolExecutor(max_workers=workers or settings.pipeline_workers, thread_name_prefix="pipeline")
+    for index in range(workers or settings.pipeline_workers):
+        _workers.append(asyncio.create_task(_worker(index)))
+    print(f"INFO: Review pipeline started with {len(_workers)} workers ({recovered} jobs recovered)")
+
+async def stop(timeout: float = None):
+    """
+    Stops accepting jobs and drains the queue before cancelling the workers.
+    Jobs that do not finish in time stay 'queued' and are recovered by a later
+    start or sweep once pipeline_recovery_age has passed.
+    """
+    global _accepting, _executor, _recovery_task
+    _accepting = False
+    for task in list(_retry_tasks):
+        task.cancel()
+    if _recovery_task is not None:
+        _recovery_task.cancel()
+        await asyncio.gather(_recovery_task, return_exceptions=True)
+        _recovery_task = None
+
+    if _leased:
+        # Workers exit after their current job; unfinished leases expire and
+        # are reclaimed by other processes.
+        for event in _wakeups.values():
+            event.set()
+        pending = ()
+        if _workers:
+            _, pending = await asyncio.wait(_workers, timeout=timeout or settings.pipeline_drain_timeout)
+        if pending:
+            print(f"Warning: Review pipeline drain timed out with {len(_running)} jobs running")
+    elif _queue is not None:
+        try:
+            await asyncio.wait_for(_queue.join(), timeout=timeout or settings.pipeline_drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"Warning: Review pipeline drain timed out with {_queue.qsize()} jobs left")
+
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _local_ids.clear()
+    if _executor is not None:
+        # Jobs still running after the drain timeout finish in the background.
+        _executor.shutdown(wait=False)
+        _executor = None
+
+def stats():
+    return {
+        "mode": "leased" if _leased else "local",
+        "accepting": _accepting,
+        "workers": len(_workers),
+        "running": len(_running),
+        "queued": _queue.qsize() if _queue is not None else 0,
+        "retrying": len(_retry_tasks),
+        "rejected": _queue.counters["rejected"] if _queue is not None else 0,
+        # A list, so /metrics does not turn client ids into metric names.
+        "tenants": _queue.tenant_stats() if _queue is not None else []
+    }
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+from app.core.config import settings
+
+# Drafting prompts are laid out static-first so every request shares the
+# longest possible prefix, which is what provider-side prompt caching keys on:
+#   1. system: the rules, identical for every client and review
+#   2. system: the client's phone and offer policy, compiled once per client
+#   3. user:   the review, its rating and, for "2 / Regenerate", the retry note
+
+STATIC_RULES = """
+You are "Salim", a smart, humble, and professional Omani restaurant manager.
+
+**Language & Tone Detection:**
+- Detect the language of the Review Text.
+- If Arabic or Mixed (Arabic/English) -> Reply in Omani Arabic (White Dialect).
+- If English -> Reply in English.
+
+**Rules for Replies (NEVER BREAK THESE):**
+1. **RELEVANCE RULE:** Do not be generic. You MUST mention specific items or topics mentioned by the user (e.g., 'Tea', 'Staff', 'Cleanliness', 'Atmosphere'). Mirror their topic.
+2. **STRICT SAFETY POLICY (NO OFFERS):** You are FORBIDDEN from offering 'compensation' (تعويض), 'refunds' (استرجاع), 'free items', or saying 'we will make it up to you'.
+3. **COMPLAINTS HANDLING:** For complaints or negative reviews (1-3 stars), only promise to listen and investigate.
+4. **MANDATORY PHRASES:**
+   - Arabic (for complaints): 'يرجى التواصل معنا لمتابعة الموضوع ومراجعة التفاصيل' (followed by the Client Phone)
+   - English (for complaints): 'Please contact us directly at <Client Phone> so we can look into this matter.'
+
+**Logic by Star Rating:**
+- 5 Stars: Thank them warmly and mention what they liked.
+- 1-3 Stars: Apologize, mention their specific concern, and use the mandatory contact phrase.
+
+**Output Format:**
+Return valid JSON: {"reply_text": "string", "risk_level": "low|high", "is_fake_suspicion": boolean}
+""".strip()
+
+CLIENT_CONTEXT = """
+**Context:**
+- Client Phone (for contact): {client_phone}
+- **OFFER POLICY (CRITICAL):** {offer_policy}
+""".strip()
+
+RETRY_INSTRUCTION = "**RETRY INSTRUCTION:** The previous draft was rejected. Write a COMPLETELY DIFFERENT option. Change the tone slightly or make it shorter while respecting all rules."
+
+# Routes requests with the same static prefix to the same provider cache.
+PROMPT_CACHE_KEY = "review-reply-v2"
+
+class PromptCache:
+    """
+    Compiled per-client system messages, keyed by phone number. An entry
+    is rebuilt when the client's offer policy no longer matches it, and
+    dropped by the clients webhook (see tenant_cache.handle_client_change).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # client_phone -> (offer_policy, messages)
+        self.counters = {"hits": 0, "compiles": 0, "invalidations": 0}
+
+    def get(self, client_phone: str, offer_policy: str):
+        offer_policy = offer_policy or ""
+        with self._lock:
+            entry = self._entries.get(client_phone)
+            if entry is not None and entry[0] == offer_policy:
+                self._entries.move_to_end(client_phone)
+                self.counters["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                self.counters["invalidations"] += 1
+
+        messages = (
+            {"role": "system", "content": STATIC_RULES},
+            {"role": "system", "content": CLIENT_CONTEXT.format(client_phone=client_phone, offer_policy=offer_policy)},
+        )
+        with self._lock:
+            self._entries[client_phone] = (offer_policy, messages)
+            self._entries.move_to_end(client_phone)
+            self.counters["compiles"] += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return messages
+
+    def invalidate(self, client_phone: str):
+        with self._lock:
+            if self._entries.pop(client_phone, None) is not None:
+                self.counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "size": len(self._entries)}
+
+prompt_cache = PromptCache(settings.prompt_cache_size)
+
+def build_messages(client_phone: str, offer_policy: str, review_text: str, star_rating: int, is_retry: bool = False):
+    """Chat messages for one draft: the client's cached prefix plus the review."""
+    user_prompt = f"Review: {review_text}\nStar Rating: {star_rating}"
+    if is_retry:
+        user_prompt += f"\n\n{RETRY_INSTRUCTION}"
+    return [*prompt_cache.get(client_phone, offer_policy), {"role": "user", "content": user_prompt}]
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from app.core.config import settings
+from app.db import repository
+
+# Hot/cold storage for pending_reviews. Posted and rejected reviews older
+# than retention_days are moved to pending_reviews_archive (migration 018) in
+# batches, so the hot queries (latest pending, pending count, posted today)
+# only ever see open work and recent history. Every process runs the mover;
+# archive_pending_reviews skips rows another mover has locked.
+_retention_task = None
+counters = {"runs": 0, "batches": 0, "archived": 0, "errors": 0}
+last_run = {"at": None, "archived": 0, "seconds": 0.0}
+
+def archive_batch(limit: int, older_than_days: int = None):
+    """Moves up to `limit` terminal reviews to the archive; returns how many moved."""
+    return repository.archive_reviews(settings.retention_days if older_than_days is None else older_than_days, limit)
+
+def run_once(max_batches: int = None):
+    """
+    Archives batches until one comes back short or `max_batches` (default
+    retention_max_batches) have run, pausing between batches to keep the
+    load on the database low. Returns the number of reviews moved.
+    """
+    max_batches = max_batches or settings.retention_max_batches
+    started = time.perf_counter()
+    archived = 0
+    for batch in range(max_batches):
+        if batch:
+            time.sleep(settings.retention_batch_pause)
+        moved = archive_batch(settings.retention_batch_size)
+        counters["batches"] += 1
+        archived += moved
+        if moved < settings.retention_batch_size:
+            break
+
+    counters["runs"] += 1
+    counters["archived"] += archived
+    last_run.update(at=time.time(), archived=archived, seconds=round(time.perf_counter() - started, 3))
+    return archived
+
+async def _retention_loop():
+    while True:
+        await asyncio.sleep(settings.retention_interval)
+        try:
+            archived = await asyncio.to_thread(run_once)
+            if archived:
+                print(f"INFO: Archived {archived} posted or rejected reviews")
+        except Exception as e:
+            counters["errors"] += 1
+            print(f"Error archiving reviews: {e}")
+
+async def start():
+    global _retention_task
+    if settings.retention_interval > 0:
+        _retention_task = asyncio.create_task(_retention_loop())
+
+async def stop():
+    global _retention_task
+    if _retention_task is not None:
+        _retention_task.cancel()
+        await asyncio.gather(_retention_task, return_exceptions=True)
+        _retention_task = None
+
+def stats():
+    return {**counters, "last_run": dict(last_run)}
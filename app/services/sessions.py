@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
+from app.db.supabase import supabase
+
+# Per-phone conversation state: the pending_reviews ids shown in the last
+# dashboard or digest sent to the owner, in display order. WhatsApp commands
+# ("1", "2", "1 3") resolve against it instead of re-querying for the latest
+# pending review, which may be newer than the message being answered.
+
+class MemorySessionStore:
+    """TTL + LRU sessions for a single process."""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # phone_number -> (expires_at, session)
+        self.counters = {"saves": 0, "hits": 0, "misses": 0, "expired": 0}
+
+    def save(self, phone_number: str, session: dict):
+        with self._lock:
+            self._sessions[phone_number] = (time.monotonic() + self.ttl, session)
+            self._sessions.move_to_end(phone_number)
+            self.counters["saves"] += 1
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+
+    def get(self, phone_number: str):
+        with self._lock:
+            entry = self._sessions.get(phone_number)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self._sessions[phone_number]
+                self.counters["expired"] += 1
+                return None
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "backend": "memory", "size": len(self._sessions)}
+
+class SupabaseSessionStore:
+    """
+    Sessions in the whatsapp_sessions table (migration 013), shared by the
+    web workers and the consumer process that sends the dashboards.
+    One row per phone, so the table never grows beyond the client count.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.counters = {"saves": 0, "hits": 0, "misses": 0}
+
+    def save(self, phone_number: str, session: dict):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        supabase.table("whatsapp_sessions").upsert({
+            "phone_number": phone_number,
+            "client_id": session.get("client_id"),
+            "review_ids": session["review_ids"],
+            "expires_at": expires_at.isoformat()
+        }, on_conflict="phone_number").execute()
+        self.counters["saves"] += 1
+
+    def get(self, phone_number: str):
+        res = supabase.table("whatsapp_sessions") \
+            .select("client_id, review_ids") \
+            .eq("phone_number", phone_number) \
+            .gt("expires_at", datetime.now(timezone.utc).isoformat()) \
+            .limit(1) \
+            .execute()
+        if not res.data:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return res.data[0]
+
+    def stats(self):
+        return {**self.counters, "backend": "supabase"}
+
+def _build_store():
+    backend = settings.session_backend or ("supabase" if supabase is not None else "memory")
+    if backend == "supabase" and supabase is not None:
+        return SupabaseSessionStore(settings.session_ttl)
+    return MemorySessionStore(settings.session_ttl, settings.session_cache_size)
+
+store = _build_store()
+
+def save(phone_number: str, review_ids: list, client_id: str = None):
+    """Records the reviews the message just sent to the phone shows, in order."""
+    try:
+        store.save(phone_number, {"client_id": client_id, "review_ids": list(review_ids)})
+    except Exception as e:
+        # Commands fall back to the latest pending review without a session.
+        print(f"Error saving session for {phone_number}: {e}")
+
+def get(phone_number: str):
+    """Returns {"client_id", "review_ids"} for the phone, or None if expired."""
+    try:
+        return store.get(phone_number)
+    except Exception as e:
+        print(f"Error reading session for {phone_number}: {e}")
+        return None
+
+def get_review_ids(phone_number: str):
+    session = get(phone_number)
+    return session["review_ids"] if session else None
+
+def stats():
+    return store.stats()
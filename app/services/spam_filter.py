@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from app.core.config import settings
+from app.services.openai_service import normalize_review_text
+
+# Screens reviews before any drafting tier runs, so suspected fakes never
+# cost a model call. Two local signals:
+#   - near-duplicates: word-bigram shingles compared by Jaccard similarity,
+#     with candidates found through MinHash bands (one-permutation hashing:
+#     each shingle hash lands in one of SIGNATURE_BINS bins, which keep their
+#     minimum), against recent reviews of every location
+#   - bursts: more than spam_burst_limit reviews for one location within
+#     spam_burst_window seconds
+# Memory is bounded by spam_max_reviews signatures and spam_max_locations
+# arrival windows, both evicted oldest first.
+
+SIGNATURE_BINS = 16
+BAND_SIZE = 4
+# Candidates kept per band key, so a very common phrase cannot make a lookup
+# scan the whole window.
+MAX_BUCKET = 32
+EMPTY_BIN = 1 << 64
+EMPTY_BAND = (EMPTY_BIN,) * BAND_SIZE
+
+def shingles(words: list):
+    """Hashes of the word bigrams of a normalized review."""
+    return frozenset(map(hash, zip(words, words[1:])))
+
+def signature(shingle_hashes: frozenset):
+    bins = [EMPTY_BIN] * SIGNATURE_BINS
+    for value in shingle_hashes:
+        index = value % SIGNATURE_BINS
+        if value < bins[index]:
+            bins[index] = value
+    return bins
+
+def band_keys(bins: list):
+    # Bands of empty bins say nothing about similarity and are left out.
+    keys = []
+    for start in range(0, SIGNATURE_BINS, BAND_SIZE):
+        band = tuple(bins[start:start + BAND_SIZE])
+        if band != EMPTY_BAND:
+            keys.append((start, band))
+    return keys
+
+def jaccard(a: frozenset, b: frozenset):
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+class SpamFilter:
+    """
+    In-memory screen for fake-review patterns, shared by the pipeline
+    workers of one process (leased-mode processes each screen their own
+    share of the traffic).
+    """
+
+    def __init__(self, max_reviews: int, max_locations: int):
+        self.max_reviews = max_reviews
+        self.max_locations = max_locations
+        self._lock = threading.Lock()
+        self._reviews = deque()  # (review_id, location_id, seen_at, shingles, band keys)
+        self._buckets = {}       # band key -> list of entries
+        self._arrivals = OrderedDict()  # location_id -> deque of arrival times
+        self.counters = {"checked": 0, "duplicate": 0, "cross_location_duplicate": 0, "burst": 0}
+
+    def _burst(self, location_id: str, now: float):
+        arrivals = self._arrivals.get(location_id)
+        if arrivals is None:
+            arrivals = self._arrivals[location_id] = deque(maxlen=settings.spam_burst_limit + 1)
+            while len(self._arrivals) > self.max_locations:
+                self._arrivals.popitem(last=False)
+        self._arrivals.move_to_end(location_id)
+        arrivals.append(now)
+        return len(arrivals) > settings.spam_burst_limit and now - arrivals[0] <= settings.spam_burst_window
+
+    def _evict(self, now: float):
+        reviews = self._reviews
+        while reviews and (len(reviews) > self.max_reviews or now - reviews[0][2] > settings.spam_window_seconds):
+            entry = reviews.popleft()
+            for key in entry[4]:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                try:
+                    bucket.remove(entry)
+                except ValueError:
+                    pass  # already pushed out of a full bucket
+                if not bucket:
+                    del self._buckets[key]
+
+    def _duplicate_of(self, review_id: str, location_id: str, items: frozenset, keys: list):
+        """The closest earlier review at or above spam_similarity, or None."""
+        best, best_score = None, settings.spam_similarity
+        seen = set()
+        for key in keys:
+            for entry in self._buckets.get(key, ()):
+                if id(entry) in seen or (review_id and entry[0] == review_id):
+                    continue
+                seen.add(id(entry))
+                score = jaccard(items, entry[3])
+                # Prefer a match from the same location at equal similarity.
+                if score > best_score or (score == best_score and (best is None or entry[1] == location_id)):
+                    best, best_score = entry, score
+        return best
+
+    def _remember(self, entry: tuple):
+        self._reviews.append(entry)
+        for key in entry[4]:
+            bucket = self._buckets.setdefault(key, [])
+            bucket.append(entry)
+            if len(bucket) > MAX_BUCKET:
+                del bucket[0]
+
+    def check(self, location_id: str, review_id: str, review_text: str, now: float = None):
+        """
+        Records a review and returns why it looks fake ("duplicate",
+        "cross_location_duplicate" or "burst"), or None. Call once per review;
+        a redelivered review_id never matches itself.
+        """
+        now = time.monotonic() if now is None else now
+        words = normalize_review_text(review_text).split()
+        items = shingles(words) if len(words) >= settings.spam_min_words else frozenset()
+        keys = band_keys(signature(items)) if items else []
+
+        with self._lock:
+            self.counters["checked"] += 1
+            self._evict(now)
+            reason = None
+            match = self._duplicate_of(review_id, location_id, items, keys) if items else None
+            if match is not None:
+                reason = "duplicate" if match[1] == location_id else "cross_location_duplicate"
+            if self._burst(location_id, now) and reason is None:
+                reason = "burst"
+            if items:
+                self._remember((review_id, location_id, now, items, keys))
+            if reason:
+                self.counters[reason] += 1
+            return reason
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "reviews": len(self._reviews), "locations": len(self._arrivals)}
+
+spam_filter = SpamFilter(settings.spam_max_reviews, settings.spam_max_locations)
+
+def screen(location_id: str, review_id: str, review_text: str):
+    """Why a review should skip drafting and wait for a human, or None."""
+    if not settings.spam_filter:
+        return None
+    return spam_filter.check(location_id, review_id, review_text)
+
+def stats():
+    return spam_filter.stats()
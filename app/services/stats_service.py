@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from datetime import date
+from app.core import metrics
+from app.core.config import settings
+from app.db import repository
+
+# Per-client dashboard counters, kept up to date by the code paths that insert
+# reviews or change their status. A client is seeded from the database the
+# first time it is seen and reconciled periodically to correct drift (e.g.
+# writes made by another process).
+_lock = threading.Lock()
+_counters = {}  # client_id -> {"day": date, "pending": int, "posted": int}
+_reconcile_task = None
+counters = {"hits": 0, "seeds": 0, "reconciled": 0, "drift_corrections": 0}
+
+def count_daily_stats(client_id: str):
+    """Counts pending reviews and the reviews posted today."""
+    return repository.count_daily_stats(client_id)
+
+def _current(client_id: str):
+    entry = _counters.get(client_id)
+    if entry is None:
+        return None
+    today = date.today()
+    if entry["day"] != today:
+        # A new day: pending reviews carry over, the posted counter restarts.
+        entry["day"] = today
+        entry["posted"] = 0
+    return entry
+
+def get_daily_stats(client_id: str):
+    """
+    Returns today's pending and posted counts for the dashboard header.
+    Served from memory; only the first call for a client hits the database.
+    """
+    with _lock:
+        entry = _current(client_id)
+        if entry is not None:
+            counters["hits"] += 1
+            return {"pending": entry["pending"], "posted": entry["posted"]}
+
+    with metrics.timer("stats"):
+        stats = count_daily_stats(client_id)
+    with _lock:
+        counters["seeds"] += 1
+        _counters.setdefault(client_id, {"day": date.today(), **stats})
+        entry = _current(client_id)
+        return {"pending": entry["pending"], "posted": entry["posted"]}
+
+def is_tracked(client_id: str):
+    with _lock:
+        return client_id in _counters
+
+def seed(client_id: str, stats: dict):
+    """
+    Starts tracking a client from counts fetched elsewhere (e.g. together
+    with other data in one query). Counters already tracked are kept.
+    """
+    with _lock:
+        if client_id not in _counters:
+            counters["seeds"] += 1
+            _counters[client_id] = {"day": date.today(), "pending": stats["pending"], "posted": stats["posted"]}
+
+def record_review_created(client_id: str, count: int = 1):
+    """Call after inserting `count` pending reviews for a client."""
+    with _lock:
+        entry = _current(client_id)
+        if entry is not None:
+            entry["pending"] += count
+
+def record_status_change(client_id: str, old_status: str, new_status: str, count: int = 1):
+    """Call after moving `count` reviews of a client from one status to another."""
+    with _lock:
+        entry = _current(client_id)
+        if entry is None:
+            return
+        if old_status == "pending":
+            entry["pending"] = max(0, entry["pending"] - count)
+        if new_status == "pending":
+            entry["pending"] += count
+        if new_status == "posted":
+            entry["posted"] += count
+
+def reconcile(client_ids: list = None):
+    """
+    Recounts the given (default: all tracked) clients from the database and
+    replaces the in-memory counters. Returns the number of clients that drifted.
+    """
+    with _lock:
+        targets = list(client_ids if client_ids is not None else _counters.keys())
+
+    drifted = 0
+    for client_id in targets:
+        try:
+            stats = count_daily_stats(client_id)
+        except Exception as e:
+            print(f"Error reconciling daily stats for client {client_id}: {e}")
+            continue
+        with _lock:
+            entry = _current(client_id)
+            if entry is not None and (entry["pending"], entry["posted"]) != (stats["pending"], stats["posted"]):
+                drifted += 1
+            _counters[client_id] = {"day": date.today(), **stats}
+            counters["reconciled"] += 1
+    counters["drift_corrections"] += drifted
+    return drifted
+
+async def _reconcile_loop():
+    while True:
+        await asyncio.sleep(settings.stats_reconcile_interval)
+        try:
+            drifted = await asyncio.to_thread(reconcile)
+            if drifted:
+                print(f"INFO: Corrected daily stats drift for {drifted} clients")
+        except Exception as e:
+            print(f"Error in daily stats reconciliation: {e}")
+
+async def start():
+    global _reconcile_task
+    if settings.stats_reconcile_interval > 0:
+        _reconcile_task = asyncio.create_task(_reconcile_loop())
+
+async def stop():
+    global _reconcile_task
+    if _reconcile_task is not None:
+        _reconcile_task.cancel()
+        await asyncio.gather(_reconcile_task, return_exceptions=True)
+        _reconcile_task = None
+
+def stats():
+    with _lock:
+        return {**counters, "tracked_clients": len(_counters)}
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+from app.core import metrics
+from app.core.config import settings
+from app.db import repository
+from app.services.prompts import prompt_cache
+
+class TenantCache:
+    """
+    TTL + LRU cache of `clients` rows, indexed by google_location_id and
+    phone_number. Unknown locations are remembered for a shorter TTL so
+    notifications for unregistered shops do not hit the database each time.
+    """
+
+    def __init__(self, ttl: float, max_size: int, negative_ttl: float):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()      # client_id -> (expires_at, row)
+        self._by_location = {}          # google_location_id -> client_id
+        self._by_phone = {}             # phone_number -> client_id
+        self._missing_locations = OrderedDict()  # google_location_id -> expires_at
+        self.counters = {"hits": 0, "misses": 0, "negative_hits": 0, "evictions": 0, "invalidations": 0}
+
+    def _lookup(self, index: dict, key: str):
+        client_id = index.get(key)
+        if client_id is None:
+            return None
+        entry = self._rows.get(client_id)
+        if entry is None or entry[0] <= time.monotonic():
+            self._drop(client_id)
+            return None
+        self._rows.move_to_end(client_id)
+        return entry[1]
+
+    def _drop(self, client_id: str):
+        entry = self._rows.pop(client_id, None)
+        if entry is None:
+            return
+        row = entry[1]
+        if self._by_location.get(row.get("google_location_id")) == client_id:
+            del self._by_location[row["google_location_id"]]
+        if self._by_phone.get(row.get("phone_number")) == client_id:
+            del self._by_phone[row["phone_number"]]
+
+    def get(self, field: str, key: str):
+        """
+        Returns (found, row). `found` is True for negative hits with row None.
+        """
+        index = self._by_location if field == "google_location_id" else self._by_phone
+        with self._lock:
+            row = self._lookup(index, key)
+            if row is not None:
+                self.counters["hits"] += 1
+                return True, row
+            if field == "google_location_id":
+                expires_at = self._missing_locations.get(key)
+                if expires_at is not None:
+                    if expires_at > time.monotonic():
+                        self.counters["negative_hits"] += 1
+                        return True, None
+                    del self._missing_locations[key]
+            self.counters["misses"] += 1
+            return False, None
+
+    def put(self, row: dict):
+        with self._lock:
+            client_id = row["id"]
+            self._drop(client_id)
+            self._rows[client_id] = (time.monotonic() + self.ttl, row)
+            self._by_location[row["google_location_id"]] = client_id
+            self._by_phone[row["phone_number"]] = client_id
+            self._missing_locations.pop(row["google_location_id"], None)
+            while len(self._rows) > self.max_size:
+                oldest = next(iter(self._rows))
+                self._drop(oldest)
+                self.counters["evictions"] += 1
+
+    def put_missing(self, location_id: str):
+        with self._lock:
+            self._missing_locations[location_id] = time.monotonic() + self.negative_ttl
+            self._missing_locations.move_to_end(location_id)
+            while len(self._missing_locations) > self.max_size:
+                self._missing_locations.popitem(last=False)
+
+    def invalidate(self, client_id: str = None, google_location_id: str = None, phone_number: str = None):
+        """
+        Forgets a client by any of its keys (e.g. after its row was updated).
+        """
+        with self._lock:
+            if client_id is None and google_location_id is not None:
+                client_id = self._by_location.get(google_location_id)
+            if client_id is None and phone_number is not None:
+                client_id = self._by_phone.get(phone_number)
+            if client_id is not None:
+                self._drop(client_id)
+            if google_location_id is not None:
+                self._missing_locations.pop(google_location_id, None)
+            self.counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._by_location.clear()
+            self._by_phone.clear()
+            self._missing_locations.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["negative_hits"] + self.counters["misses"]
+            hit_ratio = (self.counters["hits"] + self.counters["negative_hits"]) / lookups if lookups else 0.0
+            return {
+                **self.counters,
+                "size": len(self._rows),
+                "negative_size": len(self._missing_locations),
+                "hit_ratio": round(hit_ratio, 4)
+            }
+
+tenant_cache = TenantCache(
+    ttl=settings.tenant_cache_ttl,
+    max_size=settings.tenant_cache_size,
+    negative_ttl=settings.tenant_cache_negative_ttl
+)
+
+def _get_client(field: str, key: str):
+    found, row = tenant_cache.get(field, key)
+    if found:
+        return row
+
+    row = repository.client_by(field, key)
+    if row is None:
+        if field == "google_location_id":
+            tenant_cache.put_missing(key)
+        return None
+
+    tenant_cache.put(row)
+    return row
+
+def get_client_by_location(location_id: str):
+    """Returns the clients row for a Google location, or None."""
+    with metrics.timer("client_lookup"):
+        return _get_client("google_location_id", location_id)
+
+def get_client_by_phone(phone_number: str):
+    """Returns the clients row for a WhatsApp number, or None."""
+    with metrics.timer("client_lookup"):
+        return _get_client("phone_number", phone_number)
+
+def handle_client_change(change: dict):
+    """
+    Applies a Supabase database webhook payload for the clients table.
+    Both the old and new keys are invalidated, since an update can move a
+    client to a different location or phone number.
+    """
+    for row in (change.get("old_record"), change.get("record")):
+        if row:
+            tenant_cache.invalidate(
+                client_id=row.get("id"),
+                google_location_id=row.get("google_location_id"),
+                phone_number=row.get("phone_number")
+            )
+            if row.get("phone_number"):
+                # The compiled prompt embeds the offer policy.
+                prompt_cache.invalidate(row["phone_number"])
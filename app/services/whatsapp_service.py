@@ -1,9 +1,12 @@
-from twilio.rest import Client
+from datetime import datetime
 from app.core.config import settings
+from app.services import outbound
 
-def send_whatsapp_message(to_number: str, body_text: str):
+def send_whatsapp_message(to_number: str, body_text: str, on_sent=None):
     """
-    Sends a WhatsApp message using the Twilio API.
+    Queues a WhatsApp message for the outbound dispatcher, which sends it
+    through Twilio with rate limiting and retries. `on_sent` is called once
+    Twilio accepted it.
     to_number should be in E.164 format, e.g., '+1234567890'
     Twilio handles the 'whatsapp:' prefix if needed.
     """
@@ -11,20 +14,37 @@ def send_whatsapp_message(to_number: str, body_text: str):
         print("Warning: Twilio credentials not fully configured.")
         return None
 
-    client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
-    
     # Ensure number format for WhatsApp
     to_whatsapp = f"whatsapp:{to_number}" if not to_number.startswith("whatsapp:") else to_number
     from_whatsapp = f"whatsapp:{settings.twilio_whatsapp_number}"
     
-    try:
-        message = client.messages.create(
-            body=body_text,
-            from_=from_whatsapp,
-            to=to_whatsapp
+    return outbound.enqueue(to_whatsapp, from_whatsapp, body_text, on_sent=on_sent)
+
+def build_dashboard_message(client_lang: str, stats: dict, star_rating: int, reviewer_name: str, review_text: str, draft_text: str):
+    """
+    Renders the WhatsApp dashboard for a single review in the client's language.
+    """
+    current_date = datetime.now().strftime("%d %b")
+
+    if client_lang == "ar-om":
+        return (
+            f"📊 *لوحة التحكم • {current_date}*\n"
+            f"🔴 قيد الانتظار: {stats['pending']} | ✅ تم النشر: {stats['posted']}\n"
+            f"    ⭐ *تقييم جديد ({star_rating} نجوم)*\n"
+            f"    👤 *{reviewer_name}*\n"
+            f"    \"{review_text}\"\n"
+            f"    🤖 *الرد المقترح:*\n"
+            f"    \"{draft_text}\"\n"
+            f"    👇 *الإجراء:*\n"
+            f"    1 : ✅ اعتماد ونشر\n"
+            f"    2 : 🎲 صياغة جديدة"
         )
-        print(f"WhatsApp message sent: {message.sid}")
-        return message.sid
-    except Exception as e:
-        print(f"Error sending WhatsApp message: {e}")
-        return None
+    return (
+        f"📊 Dashboard • {current_date}\n"
+        f"🔴 Pending: {stats['pending']} | ✅ Posted: {stats['posted']}\n\n"
+        f"⭐ New {star_rating} Review\n"
+        f"👤 {reviewer_name}\n"
+        f"\"{review_text}\"\n\n"
+        f"🤖 Proposed Reply: \"{draft_text}\"\n\n"
+        f"👇 Action: 1 : Approve 2 : 🎲 Regenerate"
+    )
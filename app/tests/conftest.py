@@ -0,0 +1,35 @@
+import os
+import pytest
+
+# The service modules build SDK clients on first use; give them dummy
+# credentials so tests never depend on a real .env file.
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("TEST_MODE", "True")
+
+@pytest.fixture
+def fake_postgrest(monkeypatch):
+    """
+    Starts a FakePostgrest and points the given modules at it: `repository`
+    gets a Supabase backend, any other module a `supabase` client. Returns
+    the fake; it is shut down after the test.
+    """
+    from supabase import create_client
+    from bench.fakes import FakePostgrest
+    from app.db import repository
+
+    servers = []
+
+    def make(*modules):
+        fake = FakePostgrest()
+        servers.append(fake)
+        client = create_client(fake.url, "test-key")
+        for module in modules:
+            if module is repository:
+                monkeypatch.setattr(repository, "backend", repository.SupabaseBackend(client))
+            else:
+                monkeypatch.setattr(module, "supabase", client)
+        return fake
+
+    yield make
+    for fake in servers:
+        fake.shutdown()
@@ -0,0 +1,47 @@
+from app import backfill
+
+def fake_pages(pages):
+    def iter_pages(location_id, page_size=50, page_token=None):
+        start = int(page_token or 0)
+        for index in range(start, len(pages)):
+            yield pages[index], str(index + 1) if index + 1 < len(pages) else None
+    return iter_pages
+
+def review(n, replied=False):
+    raw = {"name": f"accounts/1/locations/2/reviews/{n}", "comment": f"Review {n}", "starRating": "FIVE"}
+    if replied:
+        raw["reviewReply"] = {"comment": "Thanks"}
+    return raw
+
+def test_backfill_skips_replied_and_existing_and_resumes(monkeypatch, tmp_path):
+    inserted = []
+    pages = [[review(1), review(2, replied=True)], [review(3), review(4)], [review(5)]]
+
+    monkeypatch.setattr(backfill, "get_client_by_location", lambda location_id: {
+        "id": "c1", "language_preference": "en", "phone_number": "+968"
+    })
+    monkeypatch.setattr(backfill, "iter_review_pages", fake_pages(pages))
+    monkeypatch.setattr(backfill, "existing_review_ids", lambda ids: {i for i in ids if i.endswith("/4")})
+    monkeypatch.setattr(backfill, "draft_review_reply", lambda *args, **kwargs: {"reply_text": "Thanks!"})
+
+    def crash_on_last_page(rows, chunk_size):
+        if any(row["google_review_id"].endswith("/5") for row in rows):
+            raise RuntimeError("crash")
+        inserted.extend(row["google_review_id"] for row in rows)
+
+    monkeypatch.setattr(backfill, "insert_rows", crash_on_last_page)
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    try:
+        backfill.backfill_location("accounts/1/locations/2", checkpoint_path)
+    except RuntimeError:
+        pass
+
+    checkpoint = backfill.load_checkpoint(checkpoint_path, "accounts/1/locations/2")
+    assert checkpoint["pages"] == 2 and checkpoint["page_token"] == "2"
+
+    monkeypatch.setattr(backfill, "insert_rows", lambda rows, chunk_size: inserted.extend(row["google_review_id"] for row in rows))
+    checkpoint = backfill.backfill_location("accounts/1/locations/2", checkpoint_path)
+
+    assert checkpoint["done"]
+    assert [rid.rsplit("/", 1)[1] for rid in inserted] == ["1", "3", "5"]
+    assert checkpoint["skipped_replied"] == 1 and checkpoint["skipped_existing"] == 1
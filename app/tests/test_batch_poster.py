@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+from app.core.ratelimit import TokenBucket
+from app.db import repository
+from app.services import batch_poster
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, capacity=1)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.005
+
+def test_post_reviews_concurrently_with_bulk_update(monkeypatch):
+    active = []
+    peak = []
+    lock = threading.Lock()
+    updates = []
+    released = []
+    messages = []
+
+    def fake_post(review_id, reply_text):
+        with lock:
+            active.append(review_id)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.remove(review_id)
+        return not review_id.endswith("/reviews/3")
+
+    monkeypatch.setattr(batch_poster.settings, "batch_post_concurrency", 4)
+    monkeypatch.setattr(batch_poster.settings, "batch_post_rate_per_location", 1000.0)
+    monkeypatch.setattr(batch_poster.settings, "batch_post_progress_every", 5)
+    monkeypatch.setattr(batch_poster, "_executor", None)
+    monkeypatch.setattr(batch_poster, "_location_buckets", {})
+    monkeypatch.setattr(batch_poster, "post_reply_to_google", fake_post)
+    monkeypatch.setattr(batch_poster, "mark_posted", updates.append)
+    monkeypatch.setattr(batch_poster, "release_claims", released.append)
+    monkeypatch.setattr(batch_poster, "send_whatsapp_message", lambda to, body: messages.append(body))
+    monkeypatch.setattr(batch_poster, "record_status_change", lambda *args: None)
+
+    reviews = [
+        {"id": f"r{n}", "google_review_id": f"accounts/1/locations/1/reviews/{n}", "draft_reply": "Thanks!"}
+        for n in range(12)
+    ]
+    result = asyncio.run(batch_poster.post_reviews("+968", "c1", reviews))
+
+    assert max(peak) == 4
+    assert result["failed"] == ["r3"]
+    assert len(updates) == 1 and sorted(updates[0]) == sorted(r["id"] for r in reviews if r["id"] != "r3")
+    assert released == [["r3"]]
+    assert messages == ["Posting replies: 5/12...", "Posting replies: 10/12..."]
+    assert "1 of 12 failed" in batch_poster.format_batch_summary(result)
+
+def test_claims_for_posting_never_overlap(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(repository)
+    monkeypatch.setattr(repository, "write_behind", repository.WriteBehind(interval=0.005, max_batch=200))
+    fake.seed("pending_reviews", [
+        {"client_id": "c1", "google_review_id": f"r{n}", "status": "pending", "draft_reply": "Thanks!"}
+        for n in range(4)
+    ])
+    ids = [row["id"] for row in fake.rows("pending_reviews")]
+    # "1" and "ALL" handled at the same time by two workers
+    first = batch_poster.claim_for_posting("c1", ids[:1])
+    second = batch_poster.claim_for_posting("c1")
+    assert [row["id"] for row in first] == ids[:1]
+    assert sorted(row["id"] for row in second) == sorted(ids[1:])
+    assert batch_poster.claim_for_posting("c1") == []
+
+    batch_poster.release_claims(ids[1:2])
+    batch_poster.mark_posted(ids[:1])
+    assert [row["id"] for row in batch_poster.claim_for_posting("c1")] == ids[1:2]
+    assert fake.rows("pending_reviews")[0]["status"] == "posted"
+
+    # A worker that died mid-post leaves 'posting' rows; they are claimable once the lease expires.
+    for row in fake.rows("pending_reviews")[2:]:
+        row["lease_expires_at"] = "2000-01-01T00:00:00+00:00"
+    assert sorted(row["id"] for row in batch_poster.claim_for_posting("c1")) == sorted(ids[2:])
@@ -0,0 +1,44 @@
+import os
+import pytest
+from postgrest.exceptions import APIError
+from supabase import create_client
+from bench import coldstart, run
+from bench.fakes import FakePostgrest, LatencyModel
+
+@pytest.fixture
+def fake_db():
+    fake = FakePostgrest()
+    yield fake, create_client(fake.url, "bench-key")
+    fake.shutdown()
+
+def test_fake_postgrest_speaks_the_supabase_client_protocol(fake_db):
+    fake, db = fake_db
+    db.table("pending_reviews").insert({"google_review_id": "r1", "client_id": "c1", "status": "pending"}).execute()
+    db.table("pending_reviews").insert({"google_review_id": "r2", "client_id": "c1", "status": "pending"}).execute()
+
+    with pytest.raises(APIError) as error:
+        db.table("pending_reviews").insert({"google_review_id": "r1", "client_id": "c1"}).execute()
+    assert error.value.code == "23505"
+
+    ids = [row["id"] for row in fake.rows("pending_reviews")]
+    db.table("pending_reviews").update({"status": "posted"}).in_("id", ids[:1]).execute()
+    res = db.table("pending_reviews").select("id", count="exact").eq("client_id", "c1").eq("status", "pending").execute()
+    assert res.count == 1
+    assert fake.snapshot() == {"POST pending_reviews": 3, "PATCH pending_reviews": 1, "GET pending_reviews": 1}
+
+def test_latency_model_matches_its_median():
+    model = LatencyModel.parse("0.1,0.5")
+    samples = sorted(model.sample() for _ in range(2000))
+    assert 0.08 < samples[1000] < 0.12
+
+def test_compare_flags_regressions():
+    baseline = {"ingest": {"rps": 100.0, "db_round_trips_per_request": 4.0}}
+    report = {"ingest": {"rps": 90.0, "db_round_trips_per_request": 4.5}}
+    _, regressions = run.compare(report, baseline, threshold=0.2)
+    assert regressions == ["ingest.db_round_trips_per_request"]
+
+def test_app_import_defers_the_sdks():
+    rows = coldstart.profile_imports("app.main", {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    assert rows[-1][0] == "app.main"
+    assert coldstart.deferred_imports(rows) == []
+    assert coldstart.deferred_imports([("openai._client", 1.0, 1.0, 2), ("google.auth.jwt", 1.0, 1.0, 3)]) == ["openai", "google.auth"]
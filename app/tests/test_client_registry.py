@@ -0,0 +1,26 @@
+from app.db.supabase import LazyClient
+from app.services import client_registry
+
+def test_twilio_client_is_built_once(monkeypatch):
+    monkeypatch.setattr(client_registry, "_twilio_client", None)
+    monkeypatch.setattr(client_registry, "_twilio_http", None)
+    monkeypatch.setattr(client_registry.settings, "twilio_account_sid", "AC123")
+    monkeypatch.setattr(client_registry.settings, "twilio_auth_token", "token")
+
+    first = client_registry.get_twilio_client()
+    assert first is client_registry.get_twilio_client()
+
+    adapter = client_registry._twilio_http.session.adapters["https://"]
+    assert adapter._pool_maxsize == client_registry.settings.http_pool_size
+    assert client_registry.pool_stats()["twilio"] == []
+
+def test_pool_stats_never_build_the_supabase_client(monkeypatch):
+    lazy = LazyClient("http://127.0.0.1:1", "test-key")
+    monkeypatch.setattr(client_registry, "supabase", lazy)
+    assert client_registry.pool_stats()["supabase"] == {"built": False}
+    assert not lazy.built
+
+def test_twilio_client_requires_credentials(monkeypatch):
+    monkeypatch.setattr(client_registry, "_twilio_client", None)
+    monkeypatch.setattr(client_registry.settings, "twilio_account_sid", "")
+    assert client_registry.get_twilio_client() is None
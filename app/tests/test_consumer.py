@@ -0,0 +1,80 @@
+import json
+from app import consumer
+from app.services import idempotency, pipeline
+from app.services.idempotency import SeenSet
+
+class FakeMessage:
+    def __init__(self, message_id, payload):
+        self.message_id = message_id
+        self.data = json.dumps(payload).encode("utf-8") if isinstance(payload, dict) else payload
+        self.outcome = None
+
+    def ack(self):
+        self.outcome = "ack"
+
+    def nack(self):
+        self.outcome = "nack"
+
+def setup(monkeypatch, store_fails=False, reset_seen=True):
+    stages = []
+
+    def process_job(job, until=None):
+        for stage in ("draft", "store", "notify"):
+            if pipeline.STAGES.index(stage) < pipeline.STAGES.index(job["stage"]):
+                continue
+            if stage == "store" and store_fails:
+                raise RuntimeError("insert failed")
+            stages.append(stage)
+            job["stage"] = stage
+            if stage == until:
+                job["stage"] = "notify"
+                return job
+        job["stage"] = "done"
+        return job
+
+    if reset_seen:
+        monkeypatch.setattr(idempotency, "_seen", SeenSet(max_size=10))
+    monkeypatch.setattr(pipeline, "persist_job", lambda review, message_id=None: {"id": "j1", "stage": "draft", "attempts": 0})
+    monkeypatch.setattr(pipeline, "process_job", process_job)
+    return stages
+
+def test_ack_after_store_then_notify(monkeypatch):
+    stages = setup(monkeypatch)
+    message = FakeMessage("m1", {"name": "accounts/1/locations/2/reviews/3"})
+    assert consumer.handle_message(message) == "ack"
+    assert message.outcome == "ack"
+    assert stages == ["draft", "store", "notify"]
+
+def test_nack_when_store_fails_and_redelivery_is_accepted(monkeypatch):
+    setup(monkeypatch, store_fails=True)
+    message = FakeMessage("m2", {"name": "accounts/1/locations/2/reviews/4"})
+    assert consumer.handle_message(message) == "nack"
+
+    # The in-process claim was released, so the redelivery is not dropped.
+    setup_stages = setup(monkeypatch, reset_seen=False)
+    assert consumer.handle_message(FakeMessage("m2", {"name": "accounts/1/locations/2/reviews/4"})) == "ack"
+    assert "store" in setup_stages
+
+def test_malformed_and_duplicate_messages_are_acked(monkeypatch):
+    stages = setup(monkeypatch)
+    assert consumer.handle_message(FakeMessage("m3", b"not json")) == "ack"
+    consumer.handle_message(FakeMessage("m4", {"name": "accounts/1/locations/2/reviews/5"}))
+    duplicate = FakeMessage("m4", {"name": "accounts/1/locations/2/reviews/5"})
+    assert consumer.handle_message(duplicate) == "ack"
+    assert stages.count("draft") == 1
+
+def test_refuses_to_send_dashboards_with_process_local_sessions(monkeypatch):
+    monkeypatch.setattr(consumer.settings, "pipeline_mode", "local")
+    monkeypatch.setattr(consumer.sessions, "store", consumer.sessions.MemorySessionStore(ttl=60, max_size=10))
+    monkeypatch.setattr(consumer, "run", lambda subscription: 0)
+    assert consumer.main(["--subscription", "projects/p/subscriptions/s"]) == 1
+    monkeypatch.setattr(consumer.settings, "pipeline_mode", "leased")
+    assert consumer.main(["--subscription", "projects/p/subscriptions/s"]) == 0
+
+def test_reconciles_dashboard_counters_until_stopped(monkeypatch):
+    calls = []
+    stopped = consumer.threading.Event()
+    monkeypatch.setattr(consumer.settings, "stats_reconcile_interval", 0.001)
+    monkeypatch.setattr(consumer.stats_service, "reconcile", lambda: calls.append(1) or (stopped.set() if len(calls) == 3 else 0))
+    consumer._reconcile_stats(stopped)
+    assert len(calls) == 3
@@ -0,0 +1,160 @@
+from app.core import metrics
+from app.services import model_router, openai_service, prompts, tenant_cache as tenant_cache_module
+
+def test_template_reply_for_empty_and_generic_praise():
+    assert openai_service.template_reply("No text provided", 5, "en") in openai_service.DEFAULT_TEMPLATES["en"][5]
+    assert openai_service.template_reply("ممتاز جداً!", 5, "ar-om") in openai_service.DEFAULT_TEMPLATES["ar-om"][5]
+    assert openai_service.template_reply("Great!!", 4, "en") in openai_service.DEFAULT_TEMPLATES["en"][4]
+
+def test_no_template_for_specific_or_negative_reviews():
+    assert openai_service.template_reply("Great tea!", 5, "en") is None
+    assert openai_service.template_reply("", 2, "en") is None
+
+def test_client_templates_override_defaults():
+    templates = {"en": {"5": ["Thanks from Salim!"]}}
+    assert openai_service.template_reply("", 5, "en", templates) == "Thanks from Salim!"
+
+def test_detect_reply_language():
+    assert openai_service.detect_reply_language("الشاي حلو", "en") == "ar-om"
+    assert openai_service.detect_reply_language("Nice tea", "ar-om") == "en"
+    assert openai_service.detect_reply_language("No text provided", "ar-om") == "ar-om"
+
+def test_draft_uses_cache_before_model(monkeypatch):
+    calls = []
+
+    def fake_generate(*args, **kwargs):
+        calls.append(args)
+        return {"reply_text": "Glad you liked the tea!", "risk_level": "low", "is_fake_suspicion": False}
+
+    monkeypatch.setattr(openai_service, "generate_review_reply", fake_generate)
+    monkeypatch.setattr(openai_service, "_reply_cache", openai_service.OrderedDict())
+
+    first = openai_service.draft_review_reply("Great tea!", 5, "en", "NO OFFERS", "+968")
+    second = openai_service.draft_review_reply("great  TEA", 5, "en", "NO OFFERS", "+968")
+    assert first["source"] == "model" and second["source"] == "cache"
+    assert second["reply_text"] == first["reply_text"]
+    assert len(calls) == 1
+
+    # Different offer policy -> different key.
+    openai_service.draft_review_reply("Great tea!", 5, "en", "10% OFF", "+968")
+    assert len(calls) == 2
+
+def test_replies_with_phone_are_not_cached(monkeypatch):
+    monkeypatch.setattr(openai_service, "_reply_cache", openai_service.OrderedDict())
+    for reply, alternates in [
+        ("Please contact us directly at +968 9000 0001 so we can look into this.", []),
+        ("يرجى التواصل معنا على ٩٠٠٠٠٠٠١", []),
+        ("Sorry to hear that, we will look into it.", ["Please call us on 96890000001."])
+    ]:
+        monkeypatch.setattr(openai_service, "generate_review_reply", lambda *args, **kwargs: {
+            "reply_text": reply, "alternates": alternates
+        })
+        openai_service.draft_review_reply("Cold food", 2, "en", "NO OFFERS", "+96890000001")
+    assert len(openai_service._reply_cache) == 0
+
+class FakeCompletions:
+    def __init__(self, replies):
+        self.replies = replies
+        self.kwargs = None
+
+    def create(self, **kwargs):
+        from types import SimpleNamespace
+        self.kwargs = kwargs
+        return SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content=openai_service.json.dumps(
+                {"reply_text": reply, "risk_level": "low", "is_fake_suspicion": False}
+            )))
+            for reply in self.replies
+        ])
+
+def test_generate_returns_spare_candidates(monkeypatch):
+    from types import SimpleNamespace
+    completions = FakeCompletions(["First", "Second", "First", "Third"])
+    monkeypatch.setattr(openai_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+    result = openai_service.generate_review_reply("Nice tea", 5, "en", "NO OFFERS", "+968", n=4)
+    assert completions.kwargs["n"] == 4
+    assert result["reply_text"] == "First"
+    assert result["alternates"] == ["Second", "Third"]
+
+def test_template_draft_includes_alternates():
+    result = openai_service.draft_review_reply("", 5, "en", "NO OFFERS", "+968")
+    assert result["source"] == "template"
+    assert len(result["alternates"]) == len(openai_service.DEFAULT_TEMPLATES["en"][5]) - 1
+    assert result["reply_text"] not in result["alternates"]
+
+def test_routes_only_simple_positive_reviews_to_the_fast_model():
+    def route(text, stars):
+        return model_router.choose_route(openai_service.normalize_review_text(text), stars)
+
+    assert route("Lovely karak and friendly staff", 5) == ("fast", "simple_positive")
+    assert route("الكرك لذيذ والموظفين محترمين", 5) == ("fast", "simple_positive")
+    assert route("Lovely karak and friendly staff", 3) == ("strong", "low_rating")
+    assert route("Nice place but the food was cold", 5) == ("strong", "complaint")
+    assert route("الأكل بارد للأسف", 4) == ("strong", "complaint")
+    assert route("Karak " * 50, 5) == ("strong", "long_review")
+    assert route("Karak حلو", 5) == ("strong", "mixed_script")
+
+class RoutedCompletions:
+    """Answers per model: an exception to raise or the draft to return."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def create(self, **kwargs):
+        from types import SimpleNamespace
+        self.calls.append((kwargs["model"], kwargs["timeout"]))
+        answer = self.answers[kwargs["model"]]
+        if isinstance(answer, Exception):
+            raise answer
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=openai_service.json.dumps(answer)))],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=100)
+        )
+
+def test_fast_route_falls_back_to_the_strong_model(monkeypatch):
+    from types import SimpleNamespace
+    strong = {"reply_text": "Thank you for the kind words about our karak!", "risk_level": "low"}
+    completions = RoutedCompletions({"gpt-4o-mini": ValueError("timed out"), "gpt-4o": strong})
+    monkeypatch.setattr(openai_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    cost_before = metrics.DRAFT_COST.value(route="strong")
+
+    result = openai_service.generate_review_reply("Lovely karak", 5, "en", "NO OFFERS", "+968")
+    assert result["reply_text"] == strong["reply_text"] and result["route"] == "strong"
+    assert completions.calls == [
+        ("gpt-4o-mini", openai_service.settings.openai_fast_timeout),
+        ("gpt-4o", openai_service.settings.openai_timeout)
+    ]
+    # 1000 prompt + 100 completion tokens at gpt-4o prices
+    assert round(metrics.DRAFT_COST.value(route="strong") - cost_before, 6) == 0.0035
+
+    # A fast draft the model itself flags as risky is redone on the strong model.
+    completions.answers["gpt-4o-mini"] = {"reply_text": "Thanks!", "risk_level": "high"}
+    completions.calls.clear()
+    assert openai_service.generate_review_reply("Lovely karak", 5, "en", "NO OFFERS", "+968")["route"] == "strong"
+    assert [model for model, _ in completions.calls] == ["gpt-4o-mini", "gpt-4o"]
+
+    # Complaints never touch the fast model.
+    completions.calls.clear()
+    openai_service.generate_review_reply("Waited an hour", 1, "en", "NO OFFERS", "+968")
+    assert [model for model, _ in completions.calls] == ["gpt-4o"]
+
+def test_prompts_share_a_static_prefix_and_compile_once_per_client(monkeypatch):
+    cache = prompts.PromptCache(max_size=10)
+    monkeypatch.setattr(prompts, "prompt_cache", cache)
+
+    first = prompts.build_messages("+968001", "NO OFFERS", "Great tea", 5)
+    second = prompts.build_messages("+968001", "NO OFFERS", "Cold food", 2, is_retry=True)
+    other = prompts.build_messages("+968002", "10% OFF", "Great tea", 5)
+    assert first[0] is second[0] and first[0]["content"] == other[0]["content"] == prompts.STATIC_RULES
+    assert "+968" not in prompts.STATIC_RULES and "{" not in prompts.STATIC_RULES.split("Output Format")[0]
+    assert first[1] is second[1] and "NO OFFERS" in first[1]["content"]
+    assert prompts.RETRY_INSTRUCTION in second[-1]["content"] and second[-1]["role"] == "user"
+    assert cache.stats() == {"hits": 1, "compiles": 2, "invalidations": 0, "size": 2}
+
+    # A new offer policy recompiles the entry; the clients webhook drops it.
+    assert "NEVER" in prompts.build_messages("+968001", "NEVER", "Great tea", 5)[1]["content"]
+    monkeypatch.setattr(tenant_cache_module, "prompt_cache", cache)
+    tenant_cache_module.handle_client_change({"record": {"id": "c2", "phone_number": "+968002"}})
+    assert cache.stats() == {"hits": 1, "compiles": 3, "invalidations": 2, "size": 1}
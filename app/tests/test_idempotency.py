@@ -0,0 +1,39 @@
+import base64
+import json
+from fastapi.testclient import TestClient
+from app.services import idempotency, pipeline
+from app.services.idempotency import SeenSet
+
+def test_seen_set_rejects_any_known_key():
+    seen = SeenSet(max_size=10)
+    assert seen.add_all(["msg:1", "review:a"])
+    assert not seen.add_all(["msg:2", "review:a"])
+    assert not seen.add_all(["msg:1"])
+    assert seen.add_all(["msg:2", "review:b"])
+
+def test_seen_set_is_bounded():
+    seen = SeenSet(max_size=2)
+    for n in range(3):
+        seen.add_all([f"msg:{n}"])
+    assert len(seen) == 2
+    assert seen.add_all(["msg:0"])
+
+def test_webhook_drops_redelivered_message(monkeypatch):
+    from app.main import app
+
+    submitted = []
+
+    async def fake_submit(review, message_id=None):
+        submitted.append(message_id)
+        return {"id": "job-1"}
+
+    monkeypatch.setattr(idempotency, "_seen", SeenSet(max_size=10))
+    monkeypatch.setattr(pipeline, "submit", fake_submit)
+    data = base64.b64encode(json.dumps({"name": "accounts/1/locations/2/reviews/3"}).encode()).decode()
+    body = {"message": {"data": data, "messageId": "m-1"}}
+
+    with TestClient(app) as client:
+        assert client.post("/webhook/google-pubsub", json=body).json()["status"] == "accepted"
+        assert client.post("/webhook/google-pubsub", json=body).json()["status"] == "duplicate"
+
+    assert submitted == ["m-1"]
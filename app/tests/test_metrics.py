@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from app.core import metrics
+from app.core.metrics import Counter, Histogram
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "Test.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage="x")
+
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{stage="x",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="x",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{stage="x",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{stage="x"} 4' in lines
+    assert histogram.count(stage="x") == 4
+
+def test_counter_and_timer():
+    counter = Counter("test_total", "Test.")
+    counter.inc(outcome="ok")
+    counter.inc(2, outcome="ok")
+    assert counter.value(outcome="ok") == 3
+
+    before = metrics.STAGE_LATENCY.count(stage="unit_test")
+    with metrics.timer("unit_test"):
+        pass
+    assert metrics.STAGE_LATENCY.count(stage="unit_test") == before + 1
+
+def test_reply_latency_ignores_missing_received_at():
+    before = metrics.REPLY_LATENCY.count()
+    metrics.observe_reply_latency(None)
+    metrics.observe_reply_latency("not a timestamp")
+    received = datetime.now(timezone.utc) - timedelta(minutes=10)
+    metrics.observe_reply_latency(received.isoformat())
+    assert metrics.REPLY_LATENCY.count() == before + 1
+
+def test_render_flattens_numeric_gauges():
+    text = metrics.render_prometheus({"pipeline": {"queued": 3, "running": True, "state": "ok"}})
+    assert "review_app_pipeline_queued 3" in text
+    assert "review_app_pipeline_running 1" in text
+    assert "state" not in text.split("review_app_pipeline")[-1]
+
+def test_metrics_endpoint():
+    from app.main import app
+
+    with TestClient(app) as client:
+        client.post("/webhook/google-pubsub", json={"message": {"data": "not-base64!"}})
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'review_outcomes_total{outcome="invalid_data"}' in response.text
+    assert 'review_stage_latency_seconds_count{stage="decode"}' in response.text
@@ -0,0 +1,101 @@
+import time
+from app.services import notifier, outbound, pipeline, sessions, whatsapp_service
+
+CLIENT = {"id": "c1", "phone_number": "+968", "language_preference": "en"}
+
+def item(n):
+    return {
+        "pending_review_id": f"r{n}",
+        "star_rating": 5,
+        "reviewer_name": f"Guest {n}",
+        "review_text": f"Review {n}",
+        "draft_text": f"Thanks {n}"
+    }
+
+def setup(monkeypatch, window, max_items):
+    sent = []
+    monkeypatch.setattr(notifier.settings, "digest_window_seconds", window)
+    monkeypatch.setattr(notifier.settings, "digest_max_items", max_items)
+    monkeypatch.setattr(notifier, "_buffers", {})
+    monkeypatch.setattr(sessions, "store", sessions.MemorySessionStore(ttl=60, max_size=10))
+    monkeypatch.setattr(notifier, "get_daily_stats", lambda client_id: {"pending": 3, "posted": 1})
+    monkeypatch.setattr(notifier, "send_whatsapp_message", lambda to, body, on_sent=None: sent.append(body) or on_sent and on_sent())
+    return sent
+
+def test_burst_is_coalesced_into_one_digest(monkeypatch):
+    sent = setup(monkeypatch, window=0.05, max_items=10)
+    for n in range(1, 4):
+        notifier.notify_review(CLIENT, item(n))
+    assert sent == []
+    time.sleep(0.2)
+
+    assert len(sent) == 1
+    assert "1) ⭐ 5 • 👤 Guest 1" in sent[0] and "3) ⭐ 5 • 👤 Guest 3" in sent[0]
+    assert sessions.get_review_ids("+968") == ["r1", "r2", "r3"]
+
+def test_full_buffer_flushes_immediately(monkeypatch):
+    sent = setup(monkeypatch, window=60, max_items=2)
+    notifier.notify_review(CLIENT, item(1))
+    notifier.notify_review(CLIENT, item(2))
+    notifier.notify_review(CLIENT, item(3))
+    assert len(sent) == 1
+    notifier.flush_all()
+    assert len(sent) == 2
+    # A lone review keeps the single-review dashboard.
+    assert "Proposed Reply" in sent[1]
+    assert sessions.get_review_ids("+968") == ["r3"]
+
+def test_jobs_complete_only_once_their_digest_is_delivered(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(pipeline)
+    setup(monkeypatch, window=60, max_items=10)
+    sent = []
+    twilio_errors = [outbound.PermanentSendError("Twilio error 400: rejected")]
+
+    def deliver(message):
+        sent.append(message["body"])
+        if twilio_errors:
+            raise twilio_errors.pop()
+        return "SM1"
+
+    # The real send path: the dispatcher runs inline when it is not started.
+    monkeypatch.setattr(notifier, "send_whatsapp_message", whatsapp_service.send_whatsapp_message)
+    monkeypatch.setattr(whatsapp_service.settings, "twilio_account_sid", "AC123")
+    monkeypatch.setattr(whatsapp_service.settings, "twilio_auth_token", "token")
+    monkeypatch.setattr(whatsapp_service.settings, "twilio_whatsapp_number", "+96800")
+    monkeypatch.setattr(outbound, "deliver", deliver)
+    monkeypatch.setattr(outbound, "supabase", None)
+    fake.seed("review_jobs", [{"payload": {}, "stage": "notify", "status": "queued", "attempts": 0}])
+    row = fake.rows("review_jobs")[0]
+    job = {"id": row["id"], "stage": "notify", "pending_review_id": "r1", "client": CLIENT,
+           "payload": {"star_rating": 5, "reviewer_name": "Guest", "review_text": "Nice"},
+           "draft": {"reply_text": "Thanks"}}
+    pipeline.process_job(job)
+    # Buffered: a crash now must leave the job to be notified again.
+    assert sent == [] and row["status"] == "queued" and row["stage"] == "notify"
+    notifier.flush_all()
+    # Dead-lettered: still waiting to be notified again.
+    assert len(sent) == 1 and row["status"] == "queued" and job["stage"] == "notify"
+    pipeline.process_job(job)
+    notifier.flush_all()
+    assert len(sent) == 2 and row["status"] == "done" and job["stage"] == "done"
+
+def test_held_reviews_are_mentioned_in_the_next_message(monkeypatch):
+    sent = setup(monkeypatch, window=60, max_items=10)
+    completed = []
+    notifier.notify_held(CLIENT, on_sent=lambda: completed.append("held"))
+    notifier.notify_review(CLIENT, item(1))
+    notifier.flush_all()
+    assert len(sent) == 1 and "1 new review(s) held as suspected spam. Reply RELEASE" in sent[0]
+    assert completed == ["held"] and sessions.get_review_ids("+968") == ["r1"]
+
+    # Held reviews alone still reach the owner.
+    notifier.notify_held(CLIENT)
+    notifier.notify_held(CLIENT)
+    notifier.flush_all()
+    assert sent[1].startswith("⚠️ 2 new review(s) held")
+
+def test_parse_item_numbers():
+    assert notifier.parse_item_numbers("1 3") == [1, 3]
+    assert notifier.parse_item_numbers("2,4") == [2, 4]
+    assert notifier.parse_item_numbers("ALL") is None
+    assert notifier.parse_item_numbers("1 a") is None
@@ -0,0 +1,87 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import pytest
+from app.services import client_registry, outbound
+
+class FakeTwilio:
+    """Minimal stand-in for the Twilio Messages API."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                fake.requests.append(parse_qs(self.rfile.read(length).decode()))
+                status = fake.statuses.pop(0) if fake.statuses else 201
+                if status == 201:
+                    body = {"sid": f"SM{len(fake.requests)}", "status": "queued"}
+                else:
+                    body = {"code": 20000 + status, "message": "error", "status": status}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+@pytest.fixture
+def fake_twilio(monkeypatch):
+    servers = []
+
+    def make(statuses):
+        server = FakeTwilio(statuses)
+        servers.append(server)
+        monkeypatch.setattr(outbound.settings, "twilio_account_sid", "AC123")
+        monkeypatch.setattr(outbound.settings, "twilio_auth_token", "token")
+        monkeypatch.setattr(outbound.settings, "twilio_api_base_url", server.url)
+        monkeypatch.setattr(outbound.settings, "outbound_retry_base_delay", 0.01)
+        monkeypatch.setattr(client_registry, "_twilio_client", None)
+        monkeypatch.setattr(outbound, "supabase", None)
+        monkeypatch.setattr(outbound, "counters", {"queued": 0, "sent": 0, "retries": 0, "dead_lettered": 0})
+        return server
+
+    yield make
+    outbound.stop(timeout=1)
+    for server in servers:
+        server.server.shutdown()
+    monkeypatch.setattr(client_registry, "_twilio_client", None)
+
+def test_throttled_message_is_retried(fake_twilio):
+    server = fake_twilio([429, 503])
+    delivered = []
+    outbound.start(workers=2)
+    outbound.enqueue("whatsapp:+96811", "whatsapp:+96800", "Hello", on_sent=lambda: delivered.append(1))
+    outbound.stop(timeout=5)
+
+    assert outbound.counters["sent"] == 1 and delivered == [1]
+    assert outbound.counters["retries"] == 2
+    assert len(server.requests) == 3
+    assert server.requests[-1]["Body"] == ["Hello"]
+
+def test_rejected_message_is_dead_lettered(fake_twilio):
+    server = fake_twilio([400])
+    delivered = []
+    assert outbound.enqueue("whatsapp:+96811", "whatsapp:+96800", "Hi", on_sent=lambda: delivered.append(1)) is None
+    assert outbound.counters["dead_lettered"] == 1 and delivered == []
+    assert len(server.requests) == 1
+    assert outbound.dead_letters()[-1]["body"] == "Hi"
+
+def test_messages_to_one_recipient_keep_their_order(fake_twilio):
+    server = fake_twilio([])
+    outbound.start(workers=4)
+    for n in range(5):
+        outbound.enqueue("whatsapp:+96811", "whatsapp:+96800", f"msg {n}")
+    outbound.stop(timeout=5)
+    assert [request["Body"][0] for request in server.requests] == [f"msg {n}" for n in range(5)]
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import pytest
+from app.core.resilience import CircuitOpenError
+from app.services import pipeline
+
+def test_parse_notification_extracts_location_from_review_name():
+    review = pipeline.parse_notification({
+        "name": "accounts/1/locations/2/reviews/3",
+        "comment": "Great tea!",
+        "starRating": "FOUR",
+        "reviewer": {"displayName": "Ahmed"}
+    })
+    assert review["location_id"] == "accounts/1/locations/2"
+    assert review["review_id"] == "accounts/1/locations/2/reviews/3"
+    assert review["star_rating"] == 4
+    assert review["reviewer_name"] == "Ahmed"
+
+def test_parse_notification_without_location():
+    assert pipeline.parse_notification({"comment": "Hello"}) is None
+
+def test_process_job_runs_stages_in_order(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pipeline, "supabase", None)
+    monkeypatch.setattr(pipeline, "STAGE_RUNNERS", {
+        stage: (lambda job, stage=stage: calls.append(stage) or {})
+        for stage in pipeline.STAGES
+    })
+    job = {"id": "job-1", "payload": {}, "stage": "store", "attempts": 0}
+    pipeline.process_job(job)
+    assert calls == ["store", "notify"]
+    assert job["stage"] == "done"
+
+def test_worker_retries_failed_stage(monkeypatch):
+    attempts = []
+
+    threads = set()
+
+    def flaky_draft(job):
+        attempts.append(job["attempts"])
+        threads.add(threading.current_thread().name)
+        if len(attempts) < 3:
+            raise pipeline.StageError("AI generation failed")
+        return {}
+
+    monkeypatch.setattr(pipeline, "supabase", None)
+    monkeypatch.setattr(pipeline.settings, "pipeline_retry_base_delay", 0.01)
+    monkeypatch.setattr(pipeline, "STAGE_RUNNERS", {
+        "draft": flaky_draft,
+        "store": lambda job: {},
+        "notify": lambda job: {}
+    })
+
+    async def scenario():
+        await pipeline.start(workers=2)
+        job = await pipeline.submit({"location_id": "loc"})
+        for _ in range(100):
+            if job["stage"] == "done":
+                break
+            await asyncio.sleep(0.01)
+        await pipeline.stop(timeout=1)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job["stage"] == "done"
+    assert attempts == [0, 1, 2]
+    # Drafting never occupies the default executor the webhook acks on.
+    assert all(name.startswith("pipeline") for name in threads)
+
+def test_open_circuit_defers_without_spending_attempts(monkeypatch):
+    calls = []
+
+    def draft_while_openai_is_down(job):
+        calls.append(job["attempts"])
+        if len(calls) <= 3:
+            raise CircuitOpenError("openai", 0.01)
+        return {}
+
+    monkeypatch.setattr(pipeline, "supabase", None)
+    monkeypatch.setattr(pipeline.settings, "pipeline_max_attempts", 1)
+    monkeypatch.setattr(pipeline.settings, "pipeline_retry_base_delay", 0.01)
+    monkeypatch.setattr(pipeline, "STAGE_RUNNERS", {
+        "draft": draft_while_openai_is_down,
+        "store": lambda job: {},
+        "notify": lambda job: {}
+    })
+
+    async def scenario():
+        await pipeline.start(workers=1)
+        job = await pipeline.submit({"location_id": "loc"})
+        for _ in range(100):
+            if job["stage"] == "done":
+                break
+            await asyncio.sleep(0.01)
+        await pipeline.stop(timeout=1)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job["stage"] == "done"
+    assert calls == [0, 0, 0, 0]
+
+def test_leased_workers_claim_each_stage_once(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(pipeline)
+    calls = []
+    monkeypatch.setattr(pipeline.settings, "pipeline_mode", "leased")
+    monkeypatch.setattr(pipeline.settings, "pipeline_poll_interval", 0.05)
+    monkeypatch.setattr(pipeline, "STAGE_RUNNERS", {
+        stage: (lambda job, stage=stage: calls.append((job["payload"]["n"], stage)) or {})
+        for stage in pipeline.STAGES
+    })
+    # Left behind by a crashed process: its lease has expired.
+    fake.seed("review_jobs", [{"payload": {"n": 0}, "stage": "store", "status": "queued", "attempts": 0,
+                               "lease_owner": "dead:1", "lease_expires_at": "2000-01-01T00:00:00+00:00"}])
+
+    async def scenario():
+        await pipeline.start(workers=3)
+        for n in range(1, 6):
+            await pipeline.submit({"n": n}, message_id=f"m{n}")
+        for _ in range(200):
+            if all(row["status"] == "done" for row in fake.rows("review_jobs")):
+                break
+            await asyncio.sleep(0.01)
+        await pipeline.stop(timeout=1)
+
+    asyncio.run(scenario())
+    assert all(row["status"] == "done" and row["lease_owner"] is None for row in fake.rows("review_jobs"))
+    assert sorted(calls) == sorted(
+        [(0, "store"), (0, "notify")] + [(n, stage) for n in range(1, 6) for stage in pipeline.STAGES]
+    )
+
+def test_start_up_recovers_only_abandoned_jobs(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(pipeline)
+    monkeypatch.setattr(pipeline.settings, "pipeline_recovery_age", 600)
+    fake.seed("review_jobs", [
+        {"payload": {"n": "abandoned"}, "stage": "draft", "status": "queued", "attempts": 0,
+         "updated_at": "2000-01-01T00:00:00+00:00"},
+        # Being processed by another live process right now.
+        {"payload": {"n": "live"}, "stage": "draft", "status": "queued", "attempts": 0},
+        {"payload": {"n": "finished"}, "stage": "done", "status": "done", "attempts": 0,
+         "updated_at": "2000-01-01T00:00:00+00:00"}
+    ])
+    assert [job["payload"]["n"] for job in pipeline._load_unfinished_jobs()] == ["abandoned"]
+    # A second process starting at the same time finds nothing left to take.
+    assert pipeline._load_unfinished_jobs() == []
+
+def test_leased_mode_sheds_load_per_location(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(pipeline)
+    monkeypatch.setattr(pipeline.settings, "pipeline_mode", "leased")
+    monkeypatch.setattr(pipeline.settings, "pipeline_tenant_max_queue", 2)
+    monkeypatch.setattr(pipeline.settings, "pipeline_poll_interval", 60)
+    monkeypatch.setattr(pipeline, "STAGE_RUNNERS", {stage: (lambda job: {}) for stage in pipeline.STAGES})
+    fake.seed("review_jobs", [
+        {"google_review_id": f"loc-1/reviews/{n}", "payload": {}, "stage": "draft", "status": "queued", "attempts": 0,
+         "lease_owner": "other:1", "lease_expires_at": "2999-01-01T00:00:00+00:00"}
+        for n in range(2)
+    ])
+
+    async def scenario():
+        await pipeline.start(workers=1)
+        try:
+            with pytest.raises(pipeline.Overloaded):
+                await pipeline.submit({"location_id": "loc-1", "review_id": "loc-1/reviews/2"})
+            await pipeline.submit({"location_id": "loc-2", "review_id": "loc-2/reviews/1"})
+            return pipeline.stats()["rejected"]
+        finally:
+            await pipeline.stop(timeout=1)
+
+    assert asyncio.run(scenario()) == 1
+    assert len(fake.rows("review_jobs")) == 3
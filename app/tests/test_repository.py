@@ -0,0 +1,159 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.db import repository
+from app.services import idempotency
+
+def test_memory_backend_claims_updates_and_rejects_duplicates(monkeypatch):
+    memory = repository.MemoryBackend()
+    monkeypatch.setattr(repository, "backend", memory)
+    monkeypatch.setattr(repository, "write_behind", repository.WriteBehind(interval=0.005, max_batch=200))
+    memory.seed("clients", [{"phone_number": "+96890000001", "google_location_id": "loc-1"}])
+    client_id = memory.tables["clients"][0]["id"]
+    first = repository.insert_review({"client_id": client_id, "google_review_id": "r1", "review_text": "Nice"})
+
+    with pytest.raises(repository.DuplicateKey) as duplicate:
+        repository.insert_review({"client_id": client_id, "google_review_id": "r1"})
+    assert idempotency.is_unique_violation(duplicate.value)
+    assert repository.find_review_id("r1") == first["id"]
+
+    claimed = repository.claim_for_posting(client_id, None, "worker-1", 60)
+    assert [row["id"] for row in claimed] == [first["id"]]
+    assert repository.claim_for_posting(client_id, None, "worker-2", 60) == []
+
+    # An update guarded by a state the row has left is skipped.
+    repository.update_review(first["id"], {"status": "rejected"}, expect_status="pending")
+    repository.update_review(first["id"], {"status": "posted"}, expect_status="posting")
+    repository.flush()
+    assert memory.tables["pending_reviews"][0]["status"] == "posted"
+    assert repository.count_daily_stats(client_id) == {"pending": 0, "posted": 1}
+
+    with pytest.raises(ValueError):
+        repository.update_review(first["id"], {"review_text": "edited"})
+
+def test_write_behind_batches_updates_into_one_call(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(repository)
+    monkeypatch.setattr(repository, "write_behind", repository.WriteBehind(interval=60, max_batch=200))
+    fake.seed("pending_reviews", [{"google_review_id": f"r{n}", "status": "pending"} for n in range(20)])
+    try:
+        ids = [row["id"] for row in fake.rows("pending_reviews")]
+        for review_id in ids:
+            repository.update_review(review_id, {"draft_reply": "Thanks"})
+            repository.update_review(review_id, {"status": "rejected"})
+        assert fake.snapshot().get("RPC apply_pending_review_updates", 0) == 0
+
+        # Reads see this process's buffered writes.
+        assert repository.get_pending_review(ids[0]) is None
+        assert fake.snapshot()["RPC apply_pending_review_updates"] == 1
+        assert all(row["status"] == "rejected" and row["draft_reply"] == "Thanks" for row in fake.rows("pending_reviews"))
+        assert repository.write_behind.stats()["merged"] == 20
+    finally:
+        repository.write_behind.stop()
+
+class FakePool:
+    """Records the statements a PostgresBackend sends and answers with canned rows."""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.statements = []
+        self.closed = False
+
+    async def fetch(self, query, *args):
+        self.statements.append((query, args))
+        return self.rows
+
+    async def fetchrow(self, query, *args):
+        self.statements.append((query, args))
+        return self.rows[0] if self.rows else None
+
+    async def fetchval(self, query, *args):
+        self.statements.append((query, args))
+        return len(self.rows)
+
+    async def executemany(self, query, args):
+        self.statements.append((query, args))
+
+    async def close(self):
+        self.closed = True
+
+def test_postgres_backend_sends_one_statement_per_call():
+    review_id = uuid.uuid4()
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    pool = FakePool([{"id": review_id, "status": "posting", "created_at": created_at}])
+
+    class Backend(repository.PostgresBackend):
+        async def _create_pool(self, dsn, min_size, max_size):
+            return pool
+
+    postgres = Backend("postgresql://test", 1, 2)
+    try:
+        # Rows come back with the strings PostgREST would send.
+        assert postgres.claim_for_posting("client-1", [str(review_id)], "worker-1", 60) == [
+            {"id": str(review_id), "status": "posting", "created_at": "2024-01-01T00:00:00+00:00"}
+        ]
+        postgres.insert_review({"client_id": "client-1", "google_review_id": "r1",
+                                "received_at": "2024-01-02T00:00:00+00:00"})
+        assert postgres.apply_updates([{"id": str(review_id), "fields": {"status": "posted"}}]) == 1
+        with pytest.raises(ValueError):
+            postgres.client_by("business_name", "Cafe")
+
+        query, args = pool.statements[1]
+        assert query.startswith("INSERT INTO pending_reviews") and query.endswith("RETURNING *")
+        assert args[5] == [] and args[6] == "pending" and args[7] == datetime(2024, 1, 2, tzinfo=timezone.utc)
+        assert [query for query, _ in pool.statements][2] == "SELECT apply_pending_review_updates($1::jsonb)"
+    finally:
+        postgres.close()
+    assert pool.closed
+
+def test_conflicting_updates_are_written_in_order_without_blocking(monkeypatch):
+    memory = repository.MemoryBackend()
+    calls = []
+    apply_updates = memory.apply_updates
+    monkeypatch.setattr(memory, "apply_updates", lambda updates: calls.append(len(updates)) or apply_updates(updates))
+    monkeypatch.setattr(repository, "backend", memory)
+    writer = repository.WriteBehind(interval=60, max_batch=200)
+    memory.seed("pending_reviews", [{"google_review_id": "r1", "status": "posting"}])
+    review_id = memory.tables["pending_reviews"][0]["id"]
+
+    writer.put(review_id, {"status": "pending"}, expect_status="posting")
+    writer.put(review_id, {"status": "posted"}, expect_status="pending")
+    # The second update expects the state the first one writes: nothing is
+    # sent on the caller's thread, and the flush applies them in order.
+    assert calls == [] and writer.stats()["buffered"] == 2
+    assert writer.flush() == 2
+    assert calls == [1, 1] and memory.tables["pending_reviews"][0]["status"] == "posted"
+    writer.stop()
+
+def test_updates_are_dropped_with_a_log_after_max_attempts(monkeypatch, capsys):
+    memory = repository.MemoryBackend()
+    monkeypatch.setattr(memory, "apply_updates", lambda updates: 1 / 0)
+    monkeypatch.setattr(repository, "backend", memory)
+    writer = repository.WriteBehind(interval=60, max_batch=200)
+    writer.put("review-1", {"status": "posted"}, expect_status="posting")
+    for _ in range(repository.WriteBehind.MAX_ATTEMPTS):
+        writer.flush()
+    assert writer.stats()["dropped"] == 1 and writer.stats()["buffered"] == 0
+    assert "Dropped update to review review-1" in capsys.readouterr().out
+    writer.stop()
+
+def test_posted_today_uses_the_apps_local_midnight(monkeypatch):
+    memory = repository.MemoryBackend()
+    monkeypatch.setattr(repository, "backend", memory)
+    monkeypatch.setenv("TZ", "Asia/Muscat")
+    time.tzset()
+    try:
+        midnight = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+        memory.seed("clients", [{"phone_number": "+96890000001"}])
+        client_id = memory.tables["clients"][0]["id"]
+        memory.seed("pending_reviews", [
+            {"client_id": client_id, "google_review_id": f"r{n}", "status": "posted",
+             "updated_at": (midnight + timedelta(minutes=minutes)).astimezone(timezone.utc).isoformat()}
+            for n, minutes in enumerate((-1, 1))
+        ])
+        # 23:59 local yesterday is 19:59 UTC, which the database may still call today.
+        assert repository.count_daily_stats(client_id) == {"pending": 0, "posted": 1}
+        assert repository.review_context("+96890000001")["stats"]["posted"] == 1
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
@@ -0,0 +1,73 @@
+import time
+import pytest
+from app.core import resilience
+from app.core.resilience import CircuitBreaker, CircuitOpenError, Dependency, RetryBudget
+
+def test_breaker_opens_and_recovers_through_half_open():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()  # trial call
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_retry_budget_caps_retries():
+    budget = RetryBudget(ratio=0.5, min_retries=1)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_retry() for _ in range(4)] == [True, True, True, False]
+    assert budget.exhausted == 1
+
+def test_call_retries_then_fails_fast(monkeypatch):
+    monkeypatch.setattr(resilience.settings, "retry_base_delay", 0.001)
+    dependency = Dependency("flaky", timeout=1, max_retries=2)
+    dependency.breaker.failure_threshold = 3
+    monkeypatch.setitem(resilience.DEPENDENCIES, "flaky", dependency)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        resilience.call("flaky", failing)
+    assert len(calls) == 3
+    assert dependency.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        resilience.call("flaky", failing)
+    assert len(calls) == 3
+
+def test_non_retryable_errors_do_not_trip_the_breaker(monkeypatch):
+    dependency = Dependency("strict", timeout=1, max_retries=3)
+    monkeypatch.setitem(resilience.DEPENDENCIES, "strict", dependency)
+
+    def bad_request():
+        raise ValueError("400")
+
+    for _ in range(10):
+        with pytest.raises(ValueError):
+            resilience.call("strict", bad_request, retryable=lambda error: False)
+    assert dependency.breaker.state == "closed"
+
+def test_hedged_call_returns_the_faster_copy(monkeypatch):
+    monkeypatch.setitem(resilience.DEPENDENCIES, "hedge", Dependency("hedge", timeout=1, max_retries=0))
+    delays = [0.5, 0.01]
+
+    def slow_then_fast():
+        delay = delays.pop(0)
+        time.sleep(delay)
+        return delay
+
+    started = time.monotonic()
+    assert resilience.call("hedge", slow_then_fast, hedge_after=0.02) == 0.01
+    assert time.monotonic() - started < 0.3
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta, timezone
+from app.db import repository
+from app.services import retention
+
+def _days_ago(days: int):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+def test_moves_old_terminal_reviews_to_the_archive_in_batches(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(repository)
+    monkeypatch.setattr(retention.settings, "retention_days", 30)
+    monkeypatch.setattr(retention.settings, "retention_batch_size", 2)
+    monkeypatch.setattr(retention.settings, "retention_batch_pause", 0)
+    fake.seed("pending_reviews", [
+        {"google_review_id": "old-posted-1", "status": "posted", "updated_at": _days_ago(90)},
+        {"google_review_id": "old-posted-2", "status": "posted", "updated_at": _days_ago(60)},
+        {"google_review_id": "old-rejected", "status": "rejected", "updated_at": _days_ago(45)},
+        # Open work and recent history stay hot whatever their age.
+        {"google_review_id": "old-pending", "status": "pending", "updated_at": _days_ago(90)},
+        {"google_review_id": "old-needs-review", "status": "needs_review", "updated_at": _days_ago(90)},
+        {"google_review_id": "recent-posted", "status": "posted", "updated_at": _days_ago(3)},
+    ])
+    assert retention.run_once(max_batches=1) == 2
+    assert retention.run_once() == 1
+    assert retention.run_once() == 0
+
+    assert sorted(row["google_review_id"] for row in fake.rows("pending_reviews")) == [
+        "old-needs-review", "old-pending", "recent-posted"
+    ]
+    archive = fake.rows("pending_reviews_archive")
+    assert [row["google_review_id"] for row in archive] == ["old-posted-1", "old-posted-2", "old-rejected"]
+    assert all(row["archived_at"] and row["created_at"] for row in archive)
+    assert fake.snapshot()["RPC archive_pending_reviews"] == 3
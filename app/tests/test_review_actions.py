@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app import main
+from app.db import repository
+from app.services import sessions, stats_service
+from app.services.tenant_cache import tenant_cache
+
+@pytest.fixture
+def fake_db(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(repository)
+    monkeypatch.setattr(repository, "write_behind", repository.WriteBehind(interval=0.005, max_batch=200))
+    monkeypatch.setattr(main, "send_whatsapp_message", lambda *args: None)
+    monkeypatch.setattr(sessions, "store", sessions.MemorySessionStore(ttl=60, max_size=10))
+    tenant_cache.clear()
+    fake.seed("clients", [{
+        "phone_number": "+96890000001",
+        "google_location_id": "accounts/1/locations/1",
+        "business_name": "Cafe",
+        "language_preference": "en"
+    }])
+    client_id = fake.rows("clients")[0]["id"]
+    fake.seed("pending_reviews", [
+        {"client_id": client_id, "google_review_id": "r1", "status": "pending", "draft_reply": "old",
+         "created_at": "2024-01-01T00:00:00+00:00"},
+        {"client_id": client_id, "google_review_id": "r2", "status": "pending", "draft_reply": "new",
+         "created_at": "2024-01-02T00:00:00+00:00"}
+    ])
+    yield fake
+    tenant_cache.clear()
+
+def test_approve_resolves_client_and_review_in_one_round_trip(fake_db):
+    assert asyncio.run(main.approve_review("+96890000001")) is True
+    repository.flush()
+
+    assert fake_db.snapshot() == {
+        "RPC get_pending_review_context": 1, "RPC claim_reviews_for_posting": 1, "RPC apply_pending_review_updates": 1
+    }
+    statuses = {row["google_review_id"]: row["status"] for row in fake_db.rows("pending_reviews")}
+    assert statuses == {"r1": "pending", "r2": "posted"}
+    client_id = fake_db.rows("clients")[0]["id"]
+    assert stats_service.get_daily_stats(client_id) == {"pending": 1, "posted": 1}
+
+def test_unknown_phone_is_ignored(fake_db):
+    assert asyncio.run(main.approve_review("+96899999999")) is False
+    assert fake_db.snapshot() == {"RPC get_pending_review_context": 1}
+
+def test_session_targets_the_review_that_was_shown(fake_db):
+    client_id = fake_db.rows("clients")[0]["id"]
+    older = next(row for row in fake_db.rows("pending_reviews") if row["google_review_id"] == "r1")
+    sessions.save("+96890000001", [older["id"]], client_id)
+    main.get_client_by_phone("+96890000001")
+    before = fake_db.snapshot()
+
+    assert asyncio.run(main.approve_review("+96890000001")) is True
+    repository.flush()
+
+    after = fake_db.snapshot()
+    assert {key: after[key] - before.get(key, 0) for key in after} == {
+        "GET clients": 0, "GET pending_reviews": 1, "RPC claim_reviews_for_posting": 1,
+        "RPC apply_pending_review_updates": 1
+    }
+    assert older["status"] == "posted"
+    # The dashboard was handled; a second "1" must not post the newer review.
+    assert asyncio.run(main.approve_review("+96890000001")) is False
+
+def test_twilio_webhook_acknowledges_before_handling(fake_db, monkeypatch):
+    handled = []
+
+    async def slow_approve(phone_number):
+        await asyncio.sleep(0.2)
+        handled.append(phone_number)
+
+    monkeypatch.setattr(main, "approve_review", slow_approve)
+    with TestClient(main.app) as client:
+        response = client.post("/webhook/twilio", data={"From": "whatsapp:+96890000001", "Body": "1"})
+        assert response.status_code == 200
+        assert handled == []
+    # Shutdown waits for acknowledged commands.
+    assert handled == ["+96890000001"]
+
+def test_commands_from_one_phone_run_in_order_and_release_their_lock(monkeypatch):
+    handled = []
+
+    async def approve(phone_number):
+        handled.append(("start", phone_number))
+        await asyncio.sleep(0.01)
+        handled.append(("end", phone_number))
+
+    async def run():
+        await asyncio.gather(*(main.handle_command(phone, "1") for phone in ("+968a", "+968a", "+968b")))
+
+    monkeypatch.setattr(main, "approve_review", approve)
+    monkeypatch.setattr(main.sessions, "get_review_ids", lambda phone_number: None)
+    asyncio.run(run())
+    commands_a = [step for step, phone in handled if phone == "+968a"]
+    assert commands_a == ["start", "end", "start", "end"]
+    assert main._phone_locks == {}
@@ -0,0 +1,114 @@
+import asyncio
+import base64
+import json
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app.services import idempotency, pipeline
+from app.services.idempotency import SeenSet
+from app.services.scheduler import FairQueue
+
+async def _drain(queue: FairQueue, count: int):
+    order = []
+    for _ in range(count):
+        key, item = await queue.get()
+        order.append(item)
+        queue.task_done(key)
+    return order
+
+def test_flooding_tenant_does_not_starve_others():
+    async def scenario():
+        queue = FairQueue(tenant_concurrency=4)
+        for n in range(10):
+            queue.put("bomb", f"bomb-{n}")
+        queue.put("cafe", "cafe-0")
+        queue.put("heavy", "heavy-0", weight=2)
+        queue.put("heavy", "heavy-1", weight=2)
+        return await _drain(queue, 13)
+
+    order = asyncio.run(scenario())
+    # Each tenant's first job is served before the flood's second one.
+    assert set(order[:3]) == {"bomb-0", "cafe-0", "heavy-0"}
+    assert order.index("heavy-1") < order.index("bomb-2")
+    assert [item for item in order if item.startswith("bomb")] == [f"bomb-{n}" for n in range(10)]
+
+def test_tenant_concurrency_and_queue_limits():
+    async def scenario():
+        queue = FairQueue(tenant_concurrency=1, max_depth=3, tenant_max_depth=2)
+        queue.put("a", "a-0")
+        queue.put("a", "a-1")
+        assert not queue.admits("a")
+        assert queue.admits("b")
+        queue.put("b", "b-0")
+        assert not queue.admits("b")  # global limit
+
+        first = await queue.get()
+        second = await queue.get()
+        # "a" already has a job running, so its next job waits for task_done.
+        blocked = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0.01)
+        assert (first[1], second[1], blocked.done()) == ("a-0", "b-0", False)
+        queue.task_done("a")
+        assert (await blocked)[1] == "a-1"
+        queue.task_done("b")
+        stats = queue.tenant_stats()
+        queue.task_done("a")
+        await asyncio.wait_for(queue.join(), timeout=1)
+        return stats, queue.tenant_stats()
+
+    active, idle = asyncio.run(scenario())
+    assert [(row["tenant"], row["started"], row["running"]) for row in active] == [("a", 2, 1)]
+    # Idle tenants are evicted.
+    assert idle == []
+
+def test_submit_rejects_work_past_the_tenant_limit(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(pipeline, "supabase", None)
+    monkeypatch.setattr(pipeline, "get_client_by_location", lambda location_id: {"id": f"client-{location_id}"})
+    monkeypatch.setattr(pipeline.settings, "pipeline_tenant_concurrency", 1)
+    monkeypatch.setattr(pipeline.settings, "pipeline_tenant_max_queue", 2)
+    monkeypatch.setattr(pipeline, "STAGE_RUNNERS", {
+        stage: (lambda job: release.wait(5) and {}) for stage in pipeline.STAGES
+    })
+
+    async def scenario():
+        await pipeline.start(workers=2)
+        try:
+            await pipeline.submit({"location_id": "bomb"})
+            await asyncio.sleep(0.05)
+            await pipeline.submit({"location_id": "bomb"})
+            await pipeline.submit({"location_id": "bomb"})
+            with pytest.raises(pipeline.Overloaded):
+                await pipeline.submit({"location_id": "bomb"})
+            await pipeline.submit({"location_id": "cafe"})
+            return pipeline.stats()
+        finally:
+            release.set()
+            await pipeline.stop(timeout=5)
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert {row["tenant"]: row["queued"] + row["running"] for row in stats["tenants"]} == {
+        "client-bomb": 3, "client-cafe": 1
+    }
+
+def test_webhook_asks_pubsub_to_redeliver_when_overloaded(monkeypatch):
+    from app.main import app
+
+    overloaded = [True]
+
+    async def fake_submit(review, message_id=None):
+        if overloaded[0]:
+            raise pipeline.Overloaded("Review queue is full")
+        return {"id": "job-1"}
+
+    monkeypatch.setattr(idempotency, "_seen", SeenSet(max_size=10))
+    monkeypatch.setattr(pipeline, "submit", fake_submit)
+    data = base64.b64encode(json.dumps({"name": "accounts/1/locations/2/reviews/3"}).encode()).decode()
+    body = {"message": {"data": data, "messageId": "m-1"}}
+
+    with TestClient(app) as client:
+        assert client.post("/webhook/google-pubsub", json=body).status_code == 429
+        overloaded[0] = False
+        # The redelivery is not mistaken for a duplicate.
+        assert client.post("/webhook/google-pubsub", json=body).json()["status"] == "accepted"
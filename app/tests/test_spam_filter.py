@@ -0,0 +1,108 @@
+import copy
+import pytest
+from app.db import repository
+from app.services import pipeline, spam_filter
+from app.services.spam_filter import SpamFilter
+
+REVIEW = "The karak tea was amazing and the staff were very friendly, will come back"
+
+def test_flags_near_duplicates_across_locations(monkeypatch):
+    monkeypatch.setattr(spam_filter.settings, "spam_burst_limit", 100)
+    screen = SpamFilter(max_reviews=100, max_locations=100)
+    assert screen.check("loc-1", "r-1", REVIEW, now=0) is None
+    # Redelivery of the same review is not a duplicate of itself.
+    assert screen.check("loc-1", "r-1", REVIEW, now=1) is None
+    assert screen.check("loc-1", "r-2", REVIEW.replace("friendly,", "friendly!!") + " 😊", now=2) == "duplicate"
+    assert screen.check("loc-2", "r-3", REVIEW + " soon", now=3) == "cross_location_duplicate"
+    assert screen.check("loc-1", "r-4", "Food was cold and we waited forty minutes for our order", now=4) is None
+    # Too short to tell a copy from common praise.
+    assert screen.check("loc-1", "r-5", "Great tea", now=5) is None
+    assert screen.check("loc-2", "r-6", "Great tea", now=6) is None
+    assert screen.stats()["duplicate"] == 1
+
+def test_flags_bursts_per_location(monkeypatch):
+    monkeypatch.setattr(spam_filter.settings, "spam_burst_limit", 3)
+    monkeypatch.setattr(spam_filter.settings, "spam_burst_window", 60)
+    screen = SpamFilter(max_reviews=100, max_locations=100)
+    reasons = [screen.check("loc-1", f"r-{n}", f"Review number {n}", now=n) for n in range(5)]
+    assert reasons == [None, None, None, "burst", "burst"]
+    assert screen.check("loc-2", "other", "Another place", now=5) is None
+    assert screen.check("loc-1", "later", "Much later", now=200) is None
+
+def test_memory_stays_bounded(monkeypatch):
+    monkeypatch.setattr(spam_filter.settings, "spam_burst_limit", 1000)
+    screen = SpamFilter(max_reviews=10, max_locations=5)
+    for n in range(200):
+        screen.check(f"loc-{n}", f"r-{n}", f"review {n} about dish {n * 7} and drink {n * 13} today", now=n)
+    stats = screen.stats()
+    assert stats["reviews"] <= 11 and stats["locations"] == 5
+    assert sum(len(bucket) for bucket in screen._buckets.values()) <= 11 * spam_filter.SIGNATURE_BINS
+
+def test_suspected_fake_skips_drafting_and_the_dashboard(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(repository)
+    notified = []
+    monkeypatch.setattr(spam_filter, "spam_filter", SpamFilter(max_reviews=100, max_locations=100))
+    monkeypatch.setattr(pipeline, "draft_review_reply", lambda *args, **kwargs: {"reply_text": "Thank you!", "alternates": []})
+    monkeypatch.setattr(pipeline, "notify_review", lambda client, item, on_sent=None: notified.append(item))
+    monkeypatch.setattr(pipeline, "notify_held", lambda client, on_sent=None: notified.append("held"))
+    client = {"id": "client-1", "phone_number": "+96890000000", "language_preference": "en"}
+    jobs = []
+    for n in range(2):
+        review = {"location_id": "loc-1", "review_id": f"loc-1/reviews/{n}", "review_text": REVIEW,
+                  "reviewer_name": "Ahmed", "star_rating": 5}
+        job = {"id": f"job-{n}", "payload": review, "stage": "draft", "attempts": 0, "client": client}
+        jobs.append(pipeline.process_job(job))
+
+    assert jobs[0]["draft"]["reply_text"] == "Thank you!"
+    assert jobs[1]["draft"]["reply_text"] == "" and jobs[1]["draft"]["spam_reason"] == "duplicate"
+    assert [row["status"] for row in fake.rows("pending_reviews")] == ["pending", "needs_review"]
+    # The owner is told a review was held, without its content.
+    assert notified[1] == "held" and len(notified) == 2
+
+def test_recovered_jobs_are_not_screened_again(monkeypatch, fake_postgrest):
+    fake = fake_postgrest(pipeline)
+    screened = []
+    monkeypatch.setattr(spam_filter, "screen", lambda *args: screened.append(args) and None)
+    monkeypatch.setattr(pipeline, "draft_review_reply", lambda *args, **kwargs: None)
+    client = {"id": "client-1", "phone_number": "+96890000000", "language_preference": "en"}
+    review = {"location_id": "loc-1", "review_id": "loc-1/reviews/1", "review_text": REVIEW, "star_rating": 5}
+    fake.seed("review_jobs", [{"payload": review, "stage": "draft", "status": "queued", "attempts": 0}])
+
+    def load_job():
+        # A copy, as a process reading the row from the database would get.
+        return {**pipeline._job_from_row(copy.deepcopy(fake.rows("review_jobs")[0])), "client": client}
+
+    job = load_job()
+    with pytest.raises(pipeline.StageError):
+        pipeline.run_draft(job)
+    pipeline.fail_job(job, "queued", RuntimeError("AI generation failed"))
+
+    # As read back by recovery or a lease takeover in another process.
+    recovered = load_job()
+    with pytest.raises(pipeline.StageError):
+        pipeline.run_draft(recovered)
+    assert len(screened) == 1
+
+def test_release_drafts_held_reviews(monkeypatch):
+    memory = repository.MemoryBackend()
+    notified = []
+    monkeypatch.setattr(repository, "backend", memory)
+    monkeypatch.setattr(repository, "write_behind", repository.WriteBehind(interval=60, max_batch=200))
+    monkeypatch.setattr(pipeline, "draft_review_reply", lambda *args, **kwargs: {"reply_text": "Thank you!", "alternates": []})
+    monkeypatch.setattr(pipeline, "notify_review", lambda client, item, on_sent=None: notified.append(item))
+    client = {"id": "client-1", "phone_number": "+96890000000", "language_preference": "en"}
+    memory.seed("pending_reviews", [
+        {"client_id": "client-1", "google_review_id": "r1", "review_text": REVIEW, "star_rating": 5,
+         "status": "needs_review", "draft_reply": ""},
+        {"client_id": "client-1", "google_review_id": "r2", "review_text": REVIEW, "star_rating": 5, "status": "pending"}
+    ])
+
+    held = repository.held_reviews("client-1", 10)
+    assert [review["google_review_id"] for review in held] == ["r1"]
+    assert pipeline.release_held_review(client, held[0]) is True
+    # A second RELEASE of the same review neither counts nor notifies it again.
+    assert pipeline.release_held_review(client, held[0]) is False
+    assert repository.held_reviews("client-1", 10) == []
+    assert memory.tables["pending_reviews"][0]["draft_reply"] == "Thank you!"
+    assert [item["pending_review_id"] for item in notified] == [held[0]["id"]]
+    repository.write_behind.stop()
@@ -0,0 +1,32 @@
+from datetime import date, timedelta
+from app.services import stats_service
+
+def test_counters_seed_once_and_track_transitions(monkeypatch):
+    queries = []
+
+    def fake_count(client_id):
+        queries.append(client_id)
+        return {"pending": 3, "posted": 1}
+
+    monkeypatch.setattr(stats_service, "_counters", {})
+    monkeypatch.setattr(stats_service, "count_daily_stats", fake_count)
+
+    assert stats_service.get_daily_stats("c1") == {"pending": 3, "posted": 1}
+    stats_service.record_review_created("c1")
+    stats_service.record_status_change("c1", "pending", "posted", 2)
+    assert stats_service.get_daily_stats("c1") == {"pending": 2, "posted": 3}
+    assert queries == ["c1"]
+
+def test_posted_counter_resets_on_new_day(monkeypatch):
+    monkeypatch.setattr(stats_service, "_counters", {
+        "c1": {"day": date.today() - timedelta(days=1), "pending": 4, "posted": 7}
+    })
+    assert stats_service.get_daily_stats("c1") == {"pending": 4, "posted": 0}
+
+def test_reconcile_corrects_drift(monkeypatch):
+    monkeypatch.setattr(stats_service, "_counters", {
+        "c1": {"day": date.today(), "pending": 9, "posted": 0}
+    })
+    monkeypatch.setattr(stats_service, "count_daily_stats", lambda client_id: {"pending": 2, "posted": 5})
+    assert stats_service.reconcile() == 1
+    assert stats_service.get_daily_stats("c1") == {"pending": 2, "posted": 5}
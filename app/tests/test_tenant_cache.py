@@ -0,0 +1,58 @@
+import time
+from app.services.tenant_cache import TenantCache
+
+def make_row(n):
+    return {"id": f"c{n}", "google_location_id": f"loc{n}", "phone_number": f"+9680000{n}"}
+
+def test_lookup_by_both_indexes():
+    cache = TenantCache(ttl=60, max_size=10, negative_ttl=60)
+    assert cache.get("google_location_id", "loc1") == (False, None)
+    cache.put(make_row(1))
+    assert cache.get("google_location_id", "loc1") == (True, make_row(1))
+    assert cache.get("phone_number", "+96800001") == (True, make_row(1))
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+def test_negative_cache_for_unknown_location():
+    cache = TenantCache(ttl=60, max_size=10, negative_ttl=60)
+    cache.put_missing("loc9")
+    assert cache.get("google_location_id", "loc9") == (True, None)
+    assert cache.stats()["negative_hits"] == 1
+
+    # Registering the location clears the negative entry.
+    cache.invalidate(google_location_id="loc9")
+    assert cache.get("google_location_id", "loc9") == (False, None)
+
+def test_lru_eviction_and_ttl():
+    cache = TenantCache(ttl=60, max_size=2, negative_ttl=60)
+    for n in range(3):
+        cache.put(make_row(n))
+    assert cache.get("phone_number", "+96800000") == (False, None)
+    assert cache.stats()["evictions"] == 1
+
+    expiring = TenantCache(ttl=0.01, max_size=2, negative_ttl=60)
+    expiring.put(make_row(1))
+    time.sleep(0.02)
+    assert expiring.get("google_location_id", "loc1") == (False, None)
+
+def test_invalidate_after_update():
+    cache = TenantCache(ttl=60, max_size=10, negative_ttl=60)
+    cache.put(make_row(1))
+    cache.invalidate(client_id="c1")
+    assert cache.get("google_location_id", "loc1") == (False, None)
+    assert cache.get("phone_number", "+96800001") == (False, None)
+
+def test_clients_webhook_requires_a_configured_secret(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import main
+
+    invalidated = []
+    monkeypatch.setattr(main, "handle_client_change", invalidated.append)
+    change = {"table": "clients", "type": "UPDATE", "record": make_row(1)}
+    client = TestClient(main.app)
+    monkeypatch.setattr(main.settings, "supabase_webhook_secret", "")
+    assert client.post("/webhook/supabase/clients", json=change).status_code == 503
+    monkeypatch.setattr(main.settings, "supabase_webhook_secret", "s3cret")
+    assert client.post("/webhook/supabase/clients", json=change, headers={"X-Webhook-Secret": "wrong"}).status_code == 401
+    assert client.post("/webhook/supabase/clients", json=change, headers={"X-Webhook-Secret": "s3cret"}).status_code == 200
+    assert invalidated == [change]
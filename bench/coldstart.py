@@ -0,0 +1,143 @@
+"""
+Cold-start profile: how long `import app.main` takes (from `python -X
+importtime`) and how long a fresh uvicorn process takes to answer /health.
+
+    python -m bench.coldstart                          # report
+    python -m bench.coldstart --max-import-ms 800 --max-healthy-ms 1500
+    python -m bench.coldstart --warm-up blocking       # compare with eager client builds
+
+Exits 1 when a budget is exceeded or a deferred SDK is imported on startup,
+so CI can run it as a gate. Numbers are machine-dependent; budgets should
+leave headroom for the CI runner.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# SDKs that must only be imported when their clients are built.
+DEFERRED_PACKAGES = ("openai", "twilio.rest", "supabase", "postgrest", "google.auth", "google.oauth2")
+
+def parse_importtime(stderr: str):
+    """
+    Parses `-X importtime` output into (module, self_ms, cumulative_ms, depth)
+    rows, in import order.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2 - 1
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return rows
+
+def profile_imports(module: str, env: dict):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+def deferred_imports(rows: list):
+    """The DEFERRED_PACKAGES that the profiled import pulled in."""
+    names = [row[0] for row in rows]
+    return [
+        package for package in DEFERRED_PACKAGES
+        if any(name == package or name.startswith(package + ".") for name in names)
+    ]
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_healthy(env: dict, timeout: float = 30.0):
+    """Seconds from spawning uvicorn until /health answers 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(timeout=1.0) as http:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+                try:
+                    if http.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"/health did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the app's cold start.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per measurement; the median is reported")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to list")
+    parser.add_argument("--warm-up", choices=["blocking", "background", "lazy"], default=None,
+                        help="CLIENT_WARM_UP for the /health measurement (default: the app's setting)")
+    parser.add_argument("--skip-health", action="store_true")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-healthy-ms", type=float, default=None)
+    parser.add_argument("--json", type=Path, default=None, help="Also write the report to this file")
+    return parser.parse_args(argv)
+
+def _median(values: list):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def main(argv=None):
+    args = parse_args(argv)
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    if args.warm_up:
+        env["CLIENT_WARM_UP"] = args.warm_up
+
+    runs = [profile_imports(args.module, env) for _ in range(args.runs)]
+    totals = [next(row[2] for row in rows if row[0] == args.module) for rows in runs]
+    rows = runs[totals.index(_median(totals))]
+    top_level = sorted((row for row in rows if row[3] <= 1), key=lambda row: -row[2])[:args.top]
+    report = {
+        "import_ms": round(_median(totals), 1),
+        "slowest_imports": [{"module": name, "cumulative_ms": round(cumulative, 1)} for name, _, cumulative, _ in top_level],
+        "deferred_imported": deferred_imports(rows),
+        "healthy_ms": None
+    }
+    if not args.skip_health:
+        report["healthy_ms"] = round(_median([time_to_healthy(env) * 1000 for _ in range(args.runs)]), 1)
+
+    print(f"== import {args.module}: {report['import_ms']} ms (median of {args.runs})")
+    for entry in report["slowest_imports"]:
+        print(f"   {entry['cumulative_ms']:>8.1f} ms  {entry['module']}")
+    if report["healthy_ms"] is not None:
+        print(f"== first healthy /health: {report['healthy_ms']} ms")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    failures = []
+    if report["deferred_imported"]:
+        failures.append(f"SDKs imported at startup: {', '.join(report['deferred_imported'])}")
+    if args.max_import_ms is not None and report["import_ms"] > args.max_import_ms:
+        failures.append(f"import took {report['import_ms']} ms (budget {args.max_import_ms} ms)")
+    if args.max_healthy_ms is not None and report["healthy_ms"] is not None and report["healthy_ms"] > args.max_healthy_ms:
+        failures.append(f"/health took {report['healthy_ms']} ms (budget {args.max_healthy_ms} ms)")
+    for failure in failures:
+        print(f"== FAIL {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
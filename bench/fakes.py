@@ -0,0 +1,492 @@
+"""
+Local stand-ins for every external dependency, served over real HTTP so the
+SDKs, connection pools and retry paths behave as they do in production:
+
+- FakePostgrest: an in-memory PostgREST (what supabase-py talks to)
+- FakeOpenAI: chat completions with a configurable latency distribution
+- FakeGoogle: the v4 reviews API used to post replies
+- FakeTwilio: the Messages API used for WhatsApp
+"""
+import csv
+import fnmatch
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, parse_qsl, unquote, urlsplit
+
+class LatencyModel:
+    """
+    Log-normal latency defined by its median and p99 (in seconds), which is
+    how provider latency is usually reported.
+    """
+
+    def __init__(self, median: float = 0.0, p99: float = None, error_rate: float = 0.0):
+        self.median = median
+        self.p99 = p99 if p99 is not None else median
+        self.error_rate = error_rate
+        # z(0.99) = 2.326
+        self.sigma = math.log(self.p99 / self.median) / 2.326 if self.median > 0 and self.p99 > self.median else 0.0
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self.sigma * random.gauss(0, 1))
+
+    def fails(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    @classmethod
+    def parse(cls, spec: str):
+        """'0.8,4' -> median 0.8s, p99 4s; an optional third field is the error rate."""
+        parts = [float(part) for part in spec.split(",")] if spec else []
+        return cls(*parts)
+
+class FakeServer:
+    """Threaded HTTP server that hands every request to `handle`."""
+
+    def __init__(self, latency: LatencyModel = None):
+        self.latency = latency or LatencyModel()
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; with Nagle on, a
+            # keep-alive client waits for its delayed ACK (~40ms) per response.
+            disable_nagle_algorithm = True
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                url = urlsplit(self.path)
+                status, headers, payload = fake.handle(self.command, unquote(url.path), url.query, self.headers, body)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = _dispatch
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def count(self, key: str):
+        with self._lock:
+            self.requests[key] += 1
+
+    def total(self):
+        with self._lock:
+            return sum(self.requests.values())
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.requests)
+
+    def delay(self):
+        seconds = self.latency.sample()
+        if seconds:
+            time.sleep(seconds)
+
+    def handle(self, method, path, query, headers, body):
+        raise NotImplementedError
+
+    def shutdown(self):
+        self.server.shutdown()
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+def _parse_list(text: str):
+    # in.(a,"b,c") -> ["a", "b,c"]
+    return next(csv.reader([text[1:-1]], skipinitialspace=True)) if len(text) > 2 else []
+
+def _coerce(current, text: str):
+    if isinstance(current, bool):
+        return text.lower() == "true"
+    if isinstance(current, int):
+        return int(text)
+    if isinstance(current, float):
+        return float(text)
+    return text
+
+def _matches(row: dict, column: str, expression: str):
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, operand = expression.partition(".")
+    value = row.get(column)
+
+    if operator == "is":
+        result = value is None if operand == "null" else value == (operand == "true")
+    elif operator == "in":
+        result = value is not None and str(value) in _parse_list(operand)
+    elif value is None:
+        result = False
+    elif operator == "like":
+        result = fnmatch.fnmatchcase(str(value), operand.replace("%", "*"))
+    else:
+        operand = _coerce(value, operand)
+        value = value if not isinstance(value, (dict, list)) else json.dumps(value)
+        result = {
+            "eq": value == operand,
+            "neq": value != operand,
+            "gt": value > operand,
+            "gte": value >= operand,
+            "lt": value < operand,
+            "lte": value <= operand,
+        }[operator]
+    return not result if negate else result
+
+def _pending_review_context(fake, params: dict):
+    # Python version of get_pending_review_context (migration 012).
+    client = next((row for row in fake.rows("clients") if row.get("phone_number") == params["p_phone_number"]), None)
+    if client is None:
+        return None
+    reviews = [row for row in fake.rows("pending_reviews") if row.get("client_id") == client["id"]]
+    pending = [row for row in reviews if row.get("status") == "pending"]
+    stats = None
+    if params.get("p_with_stats", True):
+        stats = {
+            "pending": len(pending),
+            "posted": sum(1 for row in reviews if row.get("status") == "posted" and row.get("updated_at", "") >= params["p_since"])
+        }
+    return {
+        "client": dict(client),
+        "review": dict(max(pending, key=lambda row: row["created_at"])) if pending else None,
+        "stats": stats
+    }
+
+def _lease(params: dict, default_seconds: int):
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=params.get("p_lease_seconds", default_seconds))
+    return {"lease_owner": params["p_worker"], "lease_expires_at": expires_at.isoformat(), "updated_at": _now()}
+
+def _lease_expired(row: dict, now: str):
+    return row.get("lease_expires_at") is None or row["lease_expires_at"] < now
+
+def _claim_review_jobs(fake, params: dict):
+    # Python version of claim_review_jobs (migration 015). Requests are
+    # serialised by the data lock, which stands in for SKIP LOCKED.
+    now = _now()
+    claimable = sorted(
+        (row for row in fake.rows("review_jobs")
+         if row.get("status") == "queued" and row.get("stage") == params["p_stage"]
+         and (row.get("available_at") or now) <= now and _lease_expired(row, now)),
+        key=lambda row: row["created_at"]
+    )[:params.get("p_limit", 1)]
+    lease = _lease(params, 120)
+    for row in claimable:
+        row.update(lease)
+    return [dict(row) for row in claimable]
+
+def _claim_reviews_for_posting(fake, params: dict):
+    # Python version of claim_reviews_for_posting (migration 015).
+    now = _now()
+    ids = params.get("p_review_ids")
+    claimable = sorted(
+        (row for row in fake.rows("pending_reviews")
+         if row.get("client_id") == params["p_client_id"] and (ids is None or row["id"] in ids)
+         and (row.get("status") == "pending" or (row.get("status") == "posting" and _lease_expired(row, now)))),
+        key=lambda row: row["created_at"]
+    )
+    lease = _lease(params, 300)
+    for row in claimable:
+        row.update(lease, status="posting")
+    return [dict(row) for row in claimable]
+
+ARCHIVE_COLUMNS = ("id", "client_id", "google_review_id", "review_text", "star_rating", "draft_reply",
+                   "draft_alternates", "status", "created_at", "updated_at", "received_at", "posted_at")
+
+def _archive_pending_reviews(fake, params: dict):
+    # Python version of archive_pending_reviews (migration 018); the archive
+    # is a single table here.
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=params["p_older_than_days"])).isoformat()
+    rows = fake.rows("pending_reviews")
+    batch = sorted(
+        (row for row in rows
+         if row.get("status") in ("posted", "rejected") and row.get("updated_at", "") < cutoff and row.get("created_at")),
+        key=lambda row: row["updated_at"]
+    )[:params.get("p_limit", 500)]
+    moved = {id(row) for row in batch}
+    rows[:] = [row for row in rows if id(row) not in moved]
+    archived_at = _now()
+    fake.rows("pending_reviews_archive").extend(
+        {**{column: row.get(column) for column in ARCHIVE_COLUMNS}, "archived_at": archived_at} for row in batch
+    )
+    return len(batch)
+
+def _apply_pending_review_updates(fake, params: dict):
+    # Python version of apply_pending_review_updates (migration 019).
+    rows = {row["id"]: row for row in fake.rows("pending_reviews")}
+    applied = 0
+    for update in params["p_updates"]:
+        row = rows.get(update["id"])
+        if row is None or (update.get("expect_status") and row.get("status") != update["expect_status"]):
+            continue
+        row.update(update["fields"], updated_at=_now())
+        applied += 1
+    return applied
+
+RPCS = {
+    "get_pending_review_context": _pending_review_context,
+    "claim_review_jobs": _claim_review_jobs,
+    "claim_reviews_for_posting": _claim_reviews_for_posting,
+    "archive_pending_reviews": _archive_pending_reviews,
+    "apply_pending_review_updates": _apply_pending_review_updates,
+}
+
+class FakePostgrest(FakeServer):
+    """
+    In-memory PostgREST covering the subset of the query language the app
+    uses: eq/neq/gt/gte/lt/lte/in/is/like filters, order, limit, exact counts,
+    insert, upsert (on_conflict), update, delete and rpc/<function>.
+    Unique indexes raise PostgREST's 23505 error like the real database.
+    """
+
+    UNIQUE = {
+        "clients": [("phone_number",)],
+        "review_jobs": [("message_id",), ("google_review_id",)],
+        "pending_reviews": [("google_review_id",)],
+        "whatsapp_sessions": [("phone_number",)],
+    }
+
+    def __init__(self, latency: LatencyModel = None):
+        self.tables = {}
+        self.rpcs = dict(RPCS)
+        self._data_lock = threading.RLock()
+        super().__init__(latency)
+
+    def rows(self, table: str):
+        return self.tables.setdefault(table, [])
+
+    def register_rpc(self, name: str, fn):
+        """`fn(fake, params)` returns the JSON result of rpc/<name>."""
+        self.rpcs[name] = fn
+
+    def seed(self, table: str, rows: list):
+        with self._data_lock:
+            for row in rows:
+                self.rows(table).append({"id": str(uuid.uuid4()), "created_at": _now(), "updated_at": _now(), **row})
+
+    def _filter(self, table: str, params: list):
+        rows = self.rows(table)
+        for column, expression in params:
+            if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            rows = [row for row in rows if _matches(row, column, expression)]
+        return rows
+
+    def _conflict(self, table: str, row: dict, ignore: dict = None):
+        for columns in self.UNIQUE.get(table, []):
+            if any(row.get(column) is None for column in columns):
+                continue
+            for other in self.rows(table):
+                if other is not ignore and all(other.get(column) == row.get(column) for column in columns):
+                    return columns, other
+        return None, None
+
+    @staticmethod
+    def _unique_violation(table: str, columns: tuple):
+        return 409, {}, {
+            "code": "23505",
+            "details": f"Key ({', '.join(columns)}) already exists.",
+            "hint": None,
+            "message": f'duplicate key value violates unique constraint "uq_{table}_{"_".join(columns)}"'
+        }
+
+    @staticmethod
+    def _project(rows: list, select: str):
+        if not select or select == "*":
+            return [dict(row) for row in rows]
+        columns = [column.strip() for column in select.split(",")]
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+    def handle(self, method, path, query, headers, body):
+        self.delay()
+        parts = path.split("/rest/v1/", 1)[-1].split("/")
+        params = parse_qsl(query, keep_blank_values=True)
+        options = dict(params)
+        prefer = headers.get("Prefer", "")
+        payload = json.loads(body) if body else None
+
+        if parts[0] == "rpc":
+            self.count(f"RPC {parts[1]}")
+            with self._data_lock:
+                return 200, {}, self.rpcs[parts[1]](self, payload or {})
+
+        table = parts[0]
+        self.count(f"{method} {table}")
+        with self._data_lock:
+            if method in ("GET", "HEAD"):
+                rows = self._filter(table, params)
+                for spec in reversed([s for s in options.get("order", "").split(",") if s]):
+                    column, _, direction = spec.partition(".")
+                    rows = sorted(rows, key=lambda row: (row.get(column) is None, row.get(column) or ""),
+                                  reverse=direction.startswith("desc"))
+                total = len(rows)
+                offset = int(options.get("offset", 0))
+                if "limit" in options:
+                    rows = rows[offset:offset + int(options["limit"])]
+                result = self._project(rows, options.get("select"))
+                extra = {}
+                if "count=exact" in prefer:
+                    extra["Content-Range"] = f"{offset}-{offset + len(result) - 1}/{total}" if result else f"*/{total}"
+                return 200, extra, result
+
+            if method == "POST":
+                new_rows = payload if isinstance(payload, list) else [payload]
+                upsert = "resolution=merge-duplicates" in prefer
+                ignore = "resolution=ignore-duplicates" in prefer
+                conflict_column = options.get("on_conflict")
+                written = []
+                for new in new_rows:
+                    if (upsert or ignore) and conflict_column:
+                        existing = next((row for row in self.rows(table)
+                                         if row.get(conflict_column) == new.get(conflict_column)), None)
+                        if existing is not None:
+                            if upsert:
+                                existing.update(new)
+                                existing["updated_at"] = _now()
+                                written.append(existing)
+                            continue
+                    row = {"id": str(uuid.uuid4()), "created_at": _now(), "updated_at": _now(), **new}
+                    columns, _ = self._conflict(table, row)
+                    if columns:
+                        return self._unique_violation(table, columns)
+                    self.rows(table).append(row)
+                    written.append(row)
+                return 201, {}, self._project(written, options.get("select"))
+
+            if method == "PATCH":
+                rows = self._filter(table, params)
+                for row in rows:
+                    columns, _ = self._conflict(table, {**row, **payload}, ignore=row)
+                    if columns:
+                        return self._unique_violation(table, columns)
+                for row in rows:
+                    # Mirrors the updated_at trigger on the real tables.
+                    row.update(payload)
+                    row["updated_at"] = payload.get("updated_at", _now())
+                return 200, {}, self._project(rows, options.get("select"))
+
+            if method == "DELETE":
+                rows = self._filter(table, params)
+                self.tables[table] = [row for row in self.rows(table) if row not in rows]
+                return 200, {}, self._project(rows, options.get("select"))
+
+        return 405, {}, {"message": f"{method} not supported"}
+
+class FakeOpenAI(FakeServer):
+    """
+    Chat completions returning JSON drafts after a sampled delay.
+    `model_latency` gives some models (e.g. the fast route's) their own latency.
+    """
+
+    def __init__(self, latency: LatencyModel = None, model_latency: dict = None):
+        self.model_latency = model_latency or {}
+        self._prefixes = set()
+        super().__init__(latency)
+
+    def _usage(self, messages: list, n: int):
+        # About 4 characters per token. Like the real API, a prompt prefix seen
+        # before is served from cache once it reaches 1024 tokens, in 128-token steps.
+        prompt_tokens = cached_tokens = 0
+        with self._lock:
+            for index, message in enumerate(messages):
+                prompt_tokens += max(1, len(message.get("content") or "") // 4)
+                key = hash(json.dumps(messages[:index + 1], sort_keys=True))
+                if key in self._prefixes:
+                    cached_tokens = prompt_tokens
+                self._prefixes.add(key)
+        cached_tokens = cached_tokens // 128 * 128 if cached_tokens >= 1024 else 0
+        completion_tokens = 60 * n
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}
+        }
+
+    def handle(self, method, path, query, headers, body):
+        request = json.loads(body)
+        latency = self.model_latency.get(request.get("model"), self.latency)
+        self.count(f"chat.completions {request.get('model')}")
+        seconds = latency.sample()
+        if seconds:
+            time.sleep(seconds)
+        if latency.fails():
+            return 503, {}, {"error": {"message": "overloaded", "type": "server_error"}}
+
+        n = request.get("n", 1)
+        choices = [{
+            "index": index,
+            "finish_reason": "stop",
+            "message": {
+                "role": "assistant",
+                "content": json.dumps({
+                    "reply_text": f"Thank you for your review! We are glad you visited us. ({uuid.uuid4().hex[:8]})",
+                    "language": "en"
+                })
+            }
+        } for index in range(n)]
+        return 200, {}, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": choices,
+            "usage": self._usage(request.get("messages", []), n)
+        }
+
+class FakeGoogle(FakeServer):
+    """The v4 reviews API: PUT .../reviews/<id>/reply and GET .../reviews."""
+
+    def __init__(self, latency: LatencyModel = None):
+        self.replies = {}
+        super().__init__(latency)
+
+    def handle(self, method, path, query, headers, body):
+        self.count(f"{method} {'reply' if path.endswith('/reply') else 'reviews'}")
+        self.delay()
+        if self.latency.fails():
+            return 503, {}, {"error": {"code": 503, "status": "UNAVAILABLE"}}
+        if method == "PUT" and path.endswith("/reply"):
+            review_name = path.split("/v4/", 1)[-1][:-len("/reply")]
+            comment = json.loads(body).get("comment")
+            with self._lock:
+                self.replies[review_name] = comment
+            return 200, {}, {"comment": comment, "updateTime": _now()}
+        return 200, {}, {"reviews": [], "totalReviewCount": 0}
+
+class FakeTwilio(FakeServer):
+    """The Messages API; every message is accepted after a sampled delay."""
+
+    def __init__(self, latency: LatencyModel = None):
+        self.messages = []
+        super().__init__(latency)
+
+    def handle(self, method, path, query, headers, body):
+        self.count("messages")
+        self.delay()
+        if self.latency.fails():
+            return 503, {}, {"code": 20503, "message": "Service unavailable", "status": 503}
+        form = parse_qs(body.decode())
+        with self._lock:
+            self.messages.append({"to": form.get("To", [""])[0], "body": form.get("Body", [""])[0]})
+            sid = f"SM{len(self.messages):032d}"
+        return 201, {}, {"sid": sid, "status": "queued", "to": form.get("To", [""])[0]}
@@ -0,0 +1,106 @@
+"""
+Builds realistic webhook traffic and replays it against a running app:
+Pub/Sub push notifications (with some redeliveries) and the owners'
+WhatsApp replies ("1", "2", "ALL").
+"""
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+
+# Short 5-star texts take the template path, repeated texts hit the reply
+# cache and the rest need a model call, roughly as in production traffic.
+SHORT_TEXTS = ["Great!", "Excellent", "Very good", "ممتاز", "رائع جدا", "Nice place"]
+COMMON_TEXTS = [
+    "The karak tea was amazing and the staff were very friendly.",
+    "Food was cold and we waited 40 minutes for our order.",
+    "الشاي لذيذ والخدمة سريعة، أنصح به",
+    "Clean place, fair prices, but parking is hard to find.",
+]
+NAMES = ["Ahmed", "Fatma", "Salim", "Maryam", "John", "Aisha", "Khalid", "Sara"]
+STARS = ["ONE", "TWO", "THREE", "FOUR", "FIVE"]
+
+def client_rows(count: int):
+    return [{
+        "phone_number": f"+9689{n:07d}",
+        "google_location_id": f"accounts/100/locations/{n}",
+        "business_name": f"Bench Cafe {n}",
+        "language_preference": "ar-om" if n % 2 else "en",
+        "offer_policy": "NEVER offer free items, refunds, or discounts. Just apologize and ask to DM.",
+        "reply_templates": None
+    } for n in range(count)]
+
+def review_notification(location_id: str, rng: random.Random):
+    kind = rng.random()
+    if kind < 0.3:
+        text, stars = rng.choice(SHORT_TEXTS), "FIVE"
+    elif kind < 0.6:
+        text, stars = rng.choice(COMMON_TEXTS), rng.choice(STARS)
+    else:
+        text = f"{rng.choice(COMMON_TEXTS)} Visit #{rng.randint(1, 10**6)}."
+        stars = rng.choice(STARS)
+    return {
+        "name": f"{location_id}/reviews/{uuid.uuid4().hex}",
+        "comment": text,
+        "starRating": stars,
+        "reviewer": {"displayName": rng.choice(NAMES)}
+    }
+
+def pubsub_push(notification: dict, message_id: str):
+    data = base64.b64encode(json.dumps(notification).encode()).decode()
+    return {
+        "message": {"data": data, "messageId": message_id, "publishTime": "2024-01-01T00:00:00Z"},
+        "subscription": "projects/bench/subscriptions/reviews"
+    }
+
+def build_ingest_requests(clients: list, reviews: int, redelivery_rate: float, seed: int = 7):
+    rng = random.Random(seed)
+    pushes = []
+    for n in range(reviews):
+        client = clients[n % len(clients)]
+        push = pubsub_push(review_notification(client["google_location_id"], rng), f"bench-{seed}-{n}")
+        pushes.append(push)
+        if rng.random() < redelivery_rate:
+            pushes.append(push)  # Pub/Sub delivers at least once
+    return pushes
+
+def build_reply_script(clients: list):
+    """Per client: regenerate, approve one, then approve everything."""
+    return [[("2", client["phone_number"]), ("1", client["phone_number"]), ("ALL", client["phone_number"])]
+            for client in clients]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, endpoint: str, seconds: float, status: int):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        key = f"{endpoint} {status}"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+async def replay_pushes(http, pushes: list, concurrency: int, recorder: Recorder):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(push):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await http.post("/webhook/google-pubsub", json=push)
+            recorder.record("pubsub", time.perf_counter() - started, response.status_code)
+
+    await asyncio.gather(*(send(push) for push in pushes))
+
+async def replay_replies(http, script: list, concurrency: int, recorder: Recorder):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def conversation(steps):
+        # One owner answers one message at a time; owners run in parallel.
+        async with semaphore:
+            for body, phone in steps:
+                started = time.perf_counter()
+                response = await http.post("/webhook/twilio", data={"From": f"whatsapp:{phone}", "Body": body})
+                recorder.record(f"twilio_{body.lower()}", time.perf_counter() - started, response.status_code)
+
+    await asyncio.gather(*(conversation(steps) for steps in script))
@@ -0,0 +1,344 @@
+"""
+Offline load test: starts local fakes for Supabase, OpenAI, Google and
+Twilio, serves the app with uvicorn, replays Pub/Sub and WhatsApp traffic
+and reports throughput, latency percentiles, per-stage latencies and
+database round trips per request.
+
+    python -m bench.run                        # run and compare to bench/baseline.json
+    python -m bench.run --save-baseline        # run and store the result as the new baseline
+    python -m bench.run --reviews 2000 --openai-latency 1.5,8,0.02 > bench_output.txt
+    python -m bench.run --reviews 80 --concurrency 1   # ack latency without queueing for the CPU
+
+Latency options take "median,p99[,error_rate]" in seconds.
+
+bench/baseline.json is the run at the tip of master with default options.
+Save a new one in the same commit as any change that moves a compared
+metric on purpose (a new pipeline stage, an extra query or call per
+request, a fake's latency model, the loadgen mix), never to silence an
+unexplained regression, and run it on a quiet machine: numbers from
+different hosts are not comparable.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+from bench import loadgen
+from bench.fakes import FakeGoogle, FakeOpenAI, FakePostgrest, FakeTwilio, LatencyModel
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# (metric path, True if higher is better)
+COMPARED_METRICS = [
+    ("ingest.rps", True),
+    ("ingest.reviews_per_second", True),
+    ("ingest.latency.p50", False),
+    ("ingest.latency.p99", False),
+    ("ingest.db_round_trips_per_request", False),
+    ("replies.rps", True),
+    ("replies.latency.p50", False),
+    ("replies.latency.p99", False),
+    ("replies.db_round_trips_per_request", False),
+    ("drafting.cost_usd", False),
+]
+
+def _percentiles(values: list):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _configure_environment(args, fakes: dict):
+    # Must run before any app module is imported: settings and the Supabase
+    # client are built at import time.
+    os.environ.update({
+        "SUPABASE_URL": fakes["supabase"].url,
+        "SUPABASE_KEY": "bench-key",
+        "OPENAI_API_KEY": "bench-key",
+        "OPENAI_BASE_URL": f"{fakes['openai'].url}/v1",
+        "GOOGLE_API_BASE_URL": f"{fakes['google'].url}/v4",
+        "TWILIO_ACCOUNT_SID": "ACbench",
+        "TWILIO_AUTH_TOKEN": "bench-token",
+        "TWILIO_WHATSAPP_NUMBER": "+96800000000",
+        "TWILIO_API_BASE_URL": fakes["twilio"].url,
+        "TEST_MODE": "False",
+        "DIGEST_WINDOW_SECONDS": str(args.digest_window),
+        "BATCH_POST_PROGRESS_EVERY": "0",
+        # The generated traffic repeats a few texts across locations on
+        # purpose (reply cache); the spam screen would hold them back.
+        "SPAM_FILTER": "False",
+    })
+
+class AppServer:
+    def __init__(self, app):
+        import uvicorn
+
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=60)
+
+def _wait_for_drain(db: FakePostgrest, timeout: float):
+    from app import main
+    from app.services import notifier, outbound
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with db._data_lock:
+            queued = sum(1 for row in db.rows("review_jobs") if row.get("status") == "queued")
+        busy = queued or main._command_tasks or notifier.stats()["buffered_items"] or outbound.stats()["queue_depth"]
+        if not busy:
+            return True
+        time.sleep(0.05)
+    return False
+
+def _phase_report(recorder: loadgen.Recorder, requests: int, seconds: float, db_calls: dict):
+    latencies = [value for values in recorder.latencies.values() for value in values]
+    return {
+        "requests": requests,
+        "seconds": round(seconds, 3),
+        "rps": round(requests / seconds, 1) if seconds else None,
+        "latency": _percentiles(latencies),
+        "by_endpoint": {endpoint: _percentiles(values) for endpoint, values in sorted(recorder.latencies.items())},
+        "statuses": dict(sorted(recorder.statuses.items())),
+        "db_round_trips": dict(sorted(db_calls.items())),
+        "db_round_trips_per_request": round(sum(db_calls.values()) / requests, 2) if requests else None
+    }
+
+def _diff(before: dict, after: dict):
+    return {key: after[key] - before.get(key, 0) for key in after if after[key] - before.get(key, 0)}
+
+def _stage_report():
+    from app.core import metrics
+
+    stages = {}
+    for labels in sorted(metrics.STAGE_LATENCY.labels(), key=lambda labels: labels.get("stage", "")):
+        stages[labels["stage"]] = {
+            "count": metrics.STAGE_LATENCY.count(**labels),
+            **{name: round(metrics.STAGE_LATENCY.quantile(q, **labels), 4)
+               for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+        }
+    return stages
+
+def _drafting_report():
+    from app.core import metrics
+    from app.services import model_router
+
+    routes = {}
+    for labels in sorted(metrics.DRAFT_LATENCY.labels(), key=lambda labels: labels.get("route", "")):
+        routes[labels["route"]] = {
+            "model": labels["model"],
+            "calls": metrics.DRAFT_LATENCY.count(**labels),
+            "p50": round(metrics.DRAFT_LATENCY.quantile(0.5, **labels), 4),
+            "prompt_tokens": metrics.DRAFT_TOKENS.value(route=labels["route"], kind="prompt"),
+            "cached_prompt_tokens": metrics.DRAFT_TOKENS.value(route=labels["route"], kind="cached_prompt"),
+            "cost_usd": round(metrics.DRAFT_COST.value(route=labels["route"]), 4)
+        }
+    return {"routes": routes, "fallbacks": model_router.stats()["fallbacks"],
+            "cost_usd": round(sum(route["cost_usd"] for route in routes.values()), 4)}
+
+async def _drive(args, fakes: dict):
+    import httpx
+    import requests
+    from app.main import app
+    from app.services import client_registry
+
+    # No service account here: talk to the fake Google API with a plain pooled session.
+    session = requests.Session()
+    session.mount("http://", client_registry._pooled_adapter())
+    client_registry._google_session = session
+
+    db = fakes["supabase"]
+    clients = loadgen.client_rows(args.clients)
+    db.seed("clients", clients)
+    pushes = loadgen.build_ingest_requests(clients, args.reviews, args.redelivery_rate, args.seed)
+
+    report = {"scenario": {key: value for key, value in vars(args).items()
+                           if key not in ("save_baseline", "baseline", "fail_on_regression", "json", "verbose")}}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    with AppServer(app) as server:
+        async with httpx.AsyncClient(base_url=server.url, limits=limits, timeout=120) as http:
+            recorder = loadgen.Recorder()
+            before = db.snapshot()
+            started = time.perf_counter()
+            await loadgen.replay_pushes(http, pushes, args.concurrency, recorder)
+            accepted = time.perf_counter() - started
+            drained = await asyncio.to_thread(_wait_for_drain, db, args.drain_timeout)
+            processed = time.perf_counter() - started
+            report["ingest"] = _phase_report(recorder, len(pushes), accepted, _diff(before, db.snapshot()))
+            report["ingest"]["drained"] = drained
+            report["ingest"]["drain_seconds"] = round(processed - accepted, 3)
+            report["ingest"]["reviews_per_second"] = round(args.reviews / processed, 1)
+
+            recorder = loadgen.Recorder()
+            script = loadgen.build_reply_script(clients)
+            before = db.snapshot()
+            started = time.perf_counter()
+            await loadgen.replay_replies(http, script, args.concurrency, recorder)
+            elapsed = time.perf_counter() - started
+            await asyncio.to_thread(_wait_for_drain, db, args.drain_timeout)
+            report["replies"] = _phase_report(
+                recorder, sum(len(steps) for steps in script), elapsed, _diff(before, db.snapshot())
+            )
+            # Commands are acknowledged first; this is when their work finished.
+            report["replies"]["completed_seconds"] = round(time.perf_counter() - started, 3)
+
+    report["stages"] = _stage_report()
+    report["drafting"] = _drafting_report()
+    report["external_calls"] = {
+        "openai": fakes["openai"].snapshot(),
+        "google": fakes["google"].snapshot(),
+        "twilio_messages": len(fakes["twilio"].messages),
+    }
+    report["rows"] = {table: len(rows) for table, rows in sorted(db.tables.items())}
+    return report
+
+def _lookup(report: dict, path: str):
+    value = report
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def compare(report: dict, baseline: dict, threshold: float):
+    """
+    Returns (rows, regressions). A metric regresses when it moves the wrong
+    way by more than `threshold` (relative); database round trips per request
+    regress on any increase.
+    """
+    rows = []
+    regressions = []
+    paths = list(COMPARED_METRICS)
+    paths += [(f"stages.{stage}.p95", False) for stage in sorted(report.get("stages", {}))]
+    for path, higher_is_better in paths:
+        current, previous = _lookup(report, path), _lookup(baseline, path)
+        if current is None or previous is None:
+            continue
+        change = (current - previous) / previous if previous else 0.0
+        worse = -change if higher_is_better else change
+        limit = 0.0 if path.endswith("db_round_trips_per_request") else threshold
+        regressed = worse > limit + 1e-9
+        rows.append((path, previous, current, change, regressed))
+        if regressed:
+            regressions.append(path)
+    return rows, regressions
+
+def print_report(report: dict):
+    for phase in ("ingest", "replies"):
+        data = report[phase]
+        print(f"== {phase}: {data['requests']} requests in {data['seconds']}s ({data['rps']} req/s)")
+        print(f"   latency p50={data['latency']['p50']}s p95={data['latency']['p95']}s p99={data['latency']['p99']}s")
+        for endpoint, latency in data["by_endpoint"].items():
+            print(f"   {endpoint:<16} p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s")
+        print(f"   statuses: {data['statuses']}")
+        print(f"   db round trips/request: {data['db_round_trips_per_request']} {data['db_round_trips']}")
+        if phase == "replies":
+            print(f"   commands completed after {data['completed_seconds']}s")
+        if phase == "ingest":
+            print(f"   drained in {data['drain_seconds']}s, {data['reviews_per_second']} reviews/s end to end"
+                  + ("" if data["drained"] else " (DRAIN TIMED OUT)"))
+    print("== stages (seconds)")
+    for stage, data in report["stages"].items():
+        print(f"   {stage:<14} n={data['count']:<6} p50={data['p50']} p95={data['p95']} p99={data['p99']}")
+    drafting = report["drafting"]
+    print(f"== drafting routes (cost ${drafting['cost_usd']}, {drafting['fallbacks']} fallbacks)")
+    for route, data in drafting["routes"].items():
+        print(f"   {route:<14} {data['model']:<12} n={data['calls']:<6} p50={data['p50']} cost=${data['cost_usd']}"
+              f" prompt tokens/call={data['prompt_tokens'] // max(data['calls'], 1)} (cached {data['cached_prompt_tokens']})")
+    print(f"== external calls: {report['external_calls']}")
+    print(f"== rows: {report['rows']}")
+
+def print_comparison(rows: list, baseline_path: Path):
+    print(f"== compared to {baseline_path}")
+    for path, previous, current, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"   {path:<40} {previous:>10} -> {current:<10} {change:+.1%}{flag}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--reviews", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--redelivery-rate", type=float, default=0.05)
+    parser.add_argument("--digest-window", type=float, default=0.5)
+    parser.add_argument("--openai-latency", type=LatencyModel.parse, default="0.8,3")
+    parser.add_argument("--openai-fast-latency", type=LatencyModel.parse, default="0.35,1.5",
+                        help="latency of the fast drafting model (gpt-4o-mini)")
+    parser.add_argument("--google-latency", type=LatencyModel.parse, default="0.15,0.6")
+    parser.add_argument("--twilio-latency", type=LatencyModel.parse, default="0.1,0.4")
+    parser.add_argument("--db-latency", type=LatencyModel.parse, default="0.004,0.03")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--json", type=Path, help="also write the full report here")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    fakes = {
+        "supabase": FakePostgrest(args.db_latency),
+        "openai": FakeOpenAI(args.openai_latency, {"gpt-4o-mini": args.openai_fast_latency}),
+        "google": FakeGoogle(args.google_latency),
+        "twilio": FakeTwilio(args.twilio_latency),
+    }
+    _configure_environment(args, fakes)
+    try:
+        # The app logs every post and message; keep the report readable.
+        app_log = open(os.devnull, "w") if not args.verbose else contextlib.nullcontext(sys.stdout)
+        with app_log as log, contextlib.redirect_stdout(log):
+            report = asyncio.run(_drive(args, fakes))
+    finally:
+        for fake in fakes.values():
+            fake.shutdown()
+
+    for name in ("openai_latency", "openai_fast_latency", "google_latency", "twilio_latency", "db_latency"):
+        model = getattr(args, name)
+        report["scenario"][name] = [model.median, model.p99, model.error_rate]
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+        print(f"== baseline saved to {args.baseline}")
+        return 0
+
+    if args.baseline.exists():
+        rows, regressions = compare(report, json.loads(args.baseline.read_text()), args.threshold)
+        print_comparison(rows, args.baseline)
+        if regressions and args.fail_on_regression:
+            print(f"== {len(regressions)} regressions")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())